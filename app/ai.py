@@ -1,37 +1,70 @@
 import os
-import reflex as rx
-from openai import OpenAI
-import json
+import re
+import time
+import hashlib
 import logging
 import base64
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict
+from app import codec, metrics
+from app.cache import get_cache
+from app.json_repair import parse_partial_json
+from app.schemas import merge, validate
+from app.providers import (
+    USER_PART_SEPARATOR,
+    GenerationCancelled,
+    LatencyTracker,
+    get_provider,
+    latency_tracker,
+)
 
+QUIZ_BANK_SIZE = int(os.getenv("STUDYGENIE_QUIZ_BANK_SIZE", "20"))
+IMAGE_BATCH_MAX_IMAGES = int(os.getenv("STUDYGENIE_IMAGE_BATCH_MAX_IMAGES", "4"))
+IMAGE_BATCH_MAX_BYTES = int(
+    os.getenv("STUDYGENIE_IMAGE_BATCH_MAX_BYTES", str(4 * 1024 * 1024))
+)
+IMAGE_CONCURRENCY = int(os.getenv("STUDYGENIE_IMAGE_CONCURRENCY", "4"))
 
-def get_client():
-    """Initialize OpenAI client lazily."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        error_msg = "OPENAI_API_KEY is not set. Please ensure it is defined in your environment variables."
-        logging.error(error_msg)
-        raise ValueError(error_msg)
-    return OpenAI(api_key=api_key)
 
-
-def parse_json_response(response_text: str | None):
-    """Extract and parse JSON from the AI's response."""
+def _parse_response(response_text: str | None, mode: str | None = None):
+    """`parse_json_response`, also returning whether the JSON needed repair."""
     if not response_text:
         logging.error("AI response was empty.")
-        return None
+        return None, False
+    repaired = False
     try:
-        return json.loads(response_text)
-    except json.JSONDecodeError as e:
-        logging.exception(f"Error parsing JSON: {e}\nResponse text: {response_text}")
-        if "on" in response_text:
-            try:
-                json_str = response_text.split("on")[1].split("")[0]
-                return json.loads(json_str)
-            except (json.JSONDecodeError, IndexError) as fix_e:
-                logging.exception(f"Failed to fix JSON: {fix_e}")
-        return None
+        data = codec.loads(response_text)
+    except codec.JSONDecodeError as e:
+        data, complete = parse_partial_json(response_text)
+        if data is None:
+            logging.exception(
+                f"Error parsing JSON: {e}\nResponse text: {response_text}"
+            )
+            metrics.JSON_REPAIRS.inc(mode=mode or "", outcome="failed")
+            return None, False
+        logging.warning(f"Repaired malformed AI JSON response: {e}")
+        metrics.JSON_REPAIRS.inc(
+            mode=mode or "", outcome="unwrapped" if complete else "truncated"
+        )
+        repaired = True
+    if mode is None:
+        return data, repaired
+    content = validate(mode, data)
+    if content is None:
+        logging.error(f"AI response did not match the {mode} structure.")
+    return content, repaired
+
+
+def parse_json_response(response_text: str | None, mode: str | None = None):
+    """Extract and parse JSON from the AI's response.
+
+    When `mode` is given the result is checked and coerced to that mode's
+    shape, and None is returned if it is unusable.
+    """
+    return _parse_response(response_text, mode)[0]
 
 
 PROMPTS = {
@@ -48,7 +81,7 @@ PROMPTS = {
         "json_structure": '{"steps": ["string", ...], "example": "string", "analogy": "string"}',
     },
     "Quiz": {
-        "prompt": "Create a 5-question multiple-choice quiz on the given topic/text.",
+        "prompt": f"Create a bank of {QUIZ_BANK_SIZE} distinct multiple-choice questions covering the given topic/text broadly; short quizzes are drawn from it at random.",
         "json_structure": '{"questions": [{"question": "string", "options": ["string", ...], "correct_answer": int}]}',
     },
     "Flashcards": {
@@ -57,69 +90,500 @@ PROMPTS = {
     },
 }
 
+# Every request starts with this exact text, whatever the mode or input, so
+# providers can serve it from their prompt cache. Mode instructions and the
+# user's text follow in the user message; keep anything variable out of here.
+SYSTEM_PROMPT = "\n".join(
+    [
+        "You are StudyGenie, an AI study assistant. Your goal is to produce clear, concise, and undergraduate-level educational content from the topic, text or images the user provides.",
+        "Each request names one of the modes below and gives its instructions. Respond ONLY with a valid JSON object matching that mode's structure, with no text before or after it.",
+        "",
+        *(f"{mode}: {details['json_structure']}" for mode, details in PROMPTS.items()),
+    ]
+)
+
+
+def build_user_prompt(mode: str, label: str, text: str, note: str = "") -> str:
+    """Mode instructions first, then the user-specific part.
+
+    `note` describes this request's attachments, so it goes with the user's
+    text, after the images of a vision request.
+    """
+    instructions = f"{PROMPTS[mode]['prompt']} Use the {mode} structure."
+    user_part = f"{label} ---\n{text}"
+    if note:
+        user_part = f"{user_part}\n\n{note.strip()}"
+    return f"{instructions}{USER_PART_SEPARATOR}{user_part}"
+
+
+class Route(TypedDict):
+    """One model configuration requests can be routed to."""
+
+    name: str
+    # provider name -> model; providers not listed use their configured model
+    models: dict[str, str]
+    max_tokens: int
+    temperature: float
+    # Route taken instead while this one's average latency is over `max_latency`
+    fallback: str | None
+    max_latency: float
+
+
+def _route_from_env(default: Route) -> Route:
+    """Override a route from the environment.
+
+    `STUDYGENIE_ROUTE_<NAME>` is "<max_tokens>,<temperature>",
+    `STUDYGENIE_ROUTE_<NAME>_MODELS` is like "openai=gpt-4o,anthropic=..."
+    and `STUDYGENIE_ROUTE_<NAME>_MAX_LATENCY_S` sets the latency budget.
+    """
+    prefix = f"STUDYGENIE_ROUTE_{default['name'].upper()}"
+    route = Route(**default)
+    if value := os.getenv(prefix):
+        max_tokens, temperature = value.split(",")
+        route["max_tokens"] = int(max_tokens)
+        route["temperature"] = float(temperature)
+    if value := os.getenv(f"{prefix}_MODELS"):
+        route["models"] = dict(
+            (part.strip() for part in pair.split("=", 1))
+            for pair in value.split(",")
+            if "=" in pair
+        )
+    if value := os.getenv(f"{prefix}_MAX_LATENCY_S"):
+        route["max_latency"] = float(value)
+    return route
+
+
+ROUTES: dict[str, Route] = {
+    route["name"]: _route_from_env(route)
+    for route in (
+        Route(
+            name="small",
+            models={},
+            max_tokens=1000,
+            temperature=0.3,
+            fallback=None,
+            max_latency=0,
+        ),
+        Route(
+            name="default",
+            models={},
+            max_tokens=3000,
+            temperature=0.7,
+            fallback=None,
+            max_latency=0,
+        ),
+        Route(
+            name="large",
+            models={"openai": "gpt-4o", "anthropic": "claude-3-5-sonnet-latest"},
+            max_tokens=4096,
+            temperature=0.5,
+            fallback="default",
+            max_latency=30,
+        ),
+    )
+}
+ROUTING_ENABLED = os.getenv("STUDYGENIE_ROUTING", "1") != "0"
+SMALL_ROUTE_MODES = set(
+    os.getenv("STUDYGENIE_ROUTE_SMALL_MODES", "Summary,Explain").split(",")
+)
+SMALL_ROUTE_MAX_CHARS = int(os.getenv("STUDYGENIE_ROUTE_SMALL_MAX_CHARS", "200"))
+LARGE_ROUTE_MIN_IMAGES = int(os.getenv("STUDYGENIE_ROUTE_LARGE_MIN_IMAGES", "2"))
+LARGE_ROUTE_MIN_CHARS = int(os.getenv("STUDYGENIE_ROUTE_LARGE_MIN_CHARS", "4000"))
+# While a route is over its latency budget, every Nth request still takes it
+# so its average can recover.
+ROUTE_PROBE_EVERY = int(os.getenv("STUDYGENIE_ROUTE_PROBE_EVERY", "10"))
+
+route_latency = LatencyTracker()
+_route_probes = itertools.count(1)
+
+
+def select_route(mode: str, input_chars: int, image_count: int = 0) -> Route:
+    """Pick the route for a request from its mode, size and live latency.
+
+    Short text-only lookups in `SMALL_ROUTE_MODES` take the small route;
+    multimodal requests with several images or a long query take the large
+    one; everything else the default. A route whose average latency is over
+    its `max_latency` hands off to its fallback.
+    """
+    if not ROUTING_ENABLED:
+        return ROUTES["default"]
+    if image_count and (
+        image_count >= LARGE_ROUTE_MIN_IMAGES or input_chars >= LARGE_ROUTE_MIN_CHARS
+    ):
+        route = ROUTES["large"]
+    elif (
+        not image_count
+        and mode in SMALL_ROUTE_MODES
+        and input_chars <= SMALL_ROUTE_MAX_CHARS
+    ):
+        route = ROUTES["small"]
+    else:
+        route = ROUTES["default"]
+    while route["fallback"] and route["max_latency"]:
+        average = route_latency.get(route["name"])
+        if average is None or average <= route["max_latency"]:
+            break
+        if ROUTE_PROBE_EVERY and next(_route_probes) % ROUTE_PROBE_EVERY == 0:
+            break
+        metrics.AI_ROUTE_FALLBACKS.inc(route=route["name"], mode=mode)
+        route = ROUTES[route["fallback"]]
+    return route
+
+
+GENERATION_CACHE_TTL = float(
+    os.getenv("STUDYGENIE_GENERATION_CACHE_TTL", str(7 * 24 * 3600))
+)
+
+
+def normalize_topic(text: str) -> str:
+    """Case- and whitespace-insensitive form of a topic used for cache keys."""
+    return re.sub(r"\s+", " ", text).strip().strip(".?!").lower()
+
 
-def generate_content(mode: str, user_input: str):
-    """Generic function to call OpenAI API with a structured prompt."""
+def generation_cache_key(
+    mode: str, user_input: str, route: str, image_digest: str = ""
+) -> str:
+    """Cache key for a generation on `route`; changes with the mode's prompt.
+
+    Results are kept apart per route, since routes differ in model, token
+    limit and temperature.
+    """
+    prompt_details = PROMPTS[mode]
+    digest = hashlib.sha256(
+        "\x00".join(
+            (
+                SYSTEM_PROMPT,
+                prompt_details["prompt"],
+                prompt_details["json_structure"],
+                normalize_topic(user_input),
+                image_digest,
+                route,
+            )
+        ).encode("utf-8")
+    ).hexdigest()[:32]
+    return f"gen:{mode}:{digest}"
+
+
+def _cached_generation(key: str, generate, refresh: bool = False):
+    """Serve a generation from the shared cache, filling it on a miss.
+
+    `generate` returns `(result, repaired)`; results salvaged from malformed
+    JSON are returned but not cached, so a retry can get a complete one.
+    `refresh` skips the lookup and overwrites the entry.
+    """
+    if GENERATION_CACHE_TTL <= 0:
+        return generate()[0]
+    cache = get_cache()
+    cached = None if refresh else cache.get_json(key, namespace="generation")
+    if cached is not None:
+        return cached
+    result, repaired = generate()
+    if result and not repaired:
+        cache.set_json(key, result, GENERATION_CACHE_TTL)
+    return result
+
+
+def _complete(
+    mode: str,
+    system_prompt: str,
+    user_prompt: str,
+    images=None,
+    usage: dict | None = None,
+    cancel: threading.Event | None = None,
+    route: Route | None = None,
+):
+    """Send a prompt to the provider selected for `mode` and parse the reply.
+
+    Returns `(content, repaired)` as from `_parse_response`.
+
+    The model, `max_tokens` and temperature come from `route`, which callers
+    pick with `select_route` from the user's part of the prompt; without one
+    it is picked from the whole prompt. If `usage` is given, the call's token
+    counts are added to it. Setting `cancel` aborts the call with
+    `GenerationCancelled`.
+    """
+    if cancel is not None and cancel.is_set():
+        raise GenerationCancelled()
+    provider = get_provider(mode)
+    if route is None:
+        route = select_route(mode, len(user_prompt), len(images or []))
+    start = time.perf_counter()
+    try:
+        with metrics.span(
+            "ai.upstream", provider=provider.name, mode=mode, route=route["name"]
+        ) as span:
+            completion = provider.complete(
+                mode,
+                system_prompt,
+                user_prompt,
+                images,
+                max_tokens=route["max_tokens"],
+                temperature=route["temperature"],
+                cancel=cancel,
+                model=route["models"].get(provider.name),
+            )
+            span.set("ai.model", completion["model"])
+            span.set("ai.prompt_tokens", completion["prompt_tokens"])
+            span.set("ai.completion_tokens", completion["completion_tokens"])
+            span.set("ai.cached_tokens", completion["cached_tokens"])
+    except GenerationCancelled:
+        raise
+    except Exception:
+        latency_tracker.record_failure(provider.name)
+        route_latency.record_failure(route["name"])
+        raise
+    elapsed = time.perf_counter() - start
+    latency_tracker.record(provider.name, elapsed)
+    route_latency.record(route["name"], elapsed)
+    for kind in ("prompt", "completion", "cached"):
+        metrics.AI_TOKENS.inc(
+            completion[f"{kind}_tokens"],
+            provider=provider.name,
+            mode=mode,
+            route=route["name"],
+            kind=kind,
+        )
+    if usage is not None:
+        for kind in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            usage[kind] = usage.get(kind, 0) + completion[kind]
+    with metrics.span("ai.parse", mode=mode):
+        return _parse_response(completion["text"], mode)
+
+
+def generate_content(
+    mode: str,
+    user_input: str,
+    usage: dict | None = None,
+    refresh: bool = False,
+    cancel: threading.Event | None = None,
+):
+    """Generate structured content for a mode with the configured provider.
+
+    Token counts of any upstream call are added to `usage` when given; a
+    cache hit adds nothing. `refresh` bypasses the cached result. Returns
+    None if `cancel` is set before the upstream call completes.
+    """
     if mode not in PROMPTS:
         return None
-    prompt_details = PROMPTS[mode]
-    system_prompt = f"You are StudyGenie, an AI study assistant. Your goal is to produce clear, concise, and undergraduate-level educational content. Respond ONLY with a valid JSON object matching this structure: {prompt_details['json_structure']}"
-    user_prompt = f"{prompt_details['prompt']}\n\n--- TOPIC/TEXT ---\n{user_input}"
+    user_prompt = build_user_prompt(mode, "TOPIC/TEXT", user_input)
+    route = select_route(mode, len(user_input))
     try:
-        client = get_client()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.7,
-            max_tokens=3000,
-            response_format={"type": "json_object"},
+        return _cached_generation(
+            generation_cache_key(mode, user_input, route["name"]),
+            lambda: _complete(
+                mode,
+                SYSTEM_PROMPT,
+                user_prompt,
+                usage=usage,
+                cancel=cancel,
+                route=route,
+            ),
+            refresh,
         )
-        content = response.choices[0].message.content
-        return parse_json_response(content)
+    except GenerationCancelled:
+        return None
     except Exception as e:
-        logging.exception(f"An error occurred while calling OpenAI: {e}")
+        logging.exception(f"An error occurred while calling the AI provider: {e}")
         return None
 
 
-def generate_content_from_image(mode: str, user_input: str, image_path: str):
-    """Function to call OpenAI Vision API."""
-    if mode not in PROMPTS:
-        return None
+def _add_usage(usage: dict | None, counts: dict):
+    if usage is not None:
+        for kind, count in counts.items():
+            usage[kind] = usage.get(kind, 0) + count
+
+
+def _map_bounded(func, items, concurrency: int):
+    """Like `ThreadPoolExecutor.map`, but pulls at most `concurrency` items ahead."""
+    with ThreadPoolExecutor(concurrency) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= concurrency:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _read_images(image_paths) -> list[bytes] | None:
     try:
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode("utf-8")
+        images = []
+        for image_path in image_paths:
+            with open(image_path, "rb") as image_file:
+                images.append(image_file.read())
+        return images
     except Exception as e:
         logging.exception(f"Error reading image file: {e}")
         return None
-    prompt_details = PROMPTS[mode]
-    system_prompt = f"You are StudyGenie, an AI study assistant. Your goal is to produce clear, concise, and undergraduate-level educational content based on the provided image and text. Respond ONLY with a valid JSON object matching this structure: {prompt_details['json_structure']}"
-    user_content = [
-        {
-            "type": "image_url",
-            "image_url": {"url": f"data:image/png;base64,{base64_image}"},
-        },
-        {
-            "type": "text",
-            "text": f"{prompt_details['prompt']}\n\n--- USER QUERY ---\n{(user_input if user_input else 'Analyze the image.')}",
-        },
-    ]
+
+
+def image_media_type(data: bytes) -> str:
+    """Media type of JPEG, WebP or GIF data from its magic bytes; else PNG."""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/png"
+
+
+def _generate_from_images(
+    mode: str,
+    user_input: str,
+    images: list[bytes],
+    usage: dict | None,
+    cancel: threading.Event | None = None,
+):
+    """One vision request covering all of `images`, cached by their digests."""
+    note = " Base it on the attached image."
+    if len(images) > 1:
+        note = f" Base it on the {len(images)} attached images; they are consecutive pages, cover all of them."
+    user_prompt = build_user_prompt(
+        mode, "USER QUERY", user_input if user_input else "Analyze the image.", note
+    )
+    digest = "+".join(hashlib.sha256(image).hexdigest() for image in images)
+    route = select_route(mode, len(user_input), len(images))
     try:
-        client = get_client()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content},
-            ],
-            temperature=0.7,
-            max_tokens=3000,
-            response_format={"type": "json_object"},
+        return _cached_generation(
+            generation_cache_key(mode, user_input, route["name"], digest),
+            lambda: _complete(
+                mode,
+                SYSTEM_PROMPT,
+                user_prompt,
+                [
+                    (image_media_type(image), base64.b64encode(image).decode("utf-8"))
+                    for image in images
+                ],
+                usage=usage,
+                cancel=cancel,
+                route=route,
+            ),
         )
-        content = response.choices[0].message.content
-        return parse_json_response(content)
+    except GenerationCancelled:
+        return None
     except Exception as e:
-        logging.exception(f"An error occurred while calling OpenAI Vision API: {e}")
-        return None
\ No newline at end of file
+        logging.exception(f"An error occurred while calling the AI vision provider: {e}")
+        return None
+
+
+def generate_content_from_images(
+    mode: str,
+    user_input: str,
+    image_paths: list,
+    usage: dict | None = None,
+    cancel: threading.Event | None = None,
+):
+    """Generate structured content from one or more page images.
+
+    Up to `IMAGE_BATCH_MAX_IMAGES` images totalling `IMAGE_BATCH_MAX_BYTES`
+    go out as a single vision request. Larger uploads are processed page by
+    page, `IMAGE_CONCURRENCY` at a time, and the per-page results merged, so
+    latency tracks the slowest page rather than the sum.
+    """
+    if mode not in PROMPTS or not image_paths:
+        return None
+    images = _read_images(image_paths)
+    if images is None:
+        return None
+    if (
+        len(images) <= IMAGE_BATCH_MAX_IMAGES
+        and sum(map(len, images)) <= IMAGE_BATCH_MAX_BYTES
+    ):
+        return _generate_from_images(mode, user_input, images, usage, cancel)
+    page_usage = [{} for _ in images]
+    with ThreadPoolExecutor(min(IMAGE_CONCURRENCY, len(images))) as pool:
+        results = list(
+            pool.map(
+                lambda page: _generate_from_images(
+                    mode, user_input, [images[page]], page_usage[page], cancel
+                ),
+                range(len(images)),
+            )
+        )
+    for counts in page_usage:
+        _add_usage(usage, counts)
+    parts = [result for result in results if result]
+    if len(parts) < len(results):
+        logging.warning(f"{len(results) - len(parts)} of {len(results)} pages failed.")
+    return merge(mode, parts) if parts else None
+
+
+def generate_content_from_documents(
+    mode: str,
+    user_input: str,
+    document_paths: list,
+    usage: dict | None = None,
+    cancel: threading.Event | None = None,
+    notices: list[str] | None = None,
+):
+    """Generate structured content from uploaded PDF/text documents.
+
+    Documents are streamed chunk by chunk (see `app.documents`); text chunks
+    go through `generate_content`, image-only PDF pages through the vision
+    path, `IMAGE_CONCURRENCY` at a time, and the results are merged. A
+    message for the user is added to `notices` for each document cut short.
+    """
+    from app.documents import iter_chunks
+
+    if mode not in PROMPTS or not document_paths:
+        return None
+
+    def segments():
+        for path in document_paths:
+            try:
+                for segment in iter_chunks(path, notices):
+                    if cancel is not None and cancel.is_set():
+                        return
+                    yield segment
+            except Exception as e:
+                logging.exception(f"Error reading document {path}: {e}")
+
+    def generate(segment):
+        kind, data = segment
+        counts: dict = {}
+        if kind == "image":
+            result = _generate_from_images(mode, user_input, [data], counts, cancel)
+        else:
+            result = generate_content(
+                mode,
+                f"{user_input}\n\n{data}" if user_input else data,
+                counts,
+                cancel=cancel,
+            )
+        return result, counts
+
+    parts = []
+    for result, counts in _map_bounded(generate, segments(), IMAGE_CONCURRENCY):
+        _add_usage(usage, counts)
+        if result:
+            parts.append(result)
+    return merge(mode, parts) if parts else None
+
+
+def generate_content_from_uploads(
+    mode: str,
+    user_input: str,
+    paths: list,
+    usage: dict | None = None,
+    cancel: threading.Event | None = None,
+    notices: list[str] | None = None,
+):
+    """Generate from a mix of uploaded images and documents, merging the results."""
+    from app.documents import is_document
+
+    documents = [path for path in paths if is_document(str(path))]
+    images = [path for path in paths if not is_document(str(path))]
+    parts = [
+        part
+        for part in (
+            images
+            and generate_content_from_images(mode, user_input, images, usage, cancel),
+            documents
+            and generate_content_from_documents(
+                mode, user_input, documents, usage, cancel, notices
+            ),
+        )
+        if part
+    ]
+    return merge(mode, parts) if parts else None
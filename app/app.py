@@ -2,7 +2,16 @@ import reflex as rx
 from app.pages.index import index
 from app.pages.login import login_page
 from app.pages.register import registration_page
+from app.pages.review import review_page
+from app.states.review_state import ReviewState
 from app.database import create_db_and_tables
+from app.jobs import run_job_workers
+from app.warming import run_warming_scheduler
+from app.retention import run_retention_scheduler
+from app.quotas import run_quota_flusher
+from app.metrics import create_metrics_app, setup_opentelemetry
+
+setup_opentelemetry()
 
 app = rx.App(
     theme=rx.theme(appearance="light", accent_color="indigo", radius="medium"),
@@ -15,7 +24,13 @@ app = rx.App(
         ),
     ],
     style={"font_family": "Poppins, sans-serif"},
+    api_transformer=create_metrics_app(),
 )
+app.register_lifespan_task(run_job_workers)
+app.register_lifespan_task(run_warming_scheduler)
+app.register_lifespan_task(run_retention_scheduler)
+app.register_lifespan_task(run_quota_flusher)
 app.add_page(index, route="/")
 app.add_page(login_page, route="/login")
-app.add_page(registration_page, route="/register")
\ No newline at end of file
+app.add_page(registration_page, route="/register")
+app.add_page(review_page, route="/review", on_load=ReviewState.on_load)
\ No newline at end of file
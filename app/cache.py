@@ -0,0 +1,288 @@
+"""Shared cache backend for generation results and database lookups.
+
+Selected with `STUDYGENIE_CACHE_URL`:
+
+- `memory://` (default): per-process LRU, the old behaviour.
+- `sqlite:///path/to/cache.db`: shared by every worker process on one host.
+- `redis://host:6379/0`: shared across hosts; speaks plain RESP, so any
+  Redis-compatible server works, including `python -m app.cache_standin`.
+
+Cache failures are logged and treated as misses; they never fail a request.
+"""
+
+import os
+import time
+import queue
+import socket
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+from app import codec, metrics
+
+
+class CacheBackend:
+    shared = True
+
+    def get(self, key: str) -> str | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: float | None = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def get_json(self, key: str, namespace: str = "default"):
+        try:
+            raw = self.get(key)
+        except Exception as e:
+            logging.warning(f"Cache get failed for {key}: {e}")
+            raw = None
+        metrics.CACHE_LOOKUPS.inc(
+            namespace=namespace, result="hit" if raw is not None else "miss"
+        )
+        return codec.loads(raw) if raw is not None else None
+
+    def set_json(self, key: str, value, ttl: float | None = None):
+        try:
+            self.set(key, codec.dumps(value), ttl)
+        except Exception as e:
+            logging.warning(f"Cache set failed for {key}: {e}")
+
+    def invalidate(self, key: str):
+        try:
+            self.delete(key)
+        except Exception as e:
+            logging.warning(f"Cache delete failed for {key}: {e}")
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU with per-key expiry, bounded by entries and by size.
+
+    The size bound is `STUDYGENIE_MEMORY_CACHE_MAX_BYTES` (default 64 MiB),
+    counted as key plus value length; a value larger than that is not kept.
+    """
+
+    shared = False
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes or int(
+            os.getenv("STUDYGENIE_MEMORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+        )
+        self._data: OrderedDict[str, tuple[str, float | None]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(key) + len(entry[0])
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = len(key) + len(value)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+
+class SQLiteCache(CacheBackend):
+    """Key/value table in a WAL-mode SQLite file shared by local processes."""
+
+    purge_every = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writes = 0
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = (
+            self._conn()
+            .execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,))
+            .fetchone()
+        )
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+        conn.commit()
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge_expired()
+
+    def delete(self, key):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        conn.commit()
+
+    def purge_expired(self) -> int:
+        conn = self._conn()
+        cursor = conn.execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?",
+            (time.time(),),
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache(CacheBackend):
+    """Minimal pooled RESP2 client covering GET, SET EX, DEL and PING."""
+
+    def __init__(self, host: str, port: int, db: int = 0, password: str | None = None):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = float(os.getenv("STUDYGENIE_CACHE_TIMEOUT", "1.0"))
+        self._pool: queue.LifoQueue = queue.LifoQueue()
+
+    def _open(self):
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile("rb"))
+        if self.password:
+            self._roundtrip(conn, "AUTH", self.password)
+        if self.db:
+            self._roundtrip(conn, "SELECT", str(self.db))
+        return conn
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server.")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [self._read(reader) for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def _roundtrip(self, conn, *args):
+        sock, reader = conn
+        sock.sendall(self._encode(args))
+        return self._read(reader)
+
+    def command(self, *args):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        try:
+            reply = self._roundtrip(conn, *args)
+        except RedisError:
+            self._pool.put(conn)
+            raise
+        except (OSError, ConnectionError):
+            conn[0].close()
+            raise
+        self._pool.put(conn)
+        return reply
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.command("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            self.command("SET", key, value)
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+
+def create_cache(url: str) -> CacheBackend:
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryCache()
+    if parsed.scheme == "sqlite":
+        return SQLiteCache(parsed.path or "studygenie_cache.db")
+    if parsed.scheme == "redis":
+        return RedisCache(
+            parsed.hostname or "127.0.0.1",
+            parsed.port or 6379,
+            int(parsed.path.lstrip("/") or 0),
+            parsed.password,
+        )
+    raise ValueError(f"Unsupported STUDYGENIE_CACHE_URL: {url}")
+
+
+_cache: CacheBackend | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> CacheBackend:
+    """The process-wide cache configured by `STUDYGENIE_CACHE_URL`."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_cache(os.getenv("STUDYGENIE_CACHE_URL", "memory://"))
+    return _cache
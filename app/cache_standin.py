@@ -0,0 +1,100 @@
+"""Tiny in-memory Redis stand-in for local multi-process testing.
+
+Implements the RESP commands `app.cache.RedisCache` uses (PING, GET, SET
+with EX/PX, DEL, SELECT, AUTH, FLUSHALL). Run it with
+`python -m app.cache_standin --port 6380` and set
+`STUDYGENIE_CACHE_URL=redis://127.0.0.1:6380/0`.
+"""
+
+import time
+import asyncio
+import argparse
+
+
+class StandInStore:
+    def __init__(self):
+        self.data: dict[bytes, tuple[bytes, float | None]] = {}
+
+    def get(self, key: bytes) -> bytes | None:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] < time.time():
+            del self.data[key]
+            return None
+        return entry[0]
+
+    def execute(self, args: list[bytes]) -> bytes:
+        command = args[0].upper()
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command in (b"SELECT", b"AUTH"):
+            return b"+OK\r\n"
+        if command == b"FLUSHALL":
+            self.data.clear()
+            return b"+OK\r\n"
+        if command == b"GET":
+            value = self.get(args[1])
+            if value is None:
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            expires_at = None
+            options = [a.upper() for a in args[3:]]
+            if b"EX" in options:
+                expires_at = time.time() + int(args[3 + options.index(b"EX") + 1])
+            if b"PX" in options:
+                expires_at = (
+                    time.time() + int(args[3 + options.index(b"PX") + 1]) / 1000
+                )
+            self.data[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            removed = sum(self.data.pop(key, None) is not None for key in args[1:])
+            return b":%d\r\n" % removed
+        return b"-ERR unknown command '%s'\r\n" % args[0]
+
+
+async def _read_command(reader: asyncio.StreamReader) -> list[bytes] | None:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        length = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+async def serve(host: str = "127.0.0.1", port: int = 6380):
+    store = StandInStore()
+
+    async def handle(reader, writer):
+        try:
+            while (args := await _read_command(reader)) is not None:
+                if args:
+                    writer.write(store.execute(args))
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def _main(host: str, port: int):
+    server = await serve(host, port)
+    print(f"Cache stand-in listening on redis://{host}:{port}/0")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.port))
@@ -0,0 +1,56 @@
+"""JSON codec used for AI responses and history payloads.
+
+Uses orjson when it is installed and falls back to the stdlib `json`
+module. Set `STUDYGENIE_JSON_CODEC=json` to force the stdlib codec.
+"""
+
+import os
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+def _json_dumps(obj) -> str:
+    return json.dumps(obj)
+
+
+def _orjson_loads(data):
+    return orjson.loads(data)
+
+
+def _orjson_dumps(obj) -> str:
+    try:
+        return orjson.dumps(obj).decode("utf-8")
+    except TypeError:
+        return json.dumps(obj)
+
+
+BACKENDS = {"json": (_json_loads, _json_dumps)}
+if orjson is not None:
+    BACKENDS["orjson"] = (_orjson_loads, _orjson_dumps)
+
+JSONDecodeError = json.JSONDecodeError
+backend = ""
+loads = _json_loads
+dumps = _json_dumps
+
+
+def set_backend(name: str):
+    """Switch the module-level `loads`/`dumps` to the named backend."""
+    global backend, loads, dumps
+    if name not in BACKENDS:
+        raise ValueError(f"JSON codec '{name}' is not available.")
+    backend = name
+    loads, dumps = BACKENDS[name]
+
+
+set_backend(
+    os.getenv("STUDYGENIE_JSON_CODEC") or ("orjson" if orjson is not None else "json")
+)
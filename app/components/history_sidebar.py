@@ -1,8 +1,8 @@
 import reflex as rx
-from app.state import StudyGenieState, GeneratedContentHistory
+from app.state import StudyGenieState, HistoryEntry
 
 
-def history_item(item: GeneratedContentHistory) -> rx.Component:
+def history_item(item: HistoryEntry) -> rx.Component:
     return rx.el.button(
         rx.el.div(
             rx.el.p(
@@ -23,8 +23,8 @@ def history_item(item: GeneratedContentHistory) -> rx.Component:
             ),
             class_name="w-full text-left",
         ),
-        on_click=lambda: StudyGenieState.load_from_history(item),
-        class_name="w-full p-2 rounded-lg hover:bg-gray-100 transition-colors",
+        on_click=lambda: StudyGenieState.load_from_history(item.id),
+        class_name="w-full p-2 rounded-lg hover:bg-gray-100 transition-colors [content-visibility:auto] [contain-intrinsic-size:auto_56px]",
     )
 
 
@@ -38,7 +38,17 @@ def history_sidebar() -> rx.Component:
             rx.el.div(
                 rx.cond(
                     StudyGenieState.history.length() > 0,
-                    rx.foreach(StudyGenieState.history, history_item),
+                    rx.fragment(
+                        rx.foreach(StudyGenieState.history, history_item),
+                        rx.cond(
+                            StudyGenieState.history_has_more,
+                            rx.el.button(
+                                "Load more",
+                                on_click=StudyGenieState.load_more_history,
+                                class_name="w-full p-2 text-sm font-medium text-indigo-600 hover:bg-gray-100 rounded-lg",
+                            ),
+                        ),
+                    ),
                     rx.el.div(
                         rx.icon(tag="history", class_name="h-8 w-8 text-gray-400"),
                         rx.el.p(
@@ -1,5 +1,5 @@
 import reflex as rx
-from app.state import StudyGenieState
+from app.state import MAX_UPLOAD_FILES, StudyGenieState
 from app.components.sidebar import sidebar
 from app.components.history_sidebar import history_sidebar
 
@@ -12,19 +12,22 @@ def user_input_form() -> rx.Component:
                 rx.el.div(
                     rx.icon(tag="cloud_upload", class_name="h-8 w-8 text-gray-400"),
                     rx.el.p(
-                        "Click or drag & drop an image to upload",
+                        "Click or drag & drop page images or documents (PDF, TXT, MD) to upload",
                         class_name="text-sm text-gray-500",
                     ),
                     class_name="text-center p-6 border-2 border-dashed border-gray-200 rounded-lg cursor-pointer hover:bg-gray-50 transition-colors",
                 ),
                 id="upload_image",
-                multiple=False,
+                multiple=True,
                 accept={
                     "image/png": [".png"],
                     "image/jpeg": [".jpg", ".jpeg"],
                     "image/webp": [".webp"],
+                    "application/pdf": [".pdf"],
+                    "text/plain": [".txt"],
+                    "text/markdown": [".md"],
                 },
-                max_files=1,
+                max_files=MAX_UPLOAD_FILES,
                 class_name="w-full mb-4",
             ),
             rx.foreach(
@@ -33,19 +36,25 @@ def user_input_form() -> rx.Component:
                     file, class_name="p-2 bg-indigo-50 rounded border text-sm"
                 ),
             ),
-            rx.cond(
-                StudyGenieState.image != "",
-                rx.el.div(
-                    rx.image(
-                        src=rx.get_upload_url(StudyGenieState.image),
-                        height="100px",
-                        class_name="rounded-lg",
+            rx.foreach(
+                StudyGenieState.uploads,
+                lambda upload: rx.el.div(
+                    rx.cond(
+                        upload.lower().endswith(".pdf")
+                        | upload.lower().endswith(".txt")
+                        | upload.lower().endswith(".md"),
+                        rx.icon(tag="file-text", class_name="h-10 w-10 text-gray-400"),
+                        rx.image(
+                            src=rx.get_upload_url(upload),
+                            height="100px",
+                            class_name="rounded-lg",
+                        ),
                     ),
-                    rx.el.p(StudyGenieState.image, class_name="text-sm truncate"),
+                    rx.el.p(upload, class_name="text-sm truncate"),
                     rx.icon(
                         tag="circle_x",
                         class_name="cursor-pointer text-gray-500 hover:text-red-500",
-                        on_click=lambda: StudyGenieState.set_image(""),
+                        on_click=lambda: StudyGenieState.remove_upload(upload),
                     ),
                     class_name="flex items-center justify-between gap-4 mb-4 p-2 border rounded-lg bg-gray-50",
                 ),
@@ -105,6 +114,15 @@ def output_display() -> rx.Component:
                     class_name="h-3 bg-gray-200 rounded w-full mb-4 animate-pulse"
                 ),
                 rx.el.div(class_name="h-3 bg-gray-200 rounded w-1/2 animate-pulse"),
+                rx.el.div(
+                    rx.el.button(
+                        rx.icon(tag="circle_x", class_name="mr-2 h-4 w-4"),
+                        "Cancel",
+                        on_click=StudyGenieState.cancel_generation,
+                        class_name="text-gray-600 font-medium px-4 py-2 rounded-lg border border-gray-200 hover:bg-gray-50 flex items-center",
+                    ),
+                    class_name="flex justify-end mt-4",
+                ),
                 class_name="p-6 border border-gray-100 rounded-xl shadow-sm",
             ),
             rx.el.div(
@@ -134,7 +152,7 @@ def output_display() -> rx.Component:
                     ),
                 ),
                 class_name=rx.cond(
-                    StudyGenieState.generated_content != "",
+                    StudyGenieState.has_content,
                     "transition-opacity duration-300 opacity-100",
                     "opacity-0",
                 ),
@@ -1,6 +1,18 @@
 import reflex as rx
+from reflex.experimental.client_state import ClientStateVar
 from app.state import StudyGenieState, QuizQuestion, Flashcard
 
+# Quiz selections and flashcard flips live in the browser, keyed by
+# "<quiz_version or flashcards_version>:<index>" so new content for the mode
+# starts fresh while switching to another mode and back keeps them. Only the
+# final answer sheet is sent to the server, via `StudyGenieState.submit_quiz`.
+quiz_answers = ClientStateVar.create("quiz_answers", {})
+flipped_cards = ClientStateVar.create("flipped_cards", {})
+
+
+def _client_key(version, index) -> rx.Var:
+    return rx.Var.create(f"{version}:{index}")
+
 
 def download_buttons() -> rx.Component:
     return rx.el.div(
@@ -28,7 +40,7 @@ def download_buttons() -> rx.Component:
 
 def notes_display() -> rx.Component:
     """Display for generated notes."""
-    content = StudyGenieState.generated_content.to(dict)
+    content = StudyGenieState.notes
     return rx.el.div(
         rx.el.div(
             rx.el.h2(
@@ -39,7 +51,7 @@ def notes_display() -> rx.Component:
         ),
         rx.el.ul(
             rx.foreach(
-                content.get("bullets", []).to(list[str]),
+                content["bullets"],
                 lambda bullet: rx.el.li(
                     rx.markdown(bullet), class_name="mb-2 list-disc ml-5"
                 ),
@@ -48,7 +60,7 @@ def notes_display() -> rx.Component:
         ),
         rx.el.div(
             rx.icon(tag="lightbulb", class_name="mr-2 h-5 w-5 text-yellow-500"),
-            rx.el.p(content.get("mnemonic"), class_name="font-medium"),
+            rx.el.p(content["mnemonic"], class_name="font-medium"),
             class_name="mt-4 p-3 bg-yellow-50 border border-yellow-200 rounded-lg flex items-center",
         ),
         class_name="p-6 border border-gray-100 rounded-xl bg-white shadow-sm",
@@ -57,7 +69,7 @@ def notes_display() -> rx.Component:
 
 def summary_display() -> rx.Component:
     """Display for generated summary."""
-    content = StudyGenieState.generated_content.to(dict)
+    content = StudyGenieState.summary
     return rx.el.div(
         rx.el.div(
             rx.el.h2(
@@ -71,7 +83,7 @@ def summary_display() -> rx.Component:
         rx.el.h3("Key Takeaways", class_name="font-semibold text-gray-800 mb-2"),
         rx.el.ol(
             rx.foreach(
-                content["takeaways"].to(list[str]),
+                content["takeaways"],
                 lambda takeaway: rx.el.li(
                     takeaway, class_name="mb-1 list-decimal ml-5"
                 ),
@@ -84,7 +96,7 @@ def summary_display() -> rx.Component:
 
 def explain_display() -> rx.Component:
     """Display for generated explanation."""
-    content = StudyGenieState.generated_content.to(dict)
+    content = StudyGenieState.explanation
     return rx.el.div(
         rx.el.div(
             rx.el.h2(
@@ -99,7 +111,7 @@ def explain_display() -> rx.Component:
         ),
         rx.el.ol(
             rx.foreach(
-                content["steps"].to(list[str]),
+                content["steps"],
                 lambda step: rx.el.li(step, class_name="mb-1 list-decimal ml-5"),
             ),
             class_name="mb-4 text-gray-700 leading-relaxed",
@@ -117,6 +129,9 @@ def explain_display() -> rx.Component:
 
 def quiz_question_card(question: QuizQuestion, index: int) -> rx.Component:
     """A single card for a quiz question."""
+    key = _client_key(StudyGenieState.quiz_version, index)
+    answers = quiz_answers.value.to(dict)
+    selected_option = answers[key]
     return rx.el.div(
         rx.el.p(
             f"{index + 1}. {question['question']}", class_name="font-semibold mb-3"
@@ -129,7 +144,7 @@ def quiz_question_card(question: QuizQuestion, index: int) -> rx.Component:
                         rx.el.div(
                             rx.el.div(
                                 class_name=rx.cond(
-                                    question["selected_option"] == opt_index,
+                                    selected_option == opt_index,
                                     "h-2.5 w-2.5 rounded-full bg-indigo-500",
                                     "",
                                 )
@@ -139,11 +154,11 @@ def quiz_question_card(question: QuizQuestion, index: int) -> rx.Component:
                         rx.el.span(option),
                         class_name="flex items-center gap-3",
                     ),
-                    on_click=lambda: StudyGenieState.select_quiz_option(
-                        index, opt_index
+                    on_click=quiz_answers.set_value(
+                        answers.merge(rx.Var.create({key: opt_index}))
                     ),
                     class_name=rx.cond(
-                        question["selected_option"] == opt_index,
+                        selected_option == opt_index,
                         "w-full text-left p-3 rounded-lg border-2 border-indigo-500 bg-indigo-50",
                         "w-full text-left p-3 rounded-lg border hover:bg-gray-50",
                     ),
@@ -152,9 +167,9 @@ def quiz_question_card(question: QuizQuestion, index: int) -> rx.Component:
             class_name="grid grid-cols-1 md:grid-cols-2 gap-3",
         ),
         rx.cond(
-            question["selected_option"].is_not_none(),
+            answers.contains(key),
             rx.cond(
-                question["selected_option"] == question["correct_answer"],
+                selected_option == question["correct_answer"],
                 rx.el.div(
                     rx.icon(tag="check_check", class_name="h-5 w-5 mr-2"),
                     "Correct!",
@@ -173,8 +188,8 @@ def quiz_question_card(question: QuizQuestion, index: int) -> rx.Component:
 
 def quiz_display() -> rx.Component:
     """Display for generated quiz."""
-    content = StudyGenieState.generated_content.to(dict)
     return rx.el.div(
+        quiz_answers,
         rx.el.div(
             rx.el.h2(
                 f"Quiz on '{StudyGenieState.user_input}'",
@@ -183,28 +198,51 @@ def quiz_display() -> rx.Component:
             download_buttons(),
             class_name="flex justify-between items-start mb-4",
         ),
-        rx.foreach(content["questions"].to(list[QuizQuestion]), quiz_question_card),
+        rx.foreach(StudyGenieState.quiz_questions, quiz_question_card),
+        rx.el.div(
+            rx.el.button(
+                "Submit answers",
+                on_click=quiz_answers.retrieve(callback=StudyGenieState.submit_quiz),
+                class_name="px-4 py-2 bg-indigo-600 text-white font-semibold rounded-lg hover:bg-indigo-700",
+            ),
+            rx.el.button(
+                rx.icon(tag="shuffle", class_name="h-4 w-4 mr-2"),
+                "New attempt",
+                on_click=StudyGenieState.retake_quiz,
+                class_name="flex items-center px-4 py-2 border font-semibold rounded-lg hover:bg-gray-50",
+            ),
+            rx.el.span(
+                f"Drawn from a bank of {StudyGenieState.quiz_bank_size} questions",
+                class_name="text-sm text-gray-500",
+            ),
+            class_name="flex items-center gap-4",
+        ),
     )
 
 
 def flashcard_item(card: Flashcard, index: int) -> rx.Component:
     """A single flashcard item."""
+    key = _client_key(StudyGenieState.flashcards_version, index)
+    flipped = flipped_cards.value.to(dict)
+    is_flipped = flipped[key].to(bool)
     return rx.el.div(
         rx.el.div(
             rx.cond(
-                card["flipped"],
+                is_flipped,
                 rx.el.div(card["answer"], class_name="p-4 text-center"),
                 rx.el.div(card["question"], class_name="p-4 text-center font-semibold"),
             ),
             class_name=rx.cond(
-                card["flipped"],
+                is_flipped,
                 "absolute w-full h-full [transform:rotateY(180deg)] [backface-visibility:hidden] flex items-center justify-center bg-gray-100 rounded-xl",
                 "absolute w-full h-full [backface-visibility:hidden] flex items-center justify-center bg-white rounded-xl",
             ),
         ),
-        on_click=lambda: StudyGenieState.flip_flashcard(index),
+        on_click=flipped_cards.set_value(
+            flipped.merge(rx.Var.create({key: ~is_flipped}))
+        ),
         class_name=rx.cond(
-            card["flipped"],
+            is_flipped,
             "relative w-full h-32 [transform-style:preserve-3d] transition-transform duration-500 [transform:rotateY(180deg)] cursor-pointer shadow-sm border rounded-xl",
             "relative w-full h-32 [transform-style:preserve-3d] transition-transform duration-500 cursor-pointer shadow-sm border rounded-xl",
         ),
@@ -213,8 +251,8 @@ def flashcard_item(card: Flashcard, index: int) -> rx.Component:
 
 def flashcards_display() -> rx.Component:
     """Display for generated flashcards."""
-    content = StudyGenieState.generated_content.to(dict)
     return rx.el.div(
+        flipped_cards,
         rx.el.div(
             rx.el.h2(
                 f"Flashcards for '{StudyGenieState.user_input}'",
@@ -224,7 +262,7 @@ def flashcards_display() -> rx.Component:
             class_name="flex justify-between items-start mb-4",
         ),
         rx.el.div(
-            rx.foreach(content["cards"].to(list[Flashcard]), flashcard_item),
+            rx.foreach(StudyGenieState.flashcards, flashcard_item),
             class_name="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4 [perspective:1000px]",
         ),
-    )
\ No newline at end of file
+    )
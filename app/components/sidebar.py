@@ -72,6 +72,15 @@ def sidebar() -> rx.Component:
                 nav_item(
                     "layers", "Flashcards", StudyGenieState.current_mode == "Flashcards"
                 ),
+                rx.link(
+                    rx.el.div(
+                        rx.icon(tag="repeat", class_name="h-5 w-5"),
+                        rx.el.span("Review", class_name="font-medium"),
+                        class_name="flex items-center gap-3 rounded-lg px-3 py-2 text-gray-500 transition-all hover:text-gray-900",
+                    ),
+                    href="/review",
+                    underline="none",
+                ),
                 class_name="flex-1 overflow-auto py-4 flex flex-col items-start px-4 text-sm font-medium gap-1",
             ),
             user_profile(),
@@ -5,7 +5,12 @@ import logging
 import os
 from typing import TypedDict
 import asyncio
+import time
+import zlib
+from contextlib import contextmanager
 from sqlalchemy import text
+from app import codec, metrics
+from app.cache import get_cache
 
 
 class User(TypedDict):
@@ -20,15 +25,100 @@ class GeneratedContentHistory(TypedDict):
     id: int
     topic: str
     mode: str
-    content: str
+    content: str | None
     created_at: str
     user_id: int
 
 
-def _create_db_and_tables_sync():
-    """Synchronous function to create database and tables."""
+class HistoryEntry(TypedDict):
+    """A history row without its content, as listed in the sidebar."""
+
+    id: int
+    topic: str
+    mode: str
+    created_at: str
+
+
+class ReviewCard(TypedDict):
+    id: int
+    question: str
+    answer: str
+    ease: float
+    interval_days: float
+    repetitions: int
+    due_at: float
+
+
+class UsageStats(TypedDict):
+    mode: str
+    generations: int
+    prompt_tokens: int
+    completion_tokens: int
+    quiz_attempts: int
+    quiz_questions: int
+    quiz_correct: int
+    quiz_accuracy: float
+    failed_generations: int
+
+
+class PopularTopic(TypedDict):
+    mode: str
+    topic: str
+    hits: int
+
+
+class GenerationJob(TypedDict):
+    id: int
+    user_id: int
+    mode: str
+    topic: str
+    user_input: str
+    uploads: list[str]
+    status: str
+    attempts: int
+    history_id: int | None
+    error: str | None
+    created_at: str
+    # Message for the user about a job that succeeded, e.g. a truncated upload
+    notice: str | None
+
+
+HISTORY_CACHE_TTL = float(os.getenv("STUDYGENIE_HISTORY_CACHE_TTL", "300"))
+HISTORY_PAGE_SIZE = int(os.getenv("STUDYGENIE_HISTORY_PAGE_SIZE", "50"))
+
+
+def _cached_lookup(key: str, ttl: float, load, shared_only: bool = False):
+    """Read-through lookup in the shared cache; misses (None) are not cached.
+
+    `shared_only` lookups bypass a per-process cache, because writes made by
+    other worker processes could not invalidate it.
+    """
+    cache = get_cache()
+    if shared_only and not cache.shared:
+        return load()
+    cached = cache.get_json(key, namespace=key.split(":", 1)[0])
+    if cached is not None:
+        return cached
+    value = load()
+    if value is not None:
+        cache.set_json(key, value, ttl)
+    return value
+
+
+@contextmanager
+def _connect(operation: str):
+    """Open a connection, recording acquire time and query time for `operation`."""
     engine = rx.Model.get_db_engine()
+    start = time.perf_counter()
     with engine.connect() as conn:
+        metrics.DB_ACQUIRE.observe(time.perf_counter() - start, operation=operation)
+        with metrics.span("db.query", operation=operation):
+            yield conn
+
+
+def _create_db_and_tables_sync():
+    """Synchronous function to create database and tables."""
+    with _connect("create_db_and_tables") as conn:
         try:
             conn.exec_driver_sql("""
                 CREATE TABLE IF NOT EXISTS users (
@@ -47,9 +137,173 @@ def _create_db_and_tables_sync():
                     content TEXT NOT NULL,
                     created_at TEXT NOT NULL,
                     user_id INTEGER NOT NULL,
+                    from_uploads INTEGER NOT NULL DEFAULT 0,
                     FOREIGN KEY (user_id) REFERENCES users(id)
                 );
                 """)
+            conn.exec_driver_sql("""
+                CREATE TABLE IF NOT EXISTS generation_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    mode TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    user_input TEXT NOT NULL,
+                    image TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    history_id INTEGER,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    claimed_at REAL,
+                    worker TEXT,
+                    notice TEXT,
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                );
+                """)
+            job_columns = {
+                row[1]
+                for row in conn.exec_driver_sql("PRAGMA table_info(generation_jobs)")
+            }
+            if "notice" not in job_columns:
+                conn.exec_driver_sql(
+                    "ALTER TABLE generation_jobs ADD COLUMN notice TEXT"
+                )
+            history_columns = {
+                row[1]
+                for row in conn.exec_driver_sql(
+                    "PRAGMA table_info(generatedcontenthistory)"
+                )
+            }
+            # Items generated from uploads are flagged so they are not taken
+            # for typed topics; older ones are found through their jobs, or
+            # by the topic given to uploads without typed text.
+            if "from_uploads" not in history_columns:
+                conn.exec_driver_sql(
+                    "ALTER TABLE generatedcontenthistory ADD COLUMN from_uploads INTEGER NOT NULL DEFAULT 0"
+                )
+                conn.exec_driver_sql("""
+                    UPDATE generatedcontenthistory SET from_uploads = 1
+                    WHERE id IN (
+                        SELECT history_id FROM generation_jobs
+                        WHERE history_id IS NOT NULL AND image != ''
+                    )
+                    OR topic LIKE 'Image analysis (%'
+                    OR topic LIKE 'Document analysis (%';
+                    """)
+            conn.exec_driver_sql("""
+                CREATE INDEX IF NOT EXISTS idx_generation_jobs_status
+                ON generation_jobs (status, id);
+                """)
+            conn.exec_driver_sql("""
+                CREATE INDEX IF NOT EXISTS idx_history_created_at
+                ON generatedcontenthistory (created_at);
+                """)
+            conn.exec_driver_sql("""
+                CREATE INDEX IF NOT EXISTS idx_history_user_id
+                ON generatedcontenthistory (user_id, id);
+                """)
+            conn.exec_driver_sql("""
+                CREATE TABLE IF NOT EXISTS review_cards (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    history_id INTEGER NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    ease REAL NOT NULL DEFAULT 2.5,
+                    interval_days REAL NOT NULL DEFAULT 0,
+                    repetitions INTEGER NOT NULL DEFAULT 0,
+                    due_at REAL NOT NULL,
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                );
+                """)
+            conn.exec_driver_sql("""
+                CREATE INDEX IF NOT EXISTS idx_review_cards_due
+                ON review_cards (user_id, due_at);
+                """)
+            # Cards are unique per user. Decks created before that may hold
+            # copies of a card: keep the most reviewed one, then add the index.
+            if not conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'idx_review_cards_question'"
+            ).first():
+                conn.exec_driver_sql("""
+                    DELETE FROM review_cards WHERE id NOT IN (
+                        SELECT id FROM (
+                            SELECT id, ROW_NUMBER() OVER (
+                                PARTITION BY user_id, question
+                                ORDER BY repetitions DESC, id
+                            ) AS copy
+                            FROM review_cards
+                        ) WHERE copy = 1
+                    );
+                    """)
+                conn.exec_driver_sql("""
+                    CREATE UNIQUE INDEX idx_review_cards_question
+                    ON review_cards (user_id, question);
+                    """)
+            conn.exec_driver_sql("""
+                CREATE TABLE IF NOT EXISTS quiz_bank (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    topic_key TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    correct_answer INTEGER NOT NULL,
+                    UNIQUE (user_id, topic_key, question),
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                );
+                """)
+            conn.exec_driver_sql("""
+                CREATE TABLE IF NOT EXISTS usage_rollups (
+                    user_id INTEGER NOT NULL,
+                    mode TEXT NOT NULL,
+                    generations INTEGER NOT NULL DEFAULT 0,
+                    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                    completion_tokens INTEGER NOT NULL DEFAULT 0,
+                    quiz_attempts INTEGER NOT NULL DEFAULT 0,
+                    quiz_questions INTEGER NOT NULL DEFAULT 0,
+                    quiz_correct INTEGER NOT NULL DEFAULT 0,
+                    failed_generations INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, mode)
+                );
+                """)
+            rollup_columns = {
+                row[1]
+                for row in conn.exec_driver_sql("PRAGMA table_info(usage_rollups)")
+            }
+            if "failed_generations" not in rollup_columns:
+                conn.exec_driver_sql(
+                    "ALTER TABLE usage_rollups ADD COLUMN failed_generations INTEGER NOT NULL DEFAULT 0"
+                )
+            conn.exec_driver_sql("""
+                CREATE TABLE IF NOT EXISTS usage_windows (
+                    user_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    bucket_start INTEGER NOT NULL,
+                    amount INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, kind, bucket_start)
+                );
+                """)
+            conn.exec_driver_sql("""
+                CREATE TABLE IF NOT EXISTS user_tiers (
+                    user_id INTEGER PRIMARY KEY,
+                    tier TEXT NOT NULL,
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                );
+                """)
+            conn.exec_driver_sql("""
+                CREATE TABLE IF NOT EXISTS history_archive (
+                    id INTEGER PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    content BLOB NOT NULL
+                );
+                """)
+            conn.exec_driver_sql("""
+                CREATE TABLE IF NOT EXISTS maintenance_locks (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                """)
             conn.commit()
         except Exception as e:
             logging.exception(f"Error creating database tables: {e}")
@@ -59,38 +313,51 @@ async def create_db_and_tables():
     await asyncio.to_thread(_create_db_and_tables_sync)
 
 
+def _insert_history(
+    conn,
+    topic: str,
+    mode: str,
+    content: str,
+    user_id: int,
+    from_uploads: bool = False,
+) -> GeneratedContentHistory | None:
+    """Insert a history item on `conn` without committing."""
+    insert_stmt = text(
+        "INSERT INTO generatedcontenthistory (topic, mode, content, created_at, user_id, from_uploads) VALUES (:topic, :mode, :content, :created_at, :user_id, :from_uploads)"
+    )
+    params = {
+        "topic": topic,
+        "mode": mode,
+        "content": content,
+        "created_at": datetime.datetime.now().isoformat(),
+        "user_id": user_id,
+        "from_uploads": int(from_uploads),
+    }
+    cursor = conn.execute(insert_stmt, params)
+    select_stmt = text("SELECT * FROM generatedcontenthistory WHERE id = :id")
+    row = conn.execute(select_stmt, {"id": cursor.lastrowid}).first()
+    metrics.DB_ROWS.observe(cursor.rowcount, operation="add_history")
+    if row:
+        return GeneratedContentHistory(
+            id=row[0],
+            topic=row[1],
+            mode=row[2],
+            content=row[3],
+            created_at=row[4],
+            user_id=row[5],
+        )
+    return None
+
+
 def _add_history_sync(
     topic: str, mode: str, content: str, user_id: int
 ) -> GeneratedContentHistory | None:
     """Synchronous function to add a history item."""
-    engine = rx.Model.get_db_engine()
-    with engine.connect() as conn:
+    with _connect("add_history") as conn:
         try:
-            insert_stmt = text(
-                "INSERT INTO generatedcontenthistory (topic, mode, content, created_at, user_id) VALUES (:topic, :mode, :content, :created_at, :user_id)"
-            )
-            params = {
-                "topic": topic,
-                "mode": mode,
-                "content": content,
-                "created_at": datetime.datetime.now().isoformat(),
-                "user_id": user_id,
-            }
-            cursor = conn.execute(insert_stmt, params)
+            item = _insert_history(conn, topic, mode, content, user_id)
             conn.commit()
-            new_id = cursor.lastrowid
-            select_stmt = text("SELECT * FROM generatedcontenthistory WHERE id = :id")
-            result = conn.execute(select_stmt, {"id": new_id})
-            row = result.first()
-            if row:
-                return GeneratedContentHistory(
-                    id=row[0],
-                    topic=row[1],
-                    mode=row[2],
-                    content=row[3],
-                    created_at=row[4],
-                    user_id=row[5],
-                )
+            return item
         except Exception as e:
             logging.exception(f"Error adding history: {e}")
     return None
@@ -99,42 +366,116 @@ def _add_history_sync(
 async def add_history(
     topic: str, mode: str, content: str, user_id: int
 ) -> GeneratedContentHistory | None:
-    return await asyncio.to_thread(_add_history_sync, topic, mode, content, user_id)
+    item = await asyncio.to_thread(_add_history_sync, topic, mode, content, user_id)
+    if item:
+        await asyncio.to_thread(get_cache().invalidate, f"history:{user_id}")
+    return item
 
 
-def _get_all_history_sync(user_id: int) -> list[GeneratedContentHistory]:
-    """Synchronous function to get all history items for a user."""
-    engine = rx.Model.get_db_engine()
-    with engine.connect() as conn:
+def _get_history_page_sync(
+    user_id: int, before_id: int | None, limit: int
+) -> list[HistoryEntry]:
+    """Newest-first page of history entries with `id < before_id`."""
+    with _connect("get_history_page") as conn:
         try:
             stmt = text(
-                "SELECT id, topic, mode, content, created_at, user_id FROM generatedcontenthistory WHERE user_id = :user_id ORDER BY created_at DESC"
+                "SELECT id, topic, mode, created_at FROM generatedcontenthistory WHERE user_id = :user_id AND id < :before_id ORDER BY id DESC LIMIT :limit"
+            )
+            result = conn.execute(
+                stmt,
+                {
+                    "user_id": user_id,
+                    "before_id": before_id if before_id is not None else 2**63 - 1,
+                    "limit": limit,
+                },
             )
-            result = conn.execute(stmt, {"user_id": user_id})
             rows = result.fetchall()
+            metrics.DB_ROWS.observe(len(rows), operation="get_history_page")
             return [
-                GeneratedContentHistory(
+                HistoryEntry(id=row[0], topic=row[1], mode=row[2], created_at=row[3])
+                for row in rows
+            ]
+        except Exception as e:
+            logging.exception(f"Error fetching history: {e}")
+            return []
+
+
+async def get_history_page(
+    user_id: int, before_id: int | None = None, limit: int = HISTORY_PAGE_SIZE
+) -> list[HistoryEntry]:
+    """Keyset-paginated history; only the newest default-size page is cached."""
+    if before_id is not None or limit != HISTORY_PAGE_SIZE:
+        return await asyncio.to_thread(
+            _get_history_page_sync, user_id, before_id, limit
+        )
+    return await asyncio.to_thread(
+        _cached_lookup,
+        f"history:{user_id}",
+        HISTORY_CACHE_TTL,
+        lambda: _get_history_page_sync(user_id, None, limit),
+        True,
+    )
+
+
+def _get_history_item_sync(
+    item_id: int, user_id: int
+) -> GeneratedContentHistory | None:
+    with _connect("get_history_item") as conn:
+        try:
+            stmt = text(
+                "SELECT id, topic, mode, content, created_at, user_id FROM generatedcontenthistory WHERE id = :id AND user_id = :user_id"
+            )
+            row = conn.execute(stmt, {"id": item_id, "user_id": user_id}).first()
+            metrics.DB_ROWS.observe(1 if row else 0, operation="get_history_item")
+            if row:
+                content = row[3] or _restore_archived(conn, row[0])
+                return GeneratedContentHistory(
                     id=row[0],
                     topic=row[1],
                     mode=row[2],
-                    content=row[3],
+                    content=content,
                     created_at=row[4],
                     user_id=row[5],
                 )
-                for row in rows
-            ]
         except Exception as e:
-            logging.exception(f"Error fetching history: {e}")
-            return []
+            logging.exception(f"Error fetching history item: {e}")
+    return None
+
 
+def _restore_archived(conn, item_id: int) -> str | None:
+    """Move an archived item's content back into the hot table.
 
-async def get_all_history(user_id: int) -> list[GeneratedContentHistory]:
-    return await asyncio.to_thread(_get_all_history_sync, user_id)
+    Returns None if the item has no archived copy to restore.
+    """
+    row = conn.execute(
+        text("SELECT content FROM history_archive WHERE id = :id"), {"id": item_id}
+    ).first()
+    if row is None:
+        return None
+    content = zlib.decompress(row[0]).decode("utf-8")
+    conn.execute(
+        text("UPDATE generatedcontenthistory SET content = :content WHERE id = :id"),
+        {"id": item_id, "content": content},
+    )
+    conn.execute(text("DELETE FROM history_archive WHERE id = :id"), {"id": item_id})
+    conn.commit()
+    metrics.HISTORY_RESTORES.inc()
+    return content
+
+
+async def get_history_item(
+    item_id: int, user_id: int
+) -> GeneratedContentHistory | None:
+    return await asyncio.to_thread(
+        _cached_lookup,
+        f"history_item:{user_id}:{item_id}",
+        HISTORY_CACHE_TTL,
+        lambda: _get_history_item_sync(item_id, user_id),
+    )
 
 
 def _add_user_sync(username: str, email: str, password_hash: str) -> User | None:
-    engine = rx.Model.get_db_engine()
-    with engine.connect() as conn:
+    with _connect("add_user") as conn:
         try:
             stmt = text(
                 "INSERT INTO users (username, email, password_hash, created_at) VALUES (:username, :email, :password_hash, :created_at)"
@@ -151,6 +492,7 @@ def _add_user_sync(username: str, email: str, password_hash: str) -> User | None
             select_stmt = text("SELECT * FROM users WHERE id = :id")
             result = conn.execute(select_stmt, {"id": new_id})
             row = result.first()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="add_user")
             if row:
                 return User(
                     id=row[0],
@@ -169,12 +511,12 @@ async def add_user(username: str, email: str, password_hash: str) -> User | None
 
 
 def _get_user_by_email_sync(email: str) -> User | None:
-    engine = rx.Model.get_db_engine()
-    with engine.connect() as conn:
+    with _connect("get_user_by_email") as conn:
         try:
             stmt = text("SELECT * FROM users WHERE email = :email")
             result = conn.execute(stmt, {"email": email})
             row = result.first()
+            metrics.DB_ROWS.observe(1 if row else 0, operation="get_user_by_email")
             if row:
                 return User(
                     id=row[0],
@@ -193,12 +535,12 @@ async def get_user_by_email(email: str) -> User | None:
 
 
 def _get_user_by_username_sync(username: str) -> User | None:
-    engine = rx.Model.get_db_engine()
-    with engine.connect() as conn:
+    with _connect("get_user_by_username") as conn:
         try:
             stmt = text("SELECT * FROM users WHERE username = :username")
             result = conn.execute(stmt, {"username": username})
             row = result.first()
+            metrics.DB_ROWS.observe(1 if row else 0, operation="get_user_by_username")
             if row:
                 return User(
                     id=row[0],
@@ -213,4 +555,839 @@ def _get_user_by_username_sync(username: str) -> User | None:
 
 
 async def get_user_by_username(username: str) -> User | None:
-    return await asyncio.to_thread(_get_user_by_username_sync, username)
\ No newline at end of file
+    return await asyncio.to_thread(_get_user_by_username_sync, username)
+
+_JOB_COLUMNS = "id, user_id, mode, topic, user_input, image, status, attempts, history_id, error, created_at, notice"
+
+
+def _job_from_row(row) -> GenerationJob:
+    return GenerationJob(
+        id=row[0],
+        user_id=row[1],
+        mode=row[2],
+        topic=row[3],
+        user_input=row[4],
+        uploads=row[5].split("\n") if row[5] else [],
+        status=row[6],
+        attempts=row[7],
+        history_id=row[8],
+        error=row[9],
+        created_at=row[10],
+        notice=row[11],
+    )
+
+
+def _enqueue_job_sync(
+    user_id: int, mode: str, topic: str, user_input: str, uploads: list[str]
+) -> GenerationJob | None:
+    with _connect("enqueue_job") as conn:
+        try:
+            stmt = text(
+                f"INSERT INTO generation_jobs (user_id, mode, topic, user_input, image, status, created_at) VALUES (:user_id, :mode, :topic, :user_input, :image, 'queued', :created_at) RETURNING {_JOB_COLUMNS}"
+            )
+            row = conn.execute(
+                stmt,
+                {
+                    "user_id": user_id,
+                    "mode": mode,
+                    "topic": topic,
+                    "user_input": user_input,
+                    "image": "\n".join(uploads),
+                    "created_at": datetime.datetime.now().isoformat(),
+                },
+            ).first()
+            conn.commit()
+            metrics.DB_ROWS.observe(1, operation="enqueue_job")
+            return _job_from_row(row)
+        except Exception as e:
+            logging.exception(f"Error enqueuing generation job: {e}")
+    return None
+
+
+async def enqueue_job(
+    user_id: int,
+    mode: str,
+    topic: str,
+    user_input: str,
+    uploads: list[str] | None = None,
+) -> GenerationJob | None:
+    """Queue a generation; `uploads` file names are stored newline-separated."""
+    return await asyncio.to_thread(
+        _enqueue_job_sync, user_id, mode, topic, user_input, uploads or []
+    )
+
+
+def _claim_job_sync(
+    worker: str, lease_seconds: float, max_attempts: int
+) -> GenerationJob | None:
+    """Atomically take the oldest queued job, or one whose lease expired."""
+    with _connect("claim_job") as conn:
+        try:
+            now = time.time()
+            stmt = text(
+                f"""UPDATE generation_jobs
+                SET status = 'running', attempts = attempts + 1, claimed_at = :now, worker = :worker
+                WHERE id = (
+                    SELECT id FROM generation_jobs
+                    WHERE (status = 'queued' OR (status = 'running' AND claimed_at < :expired))
+                    AND attempts < :max_attempts
+                    ORDER BY id LIMIT 1
+                )
+                RETURNING {_JOB_COLUMNS}"""
+            )
+            row = conn.execute(
+                stmt,
+                {
+                    "now": now,
+                    "worker": worker,
+                    "expired": now - lease_seconds,
+                    "max_attempts": max_attempts,
+                },
+            ).first()
+            conn.commit()
+            metrics.DB_ROWS.observe(1 if row else 0, operation="claim_job")
+            if row:
+                return _job_from_row(row)
+        except Exception as e:
+            logging.exception(f"Error claiming generation job: {e}")
+    return None
+
+
+async def claim_job(
+    worker: str, lease_seconds: float, max_attempts: int
+) -> GenerationJob | None:
+    return await asyncio.to_thread(
+        _claim_job_sync, worker, lease_seconds, max_attempts
+    )
+
+
+def _finish_job_sync(
+    job_id: int, worker: str, status: str, history_id: int | None, error: str | None
+) -> bool:
+    with _connect("finish_job") as conn:
+        try:
+            stmt = text(
+                "UPDATE generation_jobs SET status = :status, history_id = :history_id, error = :error WHERE id = :id AND worker = :worker AND status = 'running'"
+            )
+            cursor = conn.execute(
+                stmt,
+                {
+                    "id": job_id,
+                    "worker": worker,
+                    "status": status,
+                    "history_id": history_id,
+                    "error": error,
+                },
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="finish_job")
+            return cursor.rowcount == 1
+        except Exception as e:
+            logging.exception(f"Error finishing generation job: {e}")
+    return False
+
+
+async def finish_job(
+    job_id: int,
+    worker: str,
+    status: str,
+    history_id: int | None = None,
+    error: str | None = None,
+) -> bool:
+    """Finish a running job; False if `worker` no longer holds its claim."""
+    return await asyncio.to_thread(
+        _finish_job_sync, job_id, worker, status, history_id, error
+    )
+
+
+def _complete_job_sync(
+    job_id: int,
+    worker: str,
+    topic: str,
+    mode: str,
+    content: str,
+    user_id: int,
+    notice: str | None,
+    from_uploads: bool,
+) -> GeneratedContentHistory | None:
+    """Mark a job done and save its history item in one transaction.
+
+    Nothing is saved if the job was cancelled or `worker` lost its claim.
+    """
+    with _connect("complete_job") as conn:
+        try:
+            cursor = conn.execute(
+                text(
+                    "UPDATE generation_jobs SET status = 'done' WHERE id = :id AND worker = :worker AND status = 'running'"
+                ),
+                {"id": job_id, "worker": worker},
+            )
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="complete_job")
+            if cursor.rowcount != 1:
+                conn.rollback()
+                return None
+            item = _insert_history(conn, topic, mode, content, user_id, from_uploads)
+            if item is None:
+                conn.rollback()
+                return None
+            conn.execute(
+                text(
+                    "UPDATE generation_jobs SET history_id = :history_id, notice = :notice WHERE id = :id"
+                ),
+                {"id": job_id, "history_id": item["id"], "notice": notice},
+            )
+            conn.commit()
+            return item
+        except Exception as e:
+            logging.exception(f"Error completing generation job: {e}")
+    return None
+
+
+async def complete_job(
+    job_id: int,
+    worker: str,
+    topic: str,
+    mode: str,
+    content: str,
+    user_id: int,
+    notice: str | None = None,
+    from_uploads: bool = False,
+) -> GeneratedContentHistory | None:
+    item = await asyncio.to_thread(
+        _complete_job_sync,
+        job_id,
+        worker,
+        topic,
+        mode,
+        content,
+        user_id,
+        notice,
+        from_uploads,
+    )
+    if item:
+        await asyncio.to_thread(get_cache().invalidate, f"history:{user_id}")
+    return item
+
+
+def _renew_job_lease_sync(job_id: int, worker: str) -> bool | None:
+    with _connect("renew_job_lease") as conn:
+        try:
+            cursor = conn.execute(
+                text(
+                    "UPDATE generation_jobs SET claimed_at = :now WHERE id = :id AND worker = :worker AND status = 'running'"
+                ),
+                {"id": job_id, "worker": worker, "now": time.time()},
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="renew_job_lease")
+            return cursor.rowcount == 1
+        except Exception as e:
+            logging.exception(f"Error renewing generation job lease: {e}")
+    return None
+
+
+async def renew_job_lease(job_id: int, worker: str) -> bool | None:
+    """Extend `worker`'s lease on a running job.
+
+    False if the job was cancelled, finished or claimed by another worker;
+    None if the database could not be reached.
+    """
+    return await asyncio.to_thread(_renew_job_lease_sync, job_id, worker)
+
+
+def _job_is_held_sync(job_id: int, worker: str) -> bool | None:
+    with _connect("job_is_held") as conn:
+        try:
+            row = conn.execute(
+                text(
+                    "SELECT 1 FROM generation_jobs WHERE id = :id AND worker = :worker AND status = 'running'"
+                ),
+                {"id": job_id, "worker": worker},
+            ).first()
+            metrics.DB_ROWS.observe(1 if row else 0, operation="job_is_held")
+            return row is not None
+        except Exception as e:
+            logging.exception(f"Error checking generation job lease: {e}")
+    return None
+
+
+async def job_is_held(job_id: int, worker: str) -> bool | None:
+    """Read-only check that `worker` still runs the job; None on DB errors."""
+    return await asyncio.to_thread(_job_is_held_sync, job_id, worker)
+
+
+def _cancel_job_sync(job_id: int, user_id: int) -> bool:
+    with _connect("cancel_job") as conn:
+        try:
+            stmt = text(
+                "UPDATE generation_jobs SET status = 'cancelled' WHERE id = :id AND user_id = :user_id AND status IN ('queued', 'running')"
+            )
+            cursor = conn.execute(stmt, {"id": job_id, "user_id": user_id})
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="cancel_job")
+            return cursor.rowcount == 1
+        except Exception as e:
+            logging.exception(f"Error cancelling generation job: {e}")
+    return False
+
+
+async def cancel_job(job_id: int, user_id: int) -> bool:
+    """Mark a user's queued or running job cancelled; False if it already ended."""
+    return await asyncio.to_thread(_cancel_job_sync, job_id, user_id)
+
+
+def _fail_exhausted_jobs_sync(lease_seconds: float, max_attempts: int) -> int:
+    """Mark jobs whose lease expired on their last attempt as failed."""
+    with _connect("fail_exhausted_jobs") as conn:
+        try:
+            stmt = text(
+                "UPDATE generation_jobs SET status = 'failed', error = 'Gave up after repeated worker failures.' WHERE status = 'running' AND claimed_at < :expired AND attempts >= :max_attempts"
+            )
+            cursor = conn.execute(
+                stmt,
+                {"expired": time.time() - lease_seconds, "max_attempts": max_attempts},
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="fail_exhausted_jobs")
+            return cursor.rowcount
+        except Exception as e:
+            logging.exception(f"Error expiring generation jobs: {e}")
+    return 0
+
+
+async def fail_exhausted_jobs(lease_seconds: float, max_attempts: int) -> int:
+    return await asyncio.to_thread(
+        _fail_exhausted_jobs_sync, lease_seconds, max_attempts
+    )
+
+
+def _get_job_sync(job_id: int) -> GenerationJob | None:
+    with _connect("get_job") as conn:
+        try:
+            stmt = text(f"SELECT {_JOB_COLUMNS} FROM generation_jobs WHERE id = :id")
+            row = conn.execute(stmt, {"id": job_id}).first()
+            metrics.DB_ROWS.observe(1 if row else 0, operation="get_job")
+            if row:
+                return _job_from_row(row)
+        except Exception as e:
+            logging.exception(f"Error fetching generation job: {e}")
+    return None
+
+
+async def get_job(job_id: int) -> GenerationJob | None:
+    return await asyncio.to_thread(_get_job_sync, job_id)
+
+
+def _get_topic_counts_sync(since: str) -> list[PopularTopic]:
+    """Requests per mode and verbatim typed topic since `since`, uploads excluded."""
+    with _connect("get_topic_counts") as conn:
+        try:
+            stmt = text(
+                """SELECT mode, topic, COUNT(*) FROM generatedcontenthistory
+                WHERE created_at >= :since AND from_uploads = 0
+                GROUP BY mode, topic"""
+            )
+            rows = conn.execute(stmt, {"since": since}).fetchall()
+            metrics.DB_ROWS.observe(len(rows), operation="get_topic_counts")
+            return [PopularTopic(mode=row[0], topic=row[1], hits=row[2]) for row in rows]
+        except Exception as e:
+            logging.exception(f"Error counting topics: {e}")
+            return []
+
+
+async def get_topic_counts(since: str) -> list[PopularTopic]:
+    return await asyncio.to_thread(_get_topic_counts_sync, since)
+
+
+def _acquire_lock_sync(name: str, holder: str, ttl_seconds: float) -> bool:
+    """Take a named cross-process lock unless another holder's is still live."""
+    with _connect("acquire_lock") as conn:
+        try:
+            now = time.time()
+            stmt = text(
+                """INSERT INTO maintenance_locks (name, holder, expires_at)
+                VALUES (:name, :holder, :expires_at)
+                ON CONFLICT(name) DO UPDATE SET holder = :holder, expires_at = :expires_at
+                WHERE maintenance_locks.expires_at < :now OR maintenance_locks.holder = :holder"""
+            )
+            cursor = conn.execute(
+                stmt,
+                {
+                    "name": name,
+                    "holder": holder,
+                    "expires_at": now + ttl_seconds,
+                    "now": now,
+                },
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="acquire_lock")
+            return cursor.rowcount == 1
+        except Exception as e:
+            logging.exception(f"Error acquiring lock {name}: {e}")
+    return False
+
+
+async def acquire_lock(name: str, holder: str, ttl_seconds: float) -> bool:
+    return await asyncio.to_thread(_acquire_lock_sync, name, holder, ttl_seconds)
+
+
+def _add_review_cards_sync(user_id: int, history_id: int, cards: list[dict]) -> int:
+    """Store generated flashcards as review cards, due immediately.
+
+    A card the user already has (same question) is skipped, keeping its
+    review progress.
+    """
+    if not cards:
+        return 0
+    with _connect("add_review_cards") as conn:
+        try:
+            stmt = text(
+                "INSERT OR IGNORE INTO review_cards (user_id, history_id, question, answer, due_at) VALUES (:user_id, :history_id, :question, :answer, :due_at)"
+            )
+            now = time.time()
+            cursor = conn.execute(
+                stmt,
+                [
+                    {
+                        "user_id": user_id,
+                        "history_id": history_id,
+                        "question": card["question"],
+                        "answer": card["answer"],
+                        "due_at": now,
+                    }
+                    for card in cards
+                ],
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="add_review_cards")
+            return cursor.rowcount
+        except Exception as e:
+            logging.exception(f"Error adding review cards: {e}")
+    return 0
+
+
+async def add_review_cards(user_id: int, history_id: int, cards: list[dict]) -> int:
+    return await asyncio.to_thread(_add_review_cards_sync, user_id, history_id, cards)
+
+
+def _get_due_cards_sync(user_id: int, now: float, limit: int) -> list[ReviewCard]:
+    """The `limit` most overdue cards, read in order from idx_review_cards_due."""
+    with _connect("get_due_cards") as conn:
+        try:
+            stmt = text(
+                "SELECT id, question, answer, ease, interval_days, repetitions, due_at FROM review_cards WHERE user_id = :user_id AND due_at <= :now ORDER BY due_at LIMIT :limit"
+            )
+            rows = conn.execute(
+                stmt, {"user_id": user_id, "now": now, "limit": limit}
+            ).fetchall()
+            metrics.DB_ROWS.observe(len(rows), operation="get_due_cards")
+            return [
+                ReviewCard(
+                    id=row[0],
+                    question=row[1],
+                    answer=row[2],
+                    ease=row[3],
+                    interval_days=row[4],
+                    repetitions=row[5],
+                    due_at=row[6],
+                )
+                for row in rows
+            ]
+        except Exception as e:
+            logging.exception(f"Error fetching due cards: {e}")
+            return []
+
+
+async def get_due_cards(user_id: int, now: float, limit: int) -> list[ReviewCard]:
+    return await asyncio.to_thread(_get_due_cards_sync, user_id, now, limit)
+
+
+def _update_review_card_sync(
+    card_id: int,
+    user_id: int,
+    ease: float,
+    interval_days: float,
+    repetitions: int,
+    due_at: float,
+) -> bool:
+    with _connect("update_review_card") as conn:
+        try:
+            stmt = text(
+                "UPDATE review_cards SET ease = :ease, interval_days = :interval_days, repetitions = :repetitions, due_at = :due_at WHERE id = :id AND user_id = :user_id"
+            )
+            cursor = conn.execute(
+                stmt,
+                {
+                    "id": card_id,
+                    "user_id": user_id,
+                    "ease": ease,
+                    "interval_days": interval_days,
+                    "repetitions": repetitions,
+                    "due_at": due_at,
+                },
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="update_review_card")
+            return cursor.rowcount == 1
+        except Exception as e:
+            logging.exception(f"Error updating review card: {e}")
+    return False
+
+
+async def update_review_card(
+    card_id: int,
+    user_id: int,
+    ease: float,
+    interval_days: float,
+    repetitions: int,
+    due_at: float,
+) -> bool:
+    return await asyncio.to_thread(
+        _update_review_card_sync,
+        card_id,
+        user_id,
+        ease,
+        interval_days,
+        repetitions,
+        due_at,
+    )
+
+
+def _add_quiz_bank_sync(user_id: int, topic_key: str, questions: list[dict]) -> int:
+    """Add generated questions to the user's bank for a topic."""
+    if not questions:
+        return 0
+    with _connect("add_quiz_bank") as conn:
+        try:
+            stmt = text(
+                "INSERT OR IGNORE INTO quiz_bank (user_id, topic_key, question, options, correct_answer) VALUES (:user_id, :topic_key, :question, :options, :correct_answer)"
+            )
+            cursor = conn.execute(
+                stmt,
+                [
+                    {
+                        "user_id": user_id,
+                        "topic_key": topic_key,
+                        "question": question["question"],
+                        "options": codec.dumps(question["options"]),
+                        "correct_answer": question["correct_answer"],
+                    }
+                    for question in questions
+                ],
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="add_quiz_bank")
+            return cursor.rowcount
+        except Exception as e:
+            logging.exception(f"Error adding quiz bank questions: {e}")
+    return 0
+
+
+async def add_quiz_bank(user_id: int, topic_key: str, questions: list[dict]) -> int:
+    return await asyncio.to_thread(_add_quiz_bank_sync, user_id, topic_key, questions)
+
+
+def _get_quiz_bank_sync(user_id: int, topic_key: str) -> list[dict]:
+    """All banked questions for a topic, looked up by the unique index."""
+    with _connect("get_quiz_bank") as conn:
+        try:
+            stmt = text(
+                "SELECT question, options, correct_answer FROM quiz_bank WHERE user_id = :user_id AND topic_key = :topic_key"
+            )
+            rows = conn.execute(
+                stmt, {"user_id": user_id, "topic_key": topic_key}
+            ).fetchall()
+            metrics.DB_ROWS.observe(len(rows), operation="get_quiz_bank")
+            return [
+                {
+                    "question": row[0],
+                    "options": codec.loads(row[1]),
+                    "correct_answer": row[2],
+                }
+                for row in rows
+            ]
+        except Exception as e:
+            logging.exception(f"Error fetching quiz bank: {e}")
+            return []
+
+
+async def get_quiz_bank(user_id: int, topic_key: str) -> list[dict]:
+    return await asyncio.to_thread(_get_quiz_bank_sync, user_id, topic_key)
+
+
+# Rollup rows with user_id 0 hold the totals across all users.
+GLOBAL_ROLLUP_USER = 0
+_ROLLUP_FIELDS = (
+    "generations",
+    "prompt_tokens",
+    "completion_tokens",
+    "quiz_attempts",
+    "quiz_questions",
+    "quiz_correct",
+    "failed_generations",
+)
+
+
+def _bump_rollups_sync(user_id: int, mode: str, deltas: dict[str, int]):
+    """Add `deltas` to the user's and the global rollup row for `mode`."""
+    values = {field: deltas.get(field, 0) for field in _ROLLUP_FIELDS}
+    with _connect("bump_rollups") as conn:
+        try:
+            stmt = text(
+                f"""INSERT INTO usage_rollups (user_id, mode, {", ".join(_ROLLUP_FIELDS)})
+                VALUES (:user_id, :mode, {", ".join(f":{field}" for field in _ROLLUP_FIELDS)})
+                ON CONFLICT(user_id, mode) DO UPDATE SET {", ".join(f"{field} = {field} + excluded.{field}" for field in _ROLLUP_FIELDS)}"""
+            )
+            cursor = conn.execute(
+                stmt,
+                [
+                    {"user_id": user_id, "mode": mode, **values},
+                    {"user_id": GLOBAL_ROLLUP_USER, "mode": mode, **values},
+                ],
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="bump_rollups")
+        except Exception as e:
+            logging.exception(f"Error updating usage rollups: {e}")
+
+
+async def record_generation(
+    user_id: int,
+    mode: str,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    failed: bool = False,
+):
+    """Count one upstream generation and its tokens, whether it succeeded or not."""
+    await asyncio.to_thread(
+        _bump_rollups_sync,
+        user_id,
+        mode,
+        {
+            "failed_generations" if failed else "generations": 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        },
+    )
+
+
+async def record_quiz_attempt(user_id: int, questions: int, correct: int):
+    await asyncio.to_thread(
+        _bump_rollups_sync,
+        user_id,
+        "Quiz",
+        {"quiz_attempts": 1, "quiz_questions": questions, "quiz_correct": correct},
+    )
+
+
+def _get_usage_stats_sync(user_id: int) -> list[UsageStats]:
+    """Per-mode rollups for one user: a primary-key range read, no history scan."""
+    with _connect("get_usage_stats") as conn:
+        try:
+            stmt = text(
+                f"SELECT mode, {', '.join(_ROLLUP_FIELDS)} FROM usage_rollups WHERE user_id = :user_id ORDER BY mode"
+            )
+            rows = conn.execute(stmt, {"user_id": user_id}).fetchall()
+            metrics.DB_ROWS.observe(len(rows), operation="get_usage_stats")
+            return [
+                UsageStats(
+                    mode=row[0],
+                    generations=row[1],
+                    prompt_tokens=row[2],
+                    completion_tokens=row[3],
+                    quiz_attempts=row[4],
+                    quiz_questions=row[5],
+                    quiz_correct=row[6],
+                    quiz_accuracy=row[6] / row[5] if row[5] else 0.0,
+                    failed_generations=row[7],
+                )
+                for row in rows
+            ]
+        except Exception as e:
+            logging.exception(f"Error fetching usage stats: {e}")
+            return []
+
+
+async def get_usage_stats(user_id: int) -> list[UsageStats]:
+    """Dashboard stats for one user, one entry per mode used."""
+    return await asyncio.to_thread(_get_usage_stats_sync, user_id)
+
+
+async def get_global_usage_stats() -> list[UsageStats]:
+    """Dashboard stats across all users, one entry per mode."""
+    return await asyncio.to_thread(_get_usage_stats_sync, GLOBAL_ROLLUP_USER)
+
+
+def _add_usage_windows_sync(deltas: list[dict], prune_before: float) -> bool:
+    """Add per-bucket usage deltas and drop buckets older than `prune_before`."""
+    with _connect("add_usage_windows") as conn:
+        try:
+            if deltas:
+                conn.execute(
+                    text(
+                        """INSERT INTO usage_windows (user_id, kind, bucket_start, amount)
+                        VALUES (:user_id, :kind, :bucket_start, :amount)
+                        ON CONFLICT(user_id, kind, bucket_start) DO UPDATE SET amount = amount + excluded.amount"""
+                    ),
+                    deltas,
+                )
+            conn.execute(
+                text("DELETE FROM usage_windows WHERE bucket_start < :before"),
+                {"before": prune_before},
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(len(deltas), operation="add_usage_windows")
+            return True
+        except Exception as e:
+            logging.exception(f"Error flushing usage windows: {e}")
+    return False
+
+
+async def add_usage_windows(deltas: list[dict], prune_before: float) -> bool:
+    return await asyncio.to_thread(_add_usage_windows_sync, deltas, prune_before)
+
+
+def _get_usage_windows_sync(user_ids: list[int], since: float) -> list[dict]:
+    with _connect("get_usage_windows") as conn:
+        try:
+            params = {f"user_{i}": user_id for i, user_id in enumerate(user_ids)}
+            stmt = text(
+                f"SELECT user_id, kind, bucket_start, amount FROM usage_windows WHERE user_id IN ({', '.join(f':{name}' for name in params)}) AND bucket_start >= :since ORDER BY bucket_start"
+            )
+            rows = conn.execute(stmt, {**params, "since": since}).fetchall()
+            metrics.DB_ROWS.observe(len(rows), operation="get_usage_windows")
+            return [
+                {
+                    "user_id": row[0],
+                    "kind": row[1],
+                    "bucket_start": row[2],
+                    "amount": row[3],
+                }
+                for row in rows
+            ]
+        except Exception as e:
+            logging.exception(f"Error fetching usage windows: {e}")
+            return []
+
+
+async def get_usage_windows(user_ids: list[int], since: float) -> list[dict]:
+    """Usage buckets starting at or after `since` for `user_ids`, oldest first."""
+    if not user_ids:
+        return []
+    return await asyncio.to_thread(_get_usage_windows_sync, user_ids, since)
+
+
+def _get_user_tiers_sync(user_ids: list[int]) -> dict[int, str]:
+    with _connect("get_user_tiers") as conn:
+        try:
+            params = {f"user_{i}": user_id for i, user_id in enumerate(user_ids)}
+            stmt = text(
+                f"SELECT user_id, tier FROM user_tiers WHERE user_id IN ({', '.join(f':{name}' for name in params)})"
+            )
+            tiers = {row[0]: row[1] for row in conn.execute(stmt, params)}
+            metrics.DB_ROWS.observe(len(tiers), operation="get_user_tiers")
+            return tiers
+        except Exception as e:
+            logging.exception(f"Error fetching user tiers: {e}")
+            return {}
+
+
+async def get_user_tiers(user_ids: list[int]) -> dict[int, str]:
+    """Tier of each user in `user_ids` that has one assigned."""
+    if not user_ids:
+        return {}
+    return await asyncio.to_thread(_get_user_tiers_sync, user_ids)
+
+
+def _set_user_tier_sync(user_id: int, tier: str) -> bool:
+    with _connect("set_user_tier") as conn:
+        try:
+            cursor = conn.execute(
+                text(
+                    """INSERT INTO user_tiers (user_id, tier) VALUES (:user_id, :tier)
+                    ON CONFLICT(user_id) DO UPDATE SET tier = excluded.tier"""
+                ),
+                {"user_id": user_id, "tier": tier},
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(cursor.rowcount, operation="set_user_tier")
+            return True
+        except Exception as e:
+            logging.exception(f"Error setting user tier: {e}")
+    return False
+
+
+async def set_user_tier(user_id: int, tier: str) -> bool:
+    return await asyncio.to_thread(_set_user_tier_sync, user_id, tier)
+
+
+def _archive_history_sync(before: str, batch_size: int) -> int:
+    """Compress one batch of rows created before `before` into history_archive.
+
+    The hot rows stay behind as stubs with empty content, so history pages
+    are unaffected; `get_history_item` restores them on access.
+    """
+    with _connect("archive_history") as conn:
+        try:
+            rows = conn.execute(
+                text(
+                    "SELECT id, user_id, content FROM generatedcontenthistory WHERE created_at < :before AND content != '' ORDER BY created_at LIMIT :limit"
+                ),
+                {"before": before, "limit": batch_size},
+            ).fetchall()
+            if not rows:
+                return 0
+            conn.execute(
+                text(
+                    "INSERT OR REPLACE INTO history_archive (id, user_id, content) VALUES (:id, :user_id, :content)"
+                ),
+                [
+                    {
+                        "id": row[0],
+                        "user_id": row[1],
+                        "content": zlib.compress(row[2].encode("utf-8")),
+                    }
+                    for row in rows
+                ],
+            )
+            conn.execute(
+                text("UPDATE generatedcontenthistory SET content = '' WHERE id = :id"),
+                [{"id": row[0]} for row in rows],
+            )
+            conn.commit()
+            metrics.DB_ROWS.observe(len(rows), operation="archive_history")
+            return len(rows)
+        except Exception as e:
+            logging.exception(f"Error archiving history: {e}")
+    return 0
+
+
+async def archive_history(before: str, batch_size: int) -> int:
+    return await asyncio.to_thread(_archive_history_sync, before, batch_size)
+
+
+def _incremental_vacuum_sync(pages: int) -> int:
+    """Return up to `pages` free pages to the OS; SQLite only.
+
+    The first run on a database created without `auto_vacuum=INCREMENTAL`
+    switches it over, which needs one full VACUUM.
+    """
+    if rx.Model.get_db_engine().dialect.name != "sqlite":
+        return 0
+    with _connect("incremental_vacuum") as conn:
+        try:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            free_pages = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.exec_driver_sql("VACUUM")
+                return free_pages
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(pages)})")
+            return free_pages - conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        except Exception as e:
+            logging.exception(f"Error vacuuming database: {e}")
+    return 0
+
+
+async def incremental_vacuum(pages: int) -> int:
+    return await asyncio.to_thread(_incremental_vacuum_sync, pages)
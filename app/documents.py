@@ -0,0 +1,136 @@
+"""Streaming text extraction from uploaded PDF, .txt and .md documents.
+
+Documents are read one page (or one block of a text file) at a time and
+packed into chunks of at most `CHUNK_CHARS` characters, so extracted text
+held in memory stays bounded by a chunk regardless of document length. PDFs
+are read from the open file rather than loaded whole, although pypdf keeps
+the objects of pages already parsed. PDF pages without a text layer yield
+their embedded images instead, for the vision path, re-encoded as PNG when
+they are not already JPEG or PNG.
+
+A document longer than `MAX_CHUNKS` chunks is cut short, and a notice saying
+how much of it was used is returned to the caller.
+
+`pypdf` is imported on the first PDF.
+"""
+
+import io
+import os
+import logging
+from pathlib import Path
+from typing import Iterator
+
+DOCUMENT_SUFFIXES = (".pdf", ".txt", ".md")
+CHUNK_CHARS = int(os.getenv("STUDYGENIE_DOCUMENT_CHUNK_CHARS", "12000"))
+MAX_CHUNKS = int(os.getenv("STUDYGENIE_DOCUMENT_MAX_CHUNKS", "40"))
+TEXT_BLOCK_CHARS = 64 * 1024
+
+
+def is_document(name: str) -> bool:
+    return Path(name).suffix.lower() in DOCUMENT_SUFFIXES
+
+
+def _image_bytes(image) -> bytes:
+    """A pypdf image as JPEG or PNG bytes, which every provider accepts."""
+    if Path(image.name).suffix.lower() in (".jpg", ".jpeg", ".png"):
+        return image.data
+    picture = image.image
+    if picture.mode not in ("RGB", "RGBA", "L", "LA"):
+        picture = picture.convert("RGB")
+    buffer = io.BytesIO()
+    picture.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _pdf_pages(path) -> Iterator[tuple[str, str | bytes, int]]:
+    from pypdf import PdfReader
+
+    with open(path, "rb") as document:
+        reader = PdfReader(document)
+        for number, page in enumerate(reader.pages, start=1):
+            try:
+                text = page.extract_text() or ""
+            except Exception as e:
+                logging.warning(f"Could not extract text from page {number}: {e}")
+                text = ""
+            if text.strip():
+                yield "text", text, number
+                continue
+            try:
+                for image in page.images:
+                    yield "image", _image_bytes(image), number
+            except Exception as e:
+                logging.warning(f"Could not extract images from page {number}: {e}")
+
+
+def _text_blocks(path) -> Iterator[tuple[str, str | bytes, int]]:
+    with open(path, encoding="utf-8", errors="replace") as document:
+        number = 0
+        while block := document.read(TEXT_BLOCK_CHARS):
+            number += 1
+            yield "text", block, number
+
+
+def iter_pages(path) -> Iterator[tuple[str, str | bytes, int]]:
+    """Yield ("text", str, page) and ("image", bytes, page) in document order.
+
+    `page` is the 1-based PDF page, or the block number of a text file.
+    """
+    if Path(path).suffix.lower() == ".pdf":
+        return _pdf_pages(path)
+    return _text_blocks(path)
+
+
+def _truncation_notice(path, page: int) -> str:
+    name = Path(path).name
+    if Path(path).suffix.lower() == ".pdf":
+        return f"{name} is too long; only its first {page} pages were used."
+    used = MAX_CHUNKS * CHUNK_CHARS
+    return f"{name} is too long; only its first {used:,} characters were used."
+
+
+def iter_chunks(
+    path, notices: list[str] | None = None
+) -> Iterator[tuple[str, str | bytes]]:
+    """Pack a document's text into ~`CHUNK_CHARS` chunks; images pass through.
+
+    Stops after `MAX_CHUNKS` segments so a huge upload cannot fan out into
+    an unbounded number of model calls, adding a notice for the user to
+    `notices` when it does.
+    """
+    emitted = 0
+    buffer: list[str] = []
+    size = 0
+    last_page = 0
+
+    def truncated(page: int):
+        logging.warning(f"{path} truncated after {MAX_CHUNKS} chunks.")
+        if notices is not None:
+            notices.append(_truncation_notice(path, page))
+
+    for kind, segment, page in iter_pages(path):
+        if emitted >= MAX_CHUNKS:
+            truncated(last_page)
+            return
+        last_page = page
+        if kind == "image":
+            emitted += 1
+            yield kind, segment
+            continue
+        while segment:
+            room = CHUNK_CHARS - size
+            buffer.append(segment[:room])
+            size += len(buffer[-1])
+            segment = segment[room:]
+            if size >= CHUNK_CHARS:
+                emitted += 1
+                yield "text", "".join(buffer)
+                buffer, size = [], 0
+                if emitted >= MAX_CHUNKS and segment:
+                    truncated(page)
+                    return
+    if size and "".join(buffer).strip():
+        if emitted >= MAX_CHUNKS:
+            truncated(last_page)
+            return
+        yield "text", "".join(buffer)
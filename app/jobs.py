@@ -0,0 +1,270 @@
+"""Durable generation jobs.
+
+`process_input` only enqueues a row in `generation_jobs`; a pool of worker
+coroutines in every backend process claims jobs, calls `app.ai` and writes
+the result to history. Jobs outlive the client session. A worker renews its
+lease every third of `STUDYGENIE_JOB_LEASE_SECONDS` while it runs a job and
+checks with a read on every poll in between that it still holds it, so only
+a job whose worker died is picked up again once its lease expires, and a
+worker that lost its claim cannot write a result.
+
+A job superseded by a newer request is cancelled with `abort_job`: a queued
+job is never claimed, and a running one has its upstream stream closed and
+its result discarded. Workers in other processes notice within a poll.
+
+Configuration: `STUDYGENIE_JOB_WORKERS` (default 4 per process),
+`STUDYGENIE_JOB_LEASE_SECONDS` (default 300), `STUDYGENIE_JOB_MAX_ATTEMPTS`
+(default 3) and `STUDYGENIE_JOB_POLL_SECONDS` (default 0.5).
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import reflex as rx
+from app import codec, metrics
+from app.quotas import record_tokens
+from app.database import (
+    GeneratedContentHistory,
+    GenerationJob,
+    add_history,
+    add_quiz_bank,
+    add_review_cards,
+    cancel_job,
+    claim_job,
+    complete_job,
+    create_db_and_tables,
+    fail_exhausted_jobs,
+    finish_job,
+    get_job,
+    job_is_held,
+    record_generation,
+    renew_job_lease,
+)
+
+WORKER_COUNT = int(os.getenv("STUDYGENIE_JOB_WORKERS", "4"))
+LEASE_SECONDS = float(os.getenv("STUDYGENIE_JOB_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("STUDYGENIE_JOB_MAX_ATTEMPTS", "3"))
+POLL_SECONDS = float(os.getenv("STUDYGENIE_JOB_POLL_SECONDS", "0.5"))
+
+_wakeup: asyncio.Event | None = None
+_finished: dict[int, asyncio.Event] = {}
+_running: dict[int, threading.Event] = {}
+
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+def notify_workers():
+    """Wake idle workers in this process instead of waiting for the next poll."""
+    _get_wakeup().set()
+
+
+def _signal_finished(job_id: int):
+    event = _finished.get(job_id)
+    if event is not None:
+        event.set()
+
+
+async def abort_job(job_id: int, user_id: int) -> bool:
+    """Cancel a user's job; a run in this process is stopped immediately."""
+    if not await cancel_job(job_id, user_id):
+        return False
+    metrics.JOBS.inc(status="cancelled")
+    cancel = _running.get(job_id)
+    if cancel is not None:
+        cancel.set()
+    _signal_finished(job_id)
+    return True
+
+
+async def _hold_lease(job_id: int, worker: str, cancel: threading.Event):
+    """Keep the job's lease alive; set `cancel` once the job is lost.
+
+    The job is lost when it is cancelled, possibly by another process, or
+    when another worker claimed it after the lease lapsed. The lease is
+    renewed every third of `LEASE_SECONDS`; polls in between only read.
+    """
+    renewed_at = time.monotonic()
+    while not cancel.is_set():
+        await asyncio.sleep(POLL_SECONDS)
+        if time.monotonic() - renewed_at >= LEASE_SECONDS / 3:
+            held = await renew_job_lease(job_id, worker)
+            if held is not None:
+                renewed_at = time.monotonic()
+        else:
+            held = await job_is_held(job_id, worker)
+        if held is False:
+            cancel.set()
+
+
+async def store_result(
+    user_id: int,
+    mode: str,
+    topic: str,
+    data: dict,
+    job_id: int | None = None,
+    worker: str | None = None,
+    notice: str | None = None,
+    from_uploads: bool = False,
+) -> GeneratedContentHistory | None:
+    """Save a generated result to history and feed the review deck or quiz bank.
+
+    With `job_id`, the job is marked done, with `notice` for the user, in the
+    same transaction that saves the history item, and nothing is saved if it
+    was cancelled meanwhile or `worker` no longer holds it. Quizzes about
+    uploads are not banked, since their topic is only the typed instruction.
+    """
+    from app.ai import normalize_topic
+
+    content = codec.dumps(data)
+    if job_id is None:
+        history_item = await add_history(
+            topic=topic, mode=mode, content=content, user_id=user_id
+        )
+    else:
+        history_item = await complete_job(
+            job_id, worker, topic, mode, content, user_id, notice, from_uploads
+        )
+    if history_item is None:
+        return None
+    if mode == "Flashcards":
+        await add_review_cards(user_id, history_item["id"], data["cards"])
+    elif mode == "Quiz" and not from_uploads:
+        await add_quiz_bank(user_id, normalize_topic(topic), data["questions"])
+    return history_item
+
+
+async def run_job(job: GenerationJob, worker: str):
+    """Generate the content for one job claimed by `worker` and store it."""
+    from app.ai import generate_content, generate_content_from_uploads
+
+    start = time.perf_counter()
+    usage: dict = {}
+    notices: list[str] = []
+    cancel = _running[job["id"]] = threading.Event()
+    watcher = asyncio.create_task(_hold_lease(job["id"], worker, cancel))
+    try:
+        if job["uploads"]:
+            data = await metrics.to_thread(
+                "generate_content_from_uploads",
+                generate_content_from_uploads,
+                job["mode"],
+                job["user_input"],
+                [rx.get_upload_dir() / name for name in job["uploads"]],
+                usage,
+                cancel,
+                notices,
+            )
+        else:
+            data = await metrics.to_thread(
+                "generate_content",
+                generate_content,
+                job["mode"],
+                job["user_input"],
+                usage,
+                cancel=cancel,
+            )
+    finally:
+        watcher.cancel()
+        _running.pop(job["id"], None)
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    completion_tokens = usage.get("completion_tokens", 0)
+    record_tokens(job["user_id"], prompt_tokens + completion_tokens)
+    history_item = None
+    if cancel.is_set():
+        logging.info(f"Generation job {job['id']} was cancelled or lost its lease.")
+    elif not data:
+        if await finish_job(
+            job["id"], worker, "failed", error="AI content generation failed."
+        ):
+            metrics.JOBS.inc(status="failed")
+    else:
+        history_item = await store_result(
+            job["user_id"],
+            job["mode"],
+            job["topic"],
+            data,
+            job["id"],
+            worker,
+            "\n".join(notices) or None,
+            bool(job["uploads"]),
+        )
+        if history_item is None and await finish_job(
+            job["id"], worker, "failed", error="Could not save the result."
+        ):
+            metrics.JOBS.inc(status="failed")
+    await record_generation(
+        job["user_id"],
+        job["mode"],
+        prompt_tokens,
+        completion_tokens,
+        failed=history_item is None,
+    )
+    if history_item is not None:
+        metrics.JOBS.inc(status="done")
+        metrics.JOB_SECONDS.observe(time.perf_counter() - start, mode=job["mode"])
+
+
+async def worker(name: str):
+    wakeup = _get_wakeup()
+    while True:
+        job = await claim_job(name, LEASE_SECONDS, MAX_ATTEMPTS)
+        if job is None:
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await run_job(job, name)
+        except Exception as e:
+            logging.exception(f"Generation job {job['id']} failed: {e}")
+            if await finish_job(
+                job["id"], name, "failed", error="AI content generation failed."
+            ):
+                metrics.JOBS.inc(status="failed")
+        _signal_finished(job["id"])
+
+
+async def _reap_exhausted_jobs():
+    while True:
+        await fail_exhausted_jobs(LEASE_SECONDS, MAX_ATTEMPTS)
+        await asyncio.sleep(LEASE_SECONDS / 2)
+
+
+async def run_job_workers(worker_count: int = WORKER_COUNT):
+    """Lifespan task running this process's worker pool."""
+    await create_db_and_tables()
+    prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    await asyncio.gather(
+        _reap_exhausted_jobs(),
+        *(worker(f"{prefix}-{i}") for i in range(worker_count)),
+    )
+
+
+async def wait_for_job(job_id: int) -> GenerationJob | None:
+    """Wait until a job is done, failed or cancelled.
+
+    Jobs run by this process wake the waiter immediately; jobs picked up by
+    another process are noticed on the next poll.
+    """
+    event = _finished.setdefault(job_id, asyncio.Event())
+    try:
+        while True:
+            job = await get_job(job_id)
+            if job is None or job["status"] in ("done", "failed", "cancelled"):
+                return job
+            try:
+                await asyncio.wait_for(event.wait(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _finished.pop(job_id, None)
@@ -0,0 +1,160 @@
+"""Tolerant single-pass parser for truncated or wrapped model JSON.
+
+Completions cut off at `max_tokens`, wrapped in code fences or followed by
+prose are parsed as far as they go: unterminated objects and arrays are
+closed around what they already hold, and a value the input ends inside (a
+half-written bullet, card, question or string field) is dropped, so only
+complete items are salvaged.
+"""
+
+import re
+
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_LITERALS = {"true": True, "false": False, "null": None}
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+_WHITESPACE = " \t\r\n"
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.n = len(text)
+
+    def skip(self, i: int) -> int:
+        while i < self.n and self.text[i] in _WHITESPACE:
+            i += 1
+        return i
+
+    def value(self, i: int):
+        """Parse a value at `i`; returns (value, next_index, complete)."""
+        i = self.skip(i)
+        if i >= self.n:
+            return None, i, False
+        char = self.text[i]
+        if char == "{":
+            return self.object(i + 1)
+        if char == "[":
+            return self.array(i + 1)
+        if char == '"':
+            return self.string(i + 1)
+        match = _NUMBER.match(self.text, i)
+        if match:
+            end = match.end()
+            if end >= self.n:
+                return None, end, False
+            number = match.group()
+            if "." in number or "e" in number or "E" in number:
+                return float(number), end, True
+            return int(number), end, True
+        for word, literal in _LITERALS.items():
+            if self.text.startswith(word, i):
+                return literal, i + len(word), True
+            if word.startswith(self.text[i:]):
+                return None, self.n, False
+        return None, i, False
+
+    def string(self, i: int):
+        chunks = []
+        start = i
+        while i < self.n:
+            char = self.text[i]
+            if char == '"':
+                chunks.append(self.text[start:i])
+                return "".join(chunks), i + 1, True
+            if char == "\\":
+                chunks.append(self.text[start:i])
+                if i + 1 >= self.n:
+                    return "".join(chunks), self.n, False
+                escape = self.text[i + 1]
+                if escape == "u":
+                    digits = self.text[i + 2 : i + 6]
+                    if len(digits) < 4:
+                        return "".join(chunks), self.n, False
+                    try:
+                        chunks.append(chr(int(digits, 16)))
+                    except ValueError:
+                        chunks.append(digits)
+                    i += 6
+                else:
+                    chunks.append(_ESCAPES.get(escape, escape))
+                    i += 2
+                start = i
+                continue
+            i += 1
+        chunks.append(self.text[start:])
+        return "".join(chunks), self.n, False
+
+    def object(self, i: int):
+        result = {}
+        while True:
+            i = self.skip(i)
+            if i >= self.n:
+                return result, i, False
+            if self.text[i] == "}":
+                return result, i + 1, True
+            if self.text[i] == ",":
+                i += 1
+                continue
+            if self.text[i] != '"':
+                return result, i, False
+            key, i, complete = self.string(i + 1)
+            if not complete:
+                return result, i, False
+            i = self.skip(i)
+            if i >= self.n or self.text[i] != ":":
+                return result, i, False
+            value, i, complete = self.value(i + 1)
+            if not complete:
+                # Keep a list cut short for its complete items, not a torn scalar.
+                if isinstance(value, list):
+                    result[key] = value
+                return result, i, False
+            result[key] = value
+
+    def array(self, i: int):
+        result = []
+        while True:
+            i = self.skip(i)
+            if i >= self.n:
+                return result, i, False
+            if self.text[i] == "]":
+                return result, i + 1, True
+            if self.text[i] == ",":
+                i += 1
+                continue
+            value, i, complete = self.value(i)
+            if not complete:
+                return result, i, False
+            result.append(value)
+
+
+def strip_code_fences(text: str) -> str:
+    """Drop Markdown code fences and any prose before the first `{`."""
+    text = re.sub(r"```[a-zA-Z]*", "", text)
+    start = text.find("{")
+    return text[start:] if start >= 0 else ""
+
+
+def parse_partial_json(text: str):
+    """Parse a possibly truncated JSON object.
+
+    Returns `(value, complete)`, where `complete` is False if anything had to
+    be closed or dropped, or `(None, False)` if no object could be recovered.
+    """
+    text = strip_code_fences(text)
+    if not text:
+        return None, False
+    try:
+        value, _, complete = _Parser(text).object(1)
+    except RecursionError:
+        return None, False
+    return value, complete
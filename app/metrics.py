@@ -0,0 +1,288 @@
+"""In-process metrics and tracing for the AI, database and export hot paths.
+
+Metrics are exposed in Prometheus text format on the backend's `/metrics`
+route. Spans are additionally exported through OpenTelemetry when
+`OTEL_EXPORTER_OTLP_ENDPOINT` is set and the `opentelemetry-sdk` and
+`opentelemetry-exporter-otlp-proto-http` packages are installed.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+_lock = threading.Lock()
+_registry: dict[str, "Counter | Histogram"] = {}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + inner + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            values = [
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._values.items()
+            ]
+        for key, (counts, total, count) in sorted(values):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key, (('le', str(bound)),))} {bucket_count}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}"
+            )
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+def counter(name: str, help_text: str) -> Counter:
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Counter(name, help_text)
+    return metric
+
+
+def histogram(name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Histogram(name, help_text, buckets)
+    return metric
+
+
+def render_prometheus() -> str:
+    """Render every registered metric in Prometheus text exposition format."""
+    with _lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+SPAN_SECONDS = histogram(
+    "studygenie_span_duration_seconds", "Duration of instrumented operations."
+)
+SPAN_ERRORS = counter(
+    "studygenie_span_errors_total", "Instrumented operations that raised."
+)
+QUEUE_WAIT = histogram(
+    "studygenie_queue_wait_seconds",
+    "Time between scheduling work on a thread and it starting.",
+)
+JSON_REPAIRS = counter(
+    "studygenie_ai_json_repairs_total",
+    "AI responses that needed local JSON repair, by outcome.",
+)
+AI_TOKENS = counter("studygenie_ai_tokens_total", "Tokens used by AI providers.")
+AI_ROUTE_FALLBACKS = counter(
+    "studygenie_ai_route_fallbacks_total",
+    "AI requests moved off a route whose latency was over budget.",
+)
+DB_ACQUIRE = histogram(
+    "studygenie_db_connection_acquire_seconds",
+    "Time spent acquiring a database connection.",
+)
+DB_ROWS = histogram(
+    "studygenie_db_rows",
+    "Rows returned or written per database operation.",
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000),
+)
+CACHE_LOOKUPS = counter(
+    "studygenie_cache_lookups_total", "Shared cache lookups, by namespace and result."
+)
+WARMED_TOPICS = counter(
+    "studygenie_warmed_topics_total", "Popular topics processed by cache warming."
+)
+JOBS = counter("studygenie_jobs_total", "Generation jobs finished, by status.")
+JOB_SECONDS = histogram(
+    "studygenie_job_duration_seconds", "Time from claiming a job to storing it."
+)
+HISTORY_ARCHIVED = counter(
+    "studygenie_history_archived_total", "History rows moved to the archive."
+)
+HISTORY_RESTORES = counter(
+    "studygenie_history_restores_total", "Archived history rows restored on access."
+)
+QUOTA_REJECTIONS = counter(
+    "studygenie_quota_rejections_total",
+    "Generation requests refused by a user quota, by tier and limit.",
+)
+SPECULATIVE_GENERATIONS = counter(
+    "studygenie_speculative_generations_total",
+    "Modes generated ahead of a request, and those the user then opened.",
+)
+QUIZ_SUBMISSIONS = counter(
+    "studygenie_quiz_submissions_total", "Quiz answer sheets submitted for scoring."
+)
+PDF_BYTES = histogram(
+    "studygenie_pdf_bytes",
+    "Size of generated PDF exports.",
+    buckets=(1e4, 5e4, 1e5, 5e5, 1e6, 5e6),
+)
+
+_tracer = None
+
+
+def setup_opentelemetry():
+    """Enable the optional OTLP span exporter if it is configured."""
+    global _tracer
+    if _tracer is not None or not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+    except ImportError:
+        logging.warning(
+            "OTEL_EXPORTER_OTLP_ENDPOINT is set but OpenTelemetry is not installed."
+        )
+        return
+    provider = TracerProvider(
+        resource=Resource.create(
+            {"service.name": os.getenv("OTEL_SERVICE_NAME", "studygenie")}
+        )
+    )
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("studygenie")
+
+
+class Span:
+    """Attributes collected while a `span` is open."""
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+
+@contextmanager
+def span(name: str, **labels):
+    """Time a block into `studygenie_span_duration_seconds` and trace it.
+
+    `labels` become metric labels, so keep them low-cardinality; extra
+    attributes set on the yielded `Span` go to the trace only.
+    """
+    current = Span(name, dict(labels))
+    otel_cm = _tracer.start_as_current_span(name) if _tracer is not None else None
+    otel_span = otel_cm.__enter__() if otel_cm is not None else None
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        SPAN_ERRORS.inc(span=name, **labels)
+        if otel_span is not None:
+            otel_span.record_exception(e)
+        raise
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - start, span=name, **labels)
+        if otel_cm is not None:
+            for key, value in current.attributes.items():
+                otel_span.set_attribute(key, value)
+            otel_cm.__exit__(None, None, None)
+
+
+async def to_thread(operation: str, func, *args, **kwargs):
+    """`asyncio.to_thread` that records how long the call queued for a worker."""
+    submitted = time.perf_counter()
+
+    def run():
+        QUEUE_WAIT.observe(time.perf_counter() - submitted, operation=operation)
+        return func(*args, **kwargs)
+
+    return await asyncio.to_thread(run)
+
+
+def create_metrics_app():
+    """A Starlette app serving `/metrics`, mounted in front of the Reflex API."""
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    async def metrics_endpoint(request):
+        return PlainTextResponse(
+            render_prometheus(),
+            media_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+    return Starlette(routes=[Route("/metrics", metrics_endpoint)])
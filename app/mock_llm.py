@@ -0,0 +1,152 @@
+"""Local OpenAI-compatible mock server for offline and load testing.
+
+Run with `python -m app.mock_llm --port 8001 --latency-ms 800` and point the
+OpenAI provider at it with `OPENAI_BASE_URL=http://127.0.0.1:8001/v1` and any
+non-empty `OPENAI_API_KEY`.
+
+Streamed requests get server-sent events: the first chunk arrives after half
+the latency and the rest of the reply is spread over the other half.
+"""
+
+import argparse
+import json
+import time
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.ai import PROMPTS
+from app.providers import mock_payload
+
+
+def detect_mode(user_prompt: str) -> str:
+    """Recover the study mode from the prompt `app.ai` sent."""
+    for mode, details in PROMPTS.items():
+        if user_prompt.startswith(details["prompt"]):
+            return mode
+    return "Notes"
+
+
+def _message_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "\n".join(
+        part.get("text", "") for part in content if part.get("type") == "text"
+    )
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    jitter = 0.0
+    stream_chunks = 8
+    seen_prefixes: set[str] = set()
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        user_prompt = _message_text(request["messages"][-1]["content"])
+        mode = detect_mode(user_prompt)
+        delay = self.latency + self.jitter * random.random()
+        streaming = bool(request.get("stream"))
+        if delay > 0:
+            time.sleep(delay / 2 if streaming else delay)
+        text = json.dumps(mock_payload(mode, user_prompt.partition(" ---\n")[2]))
+        prompt_tokens = (
+            sum(len(_message_text(m["content"])) for m in request["messages"]) // 4
+        )
+        system_prompt = _message_text(request["messages"][0]["content"])
+        cached_tokens = (
+            len(system_prompt) // 4 if system_prompt in self.seen_prefixes else 0
+        )
+        self.seen_prefixes.add(system_prompt)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": prompt_tokens + len(text) // 4,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        if streaming:
+            self._stream(request, text, usage, delay / 2)
+            return
+        body = json.dumps(
+            {
+                "id": f"chatcmpl-mock-{int(time.time() * 1000)}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, request: dict, text: str, usage: dict, duration: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        base = {
+            "id": f"chatcmpl-mock-{int(time.time() * 1000)}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+        size = max(1, len(text) // self.stream_chunks + 1)
+        pieces = [text[i : i + size] for i in range(0, len(text), size)]
+        events = [
+            {**base, "choices": [{"index": 0, "delta": {"content": piece}}]}
+            for piece in pieces
+        ]
+        events.append(
+            {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        )
+        events.append({**base, "choices": [], "usage": usage})
+        try:
+            for number, event in enumerate(events):
+                if number and number < len(pieces):
+                    time.sleep(duration / len(pieces))
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8001,
+    latency_ms: float = 0,
+    jitter_ms: float = 0,
+):
+    MockLLMHandler.latency = latency_ms / 1000
+    MockLLMHandler.jitter = jitter_ms / 1000
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.latency_ms, args.jitter_ms)
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,78 @@
+import reflex as rx
+from app.components.sidebar import sidebar
+from app.srs import GRADES
+from app.states.review_state import ReviewState
+
+
+def grade_button(label: str) -> rx.Component:
+    return rx.el.button(
+        label,
+        on_click=ReviewState.grade(label),
+        class_name="flex-1 px-4 py-2 border rounded-lg font-medium hover:bg-indigo-50 hover:border-indigo-500",
+    )
+
+
+def review_card() -> rx.Component:
+    """The card at the front of the due queue."""
+    card = ReviewState.current_card.to(dict)
+    return rx.el.div(
+        rx.el.div(
+            rx.el.p(card["question"], class_name="text-lg font-semibold"),
+            rx.cond(
+                ReviewState.show_answer,
+                rx.el.p(card["answer"], class_name="mt-4 pt-4 border-t text-gray-700"),
+            ),
+            class_name="p-8 min-h-48 border rounded-xl bg-white shadow-sm text-center",
+        ),
+        rx.cond(
+            ReviewState.show_answer,
+            rx.el.div(
+                *[grade_button(label) for label in GRADES],
+                class_name="flex gap-3 mt-4",
+            ),
+            rx.el.button(
+                "Show answer",
+                on_click=ReviewState.reveal,
+                class_name="w-full mt-4 px-4 py-2 bg-indigo-600 text-white font-semibold rounded-lg hover:bg-indigo-700",
+            ),
+        ),
+        class_name="w-full max-w-xl",
+    )
+
+
+def review_page() -> rx.Component:
+    """Review due flashcards."""
+    return rx.el.div(
+        sidebar(),
+        rx.el.main(
+            rx.el.div(
+                rx.el.h1("Review", class_name="text-3xl font-bold text-gray-900"),
+                rx.el.p(
+                    f"Cards reviewed this session: {ReviewState.reviewed}",
+                    class_name="text-gray-600 mt-1",
+                ),
+                rx.link(
+                    "Back to study", href="/", class_name="text-sm text-indigo-600"
+                ),
+                class_name="mb-8",
+            ),
+            rx.cond(
+                ReviewState.current_card,
+                review_card(),
+                rx.el.div(
+                    rx.icon(tag="circle_check", class_name="h-12 w-12 text-gray-300"),
+                    rx.el.h3(
+                        "Nothing due right now",
+                        class_name="mt-4 text-lg font-semibold text-gray-600",
+                    ),
+                    rx.el.p(
+                        "Generate flashcards to add them to your review deck.",
+                        class_name="mt-1 text-sm text-gray-500",
+                    ),
+                    class_name="flex flex-col items-center justify-center p-12 border-2 border-dashed border-gray-200 rounded-xl max-w-xl",
+                ),
+            ),
+            class_name="flex-1 p-6 md:p-10 overflow-auto",
+        ),
+        class_name="flex min-h-screen w-full bg-gray-50/50",
+    )
@@ -0,0 +1,448 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from typing import TypedDict
+
+
+class GenerationCancelled(Exception):
+    """Raised when a completion is abandoned because its job was cancelled."""
+
+
+def _check_cancelled(cancel: threading.Event | None):
+    if cancel is not None and cancel.is_set():
+        raise GenerationCancelled()
+
+
+# `app.ai.build_user_prompt` puts this between the mode instructions and the
+# user-specific part of a prompt.
+USER_PART_SEPARATOR = "\n\n--- "
+
+
+def split_user_prompt(user_prompt: str) -> tuple[str, str]:
+    """Split a user prompt into its mode instructions and user-specific part.
+
+    Vision requests send the images between the two, so everything up to the
+    user's own input is the same for every request in a mode.
+    """
+    instructions, separator, user_part = user_prompt.partition(USER_PART_SEPARATOR)
+    return instructions, (separator + user_part).lstrip("\n")
+
+
+class Completion(TypedDict):
+    text: str | None
+    provider: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+
+
+class Provider:
+    """Base class for an LLM backend used by `app.ai`.
+
+    Providers with an SDK set `api_key_env` and implement `create_client`;
+    `get_client` then builds the client once, on first use.
+    """
+
+    name = "base"
+    api_key_env: str | None = None
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        return self.api_key_env is None or bool(os.getenv(self.api_key_env))
+
+    def create_client(self, api_key: str):
+        raise NotImplementedError
+
+    def get_client(self):
+        """Initialize the SDK client lazily and reuse it across calls."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    api_key = os.getenv(self.api_key_env)
+                    if not api_key:
+                        error_msg = f"{self.api_key_env} is not set. Please ensure it is defined in your environment variables."
+                        logging.error(error_msg)
+                        raise ValueError(error_msg)
+                    self._client = self.create_client(api_key)
+        return self._client
+
+    def complete(
+        self,
+        mode: str,
+        system_prompt: str,
+        user_prompt: str,
+        images: list[tuple[str, str]] | None = None,
+        max_tokens: int = 3000,
+        temperature: float = 0.7,
+        cancel: threading.Event | None = None,
+        model: str | None = None,
+    ) -> Completion:
+        """Run one chat completion.
+
+        `images` are (media type, base64 data) pairs, e.g. ("image/jpeg", ...).
+
+        `model` overrides the provider's configured model for this call.
+
+        `system_prompt` is the same for every call, so providers should let
+        it be served from their prompt cache and report the cached part of
+        the prompt in `cached_tokens` (included in `prompt_tokens`).
+
+        Completions are streamed; once `cancel` is set the stream is closed,
+        which aborts the HTTP request, and `GenerationCancelled` is raised.
+        """
+        raise NotImplementedError
+
+
+class OpenAIProvider(Provider):
+    name = "openai"
+    api_key_env = "OPENAI_API_KEY"
+
+    def __init__(self):
+        super().__init__()
+        self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+    def create_client(self, api_key: str):
+        from openai import OpenAI
+
+        return OpenAI(api_key=api_key)
+
+    def complete(
+        self,
+        mode,
+        system_prompt,
+        user_prompt,
+        images=None,
+        max_tokens=3000,
+        temperature=0.7,
+        cancel=None,
+        model=None,
+    ) -> Completion:
+        if images:
+            instructions, user_part = split_user_prompt(user_prompt)
+            user_content = [
+                {"type": "text", "text": instructions},
+                *(
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:{media_type};base64,{data}"},
+                    }
+                    for media_type, data in images
+                ),
+            ]
+            if user_part:
+                user_content.append({"type": "text", "text": user_part})
+        else:
+            user_content = user_prompt
+        model = model or self.model
+        stream = self.get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content},
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts = []
+        usage = None
+        try:
+            for chunk in stream:
+                _check_cancelled(cancel)
+                if chunk.choices:
+                    parts.append(chunk.choices[0].delta.content or "")
+                if chunk.usage:
+                    usage = chunk.usage
+        finally:
+            stream.close()
+        details = getattr(usage, "prompt_tokens_details", None)
+        return Completion(
+            text="".join(parts),
+            provider=self.name,
+            model=model,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            cached_tokens=getattr(details, "cached_tokens", None) or 0,
+        )
+
+
+class AnthropicProvider(Provider):
+    name = "anthropic"
+    api_key_env = "ANTHROPIC_API_KEY"
+
+    def __init__(self):
+        super().__init__()
+        self.model = os.getenv("ANTHROPIC_MODEL", "claude-3-5-haiku-latest")
+
+    def create_client(self, api_key: str):
+        from anthropic import Anthropic
+
+        return Anthropic(api_key=api_key)
+
+    def complete(
+        self,
+        mode,
+        system_prompt,
+        user_prompt,
+        images=None,
+        max_tokens=3000,
+        temperature=0.7,
+        cancel=None,
+        model=None,
+    ) -> Completion:
+        if images:
+            instructions, user_part = split_user_prompt(user_prompt)
+            user_content = [
+                {"type": "text", "text": instructions},
+                *(
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": media_type,
+                            "data": data,
+                        },
+                    }
+                    for media_type, data in images
+                ),
+            ]
+            if user_part:
+                user_content.append({"type": "text", "text": user_part})
+        else:
+            user_content = [{"type": "text", "text": user_prompt}]
+        model = model or self.model
+        stream = self.get_client().messages.create(
+            model=model,
+            system=[
+                {
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ],
+            messages=[
+                {"role": "user", "content": user_content},
+                {"role": "assistant", "content": "{"},
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        parts = []
+        usage = None
+        output_tokens = 0
+        try:
+            for event in stream:
+                _check_cancelled(cancel)
+                if event.type == "message_start":
+                    usage = event.message.usage
+                elif (
+                    event.type == "content_block_delta"
+                    and event.delta.type == "text_delta"
+                ):
+                    parts.append(event.delta.text)
+                elif event.type == "message_delta":
+                    output_tokens = event.usage.output_tokens
+        finally:
+            stream.close()
+        input_tokens = usage.input_tokens if usage else 0
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        return Completion(
+            text="{" + "".join(parts),
+            provider=self.name,
+            model=model,
+            prompt_tokens=input_tokens + cache_read + cache_write,
+            completion_tokens=output_tokens,
+            cached_tokens=cache_read,
+        )
+
+
+def _mock_seed(mode: str, text: str) -> random.Random:
+    digest = hashlib.sha256(f"{mode}\x00{text}".encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def mock_payload(mode: str, text: str) -> dict | None:
+    """Deterministic, schema-valid content for a `PROMPTS` mode."""
+    from app.ai import QUIZ_BANK_SIZE
+
+    topic = " ".join(text.split())[:60] or "the topic"
+    rng = _mock_seed(mode, text)
+    if mode == "Notes":
+        return {
+            "heading": topic.title(),
+            "bullets": [
+                f"Key concept {i + 1} of {topic}." for i in range(rng.randint(8, 12))
+            ],
+            "mnemonic": f"Remember {topic[:1].upper()} for {topic}.",
+        }
+    if mode == "Summary":
+        return {
+            "summary": f"{topic} in brief: a concise overview of the main ideas.",
+            "takeaways": [
+                f"Takeaway {i + 1} about {topic}." for i in range(rng.randint(3, 5))
+            ],
+        }
+    if mode == "Explain":
+        return {
+            "steps": [
+                f"Step {i + 1}: part of {topic}." for i in range(rng.randint(4, 6))
+            ],
+            "example": f"An example of {topic}.",
+            "analogy": f"{topic} is like a well-organised library.",
+        }
+    if mode == "Quiz":
+        return {
+            "questions": [
+                {
+                    "question": f"Question {i + 1} about {topic}?",
+                    "options": [f"Option {chr(65 + j)}" for j in range(4)],
+                    "correct_answer": rng.randrange(4),
+                }
+                for i in range(QUIZ_BANK_SIZE)
+            ]
+        }
+    if mode == "Flashcards":
+        return {
+            "cards": [
+                {
+                    "question": f"What is point {i + 1} of {topic}?",
+                    "answer": f"Point {i + 1} of {topic}.",
+                }
+                for i in range(rng.randint(8, 10))
+            ]
+        }
+    return None
+
+
+class MockProvider(Provider):
+    """Offline provider returning `mock_payload` after a configurable delay.
+
+    Latency is `STUDYGENIE_MOCK_LATENCY_MS` plus up to
+    `STUDYGENIE_MOCK_JITTER_MS` of deterministic jitter. A system prompt seen
+    before is reported as cached, like a provider's prompt cache.
+    """
+
+    name = "mock"
+
+    def __init__(self):
+        super().__init__()
+        self.latency = float(os.getenv("STUDYGENIE_MOCK_LATENCY_MS", "0")) / 1000
+        self.jitter = float(os.getenv("STUDYGENIE_MOCK_JITTER_MS", "0")) / 1000
+        self._seen_prefixes: set[str] = set()
+
+    def complete(
+        self,
+        mode,
+        system_prompt,
+        user_prompt,
+        images=None,
+        max_tokens=3000,
+        temperature=0.7,
+        cancel=None,
+        model=None,
+    ) -> Completion:
+        delay = self.latency + self.jitter * _mock_seed(mode, user_prompt).random()
+        if cancel is not None:
+            cancel.wait(delay)
+            _check_cancelled(cancel)
+        elif delay > 0:
+            time.sleep(delay)
+        text = json.dumps(mock_payload(mode, user_prompt.partition(" ---\n")[2]))
+        cached = system_prompt in self._seen_prefixes
+        self._seen_prefixes.add(system_prompt)
+        return Completion(
+            text=text,
+            provider=self.name,
+            model=model or "mock",
+            prompt_tokens=(len(system_prompt) + len(user_prompt)) // 4,
+            completion_tokens=len(text) // 4,
+            cached_tokens=len(system_prompt) // 4 if cached else 0,
+        )
+
+
+PROVIDERS: dict[str, Provider] = {
+    provider.name: provider
+    for provider in (OpenAIProvider(), AnthropicProvider(), MockProvider())
+}
+
+
+class LatencyTracker:
+    """Exponentially weighted moving average of call latency per provider."""
+
+    def __init__(self, alpha: float = 0.2, failure_penalty: float = 30.0):
+        self.alpha = alpha
+        self.failure_penalty = failure_penalty
+        self._averages: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            previous = self._averages.get(name)
+            self._averages[name] = (
+                seconds
+                if previous is None
+                else self.alpha * seconds + (1 - self.alpha) * previous
+            )
+
+    def record_failure(self, name: str):
+        self.record(name, self.failure_penalty)
+
+    def get(self, name: str) -> float | None:
+        return self._averages.get(name)
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._averages)
+
+
+latency_tracker = LatencyTracker()
+
+
+def _configured_provider(mode: str) -> str:
+    return (
+        os.getenv(f"STUDYGENIE_PROVIDER_{mode.upper()}")
+        or os.getenv("STUDYGENIE_PROVIDER")
+        or "openai"
+    ).lower()
+
+
+def get_provider(mode: str) -> Provider:
+    """Pick the provider for a mode.
+
+    `STUDYGENIE_PROVIDER_<MODE>` overrides `STUDYGENIE_PROVIDER` (default
+    "openai"). The value "auto" routes to the available provider in
+    `STUDYGENIE_PROVIDER_POOL` with the lowest measured latency, trying
+    unmeasured providers first.
+    """
+    name = _configured_provider(mode)
+    if name != "auto":
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider: {name}")
+        return PROVIDERS[name]
+    pool = os.getenv("STUDYGENIE_PROVIDER_POOL", "openai,anthropic").split(",")
+    candidates = [
+        PROVIDERS[n.strip()]
+        for n in pool
+        if n.strip() in PROVIDERS and PROVIDERS[n.strip()].is_available()
+    ]
+    if not candidates:
+        raise ValueError("No LLM provider in STUDYGENIE_PROVIDER_POOL is configured.")
+    return min(
+        candidates,
+        key=lambda p: (
+            latency_tracker.get(p.name) is not None,
+            latency_tracker.get(p.name) or 0.0,
+        ),
+    )
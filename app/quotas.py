@@ -0,0 +1,236 @@
+"""Per-user generation quotas.
+
+Every user belongs to a tier (`user_tiers`, default `STUDYGENIE_DEFAULT_TIER`
+= "free") with a limit on generation requests per hour and on AI tokens per
+day. Usage is counted in memory in sliding windows of fixed buckets, so the
+check in `process_input` is O(1) and never waits on the database once a
+user's counters are loaded. New usage is flushed to the `usage_windows`
+table every `STUDYGENIE_QUOTA_FLUSH_SECONDS` (default 10); each flush also
+reloads the counters of the users this process holds, which picks up usage
+recorded by other backend processes.
+
+Limits per tier come from `STUDYGENIE_QUOTA_<TIER>` as
+"<requests per hour>,<tokens per day>", where 0 means unlimited.
+
+Move a user to another tier with `python -m app.quotas <email> <tier>`; the
+change applies from the next flush.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import TypedDict
+from app import metrics
+from app.database import (
+    add_usage_windows,
+    create_db_and_tables,
+    get_usage_windows,
+    get_user_by_email,
+    get_user_tiers,
+    set_user_tier,
+)
+
+
+class Quota(TypedDict):
+    requests_per_hour: int
+    tokens_per_day: int
+
+
+def _quota_from_env(tier: str, default: Quota) -> Quota:
+    value = os.getenv(f"STUDYGENIE_QUOTA_{tier.upper()}")
+    if not value:
+        return default
+    requests, tokens = (int(part) for part in value.split(","))
+    return Quota(requests_per_hour=requests, tokens_per_day=tokens)
+
+
+TIERS: dict[str, Quota] = {
+    tier: _quota_from_env(tier, default)
+    for tier, default in {
+        "free": Quota(requests_per_hour=30, tokens_per_day=300_000),
+        "pro": Quota(requests_per_hour=300, tokens_per_day=3_000_000),
+        "unlimited": Quota(requests_per_hour=0, tokens_per_day=0),
+    }.items()
+}
+DEFAULT_TIER = os.getenv("STUDYGENIE_DEFAULT_TIER", "free")
+FLUSH_SECONDS = float(os.getenv("STUDYGENIE_QUOTA_FLUSH_SECONDS", "10"))
+
+# kind -> (window seconds, bucket seconds)
+WINDOWS = {"requests": (3600, 60), "tokens": (86400, 900)}
+_LONGEST_WINDOW = max(window for window, _ in WINDOWS.values())
+
+
+class WindowCounter:
+    """Sum over a sliding window, kept as a deque of (bucket_start, amount).
+
+    `add` and `total` are amortized O(1): expired buckets are dropped from
+    the left as time moves on.
+    """
+
+    def __init__(self, window: int, bucket: int):
+        self.window = window
+        self.bucket = bucket
+        self._buckets: deque[list[int]] = deque()
+        self._total = 0
+
+    def _expire(self, now: float):
+        oldest = now - self.window
+        while self._buckets and self._buckets[0][0] + self.bucket <= oldest:
+            self._total -= self._buckets.popleft()[1]
+
+    def bucket_start(self, now: float) -> int:
+        return int(now // self.bucket * self.bucket)
+
+    def add(self, amount: int, now: float):
+        start = self.bucket_start(now)
+        if self._buckets and self._buckets[-1][0] == start:
+            self._buckets[-1][1] += amount
+        else:
+            self._buckets.append([start, amount])
+        self._total += amount
+
+    def total(self, now: float) -> int:
+        self._expire(now)
+        return self._total
+
+
+def _tier(name: str | None) -> str:
+    return name if name in TIERS else DEFAULT_TIER
+
+
+class _UserUsage:
+    def __init__(self, tier: str):
+        self.tier = _tier(tier)
+        self.counters = {
+            kind: WindowCounter(window, bucket)
+            for kind, (window, bucket) in WINDOWS.items()
+        }
+
+
+_users: dict[int, _UserUsage] = {}
+# (user_id, kind, bucket_start) -> usage not yet written to usage_windows
+_pending: dict[tuple[int, str, int], int] = {}
+
+
+def _count(user_id: int, kind: str, amount: int, now: float):
+    usage = _users.get(user_id)
+    if usage is not None:
+        usage.counters[kind].add(amount, now)
+    bucket = WINDOWS[kind][1]
+    key = (user_id, kind, int(now // bucket * bucket))
+    _pending[key] = _pending.get(key, 0) + amount
+
+
+def _rebuild(usage: _UserUsage, user_id: int, rows: list[dict]):
+    """Reset `usage`'s counters to the stored rows plus unflushed usage."""
+    for kind, (window, bucket) in WINDOWS.items():
+        usage.counters[kind] = WindowCounter(window, bucket)
+    amounts: dict[tuple[str, int], int] = {}
+    for row in rows:
+        if row["user_id"] == user_id and row["kind"] in WINDOWS:
+            key = (row["kind"], row["bucket_start"])
+            amounts[key] = amounts.get(key, 0) + row["amount"]
+    for (pending_user, kind, start), amount in _pending.items():
+        if pending_user == user_id:
+            amounts[(kind, start)] = amounts.get((kind, start), 0) + amount
+    for (kind, start), amount in sorted(amounts.items(), key=lambda item: item[0][1]):
+        usage.counters[kind].add(amount, start)
+
+
+async def _load_user(user_id: int) -> _UserUsage:
+    tiers = await get_user_tiers([user_id])
+    rows = await get_usage_windows([user_id], time.time() - _LONGEST_WINDOW)
+    usage = _UserUsage(tiers.get(user_id))
+    _rebuild(usage, user_id, rows)
+    _users[user_id] = usage
+    return usage
+
+
+async def admit(user_id: int) -> str | None:
+    """Count one generation request for `user_id` unless a quota is exhausted.
+
+    Returns None when admitted, otherwise a message for the user.
+    """
+    usage = _users.get(user_id) or await _load_user(user_id)
+    quota = TIERS[usage.tier]
+    now = time.time()
+    requests = quota["requests_per_hour"]
+    if requests and usage.counters["requests"].total(now) >= requests:
+        metrics.QUOTA_REJECTIONS.inc(tier=usage.tier, limit="requests")
+        return f"You have reached your limit of {requests} generations per hour. Please try again later."
+    tokens = quota["tokens_per_day"]
+    if tokens and usage.counters["tokens"].total(now) >= tokens:
+        metrics.QUOTA_REJECTIONS.inc(tier=usage.tier, limit="tokens")
+        return "You have used up today's AI allowance. Please try again tomorrow."
+    _count(user_id, "requests", 1, now)
+    return None
+
+
+def record_tokens(user_id: int, tokens: int):
+    """Add the tokens an admitted request used upstream."""
+    if tokens > 0:
+        _count(user_id, "tokens", tokens, time.time())
+
+
+async def flush():
+    """Write pending usage to SQLite, then reload the counters held here."""
+    global _pending
+    deltas, _pending = _pending, {}
+    now = time.time()
+    if not await add_usage_windows(
+        [
+            {"user_id": user_id, "kind": kind, "bucket_start": start, "amount": amount}
+            for (user_id, kind, start), amount in deltas.items()
+        ],
+        now - _LONGEST_WINDOW,
+    ):
+        for key, amount in deltas.items():
+            _pending[key] = _pending.get(key, 0) + amount
+        return
+    user_ids = list(_users)
+    rows = await get_usage_windows(user_ids, now - _LONGEST_WINDOW)
+    tiers = await get_user_tiers(user_ids)
+    active = {row["user_id"] for row in rows} | {key[0] for key in _pending}
+    for user_id in user_ids:
+        usage = _users.get(user_id)
+        if usage is None:
+            continue
+        if user_id in active:
+            usage.tier = _tier(tiers.get(user_id))
+            _rebuild(usage, user_id, rows)
+        else:
+            del _users[user_id]
+
+
+async def run_quota_flusher():
+    """Lifespan task: flush usage counters every `FLUSH_SECONDS`."""
+    await create_db_and_tables()
+    try:
+        while True:
+            await asyncio.sleep(FLUSH_SECONDS)
+            try:
+                await flush()
+            except Exception as e:
+                logging.exception(f"Flushing usage counters failed: {e}")
+    finally:
+        await flush()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m app.quotas <email> <tier>")
+
+    async def _main(email: str, tier: str):
+        if tier not in TIERS:
+            sys.exit(f"Unknown tier {tier!r}; expected one of {', '.join(TIERS)}.")
+        await create_db_and_tables()
+        user = await get_user_by_email(email)
+        if not user:
+            sys.exit(f"No user with email {email}.")
+        if await set_user_tier(user["id"], tier):
+            print(f"{email} is now on the {tier} tier.")
+
+    asyncio.run(_main(sys.argv[1], sys.argv[2]))
@@ -0,0 +1,66 @@
+"""Retention for `generatedcontenthistory`.
+
+Once a day, at `STUDYGENIE_RETENTION_HOUR` (local time, default 3), one
+backend process moves the content of history rows older than
+`STUDYGENIE_RETENTION_DAYS` (default 90) into the zlib-compressed
+`history_archive` table, in batches of `STUDYGENIE_RETENTION_BATCH_SIZE`
+(default 500). The rows stay in the hot table as content-less stubs, so the
+sidebar is unchanged; opening one restores it. Freed pages are then handed
+back with an incremental VACUUM of up to `STUDYGENIE_VACUUM_PAGES` pages
+(default 2000).
+
+Run once by hand with `python -m app.retention`.
+"""
+
+import os
+import asyncio
+import datetime
+import logging
+from app import metrics
+from app.database import (
+    archive_history,
+    create_db_and_tables,
+    incremental_vacuum,
+)
+from app.scheduling import run_daily
+
+RETENTION_HOUR = int(os.getenv("STUDYGENIE_RETENTION_HOUR", "3"))
+RETENTION_DAYS = float(os.getenv("STUDYGENIE_RETENTION_DAYS", "90"))
+BATCH_SIZE = int(os.getenv("STUDYGENIE_RETENTION_BATCH_SIZE", "500"))
+VACUUM_PAGES = int(os.getenv("STUDYGENIE_VACUUM_PAGES", "2000"))
+
+
+async def run_retention(
+    days: float = RETENTION_DAYS, vacuum_pages: int = VACUUM_PAGES
+) -> dict:
+    """Archive old history content, then reclaim free pages."""
+    before = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+    archived = 0
+    while True:
+        batch = await archive_history(before, BATCH_SIZE)
+        archived += batch
+        if batch < BATCH_SIZE:
+            break
+        await asyncio.sleep(0)
+    metrics.HISTORY_ARCHIVED.inc(archived)
+    report = {
+        "archived": archived,
+        "vacuumed_pages": await incremental_vacuum(vacuum_pages),
+    }
+    logging.info(f"History retention finished: {report}")
+    return report
+
+
+async def run_retention_scheduler():
+    """Lifespan task: archive and vacuum once a day in the off-peak hour."""
+    await run_daily("retention", RETENTION_HOUR, run_retention)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main():
+        await create_db_and_tables()
+        print(await run_retention())
+
+    asyncio.run(_main())
@@ -0,0 +1,35 @@
+"""Daily off-peak maintenance jobs shared by retention and cache warming.
+
+Every backend process runs the scheduler, but each run takes a named lock in
+`maintenance_locks` first, so only one process does the work.
+"""
+
+import os
+import uuid
+import asyncio
+import datetime
+import logging
+from app.database import acquire_lock
+
+LOCK_TTL_SECONDS = 3600
+
+
+def seconds_until_next_run(hour: int, now: datetime.datetime) -> float:
+    """Seconds from `now` until the next `hour`:00 local time."""
+    next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += datetime.timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+async def run_daily(name: str, hour: int, job):
+    """Run the coroutine function `job` once a day at `hour`, in one process."""
+    holder = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    while True:
+        await asyncio.sleep(seconds_until_next_run(hour, datetime.datetime.now()))
+        if not await acquire_lock(name, holder, LOCK_TTL_SECONDS):
+            continue
+        try:
+            await job()
+        except Exception as e:
+            logging.exception(f"Scheduled job {name} failed: {e}")
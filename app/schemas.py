@@ -0,0 +1,168 @@
+"""Per-mode response validators compiled from the `PROMPTS` json structures.
+
+Each mode's `json_structure` example is turned once into a tree of small
+closures that check and coerce a parsed response in a single pass: missing
+strings become "", scalars are stringified, a lone item becomes a list, and
+list items that cannot be coerced are dropped.
+"""
+
+import re
+import json
+import functools
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def structure_example(json_structure: str):
+    """Parse a `PROMPTS` json_structure string into an example object."""
+    cleaned = re.sub(r",\s*\.\.\.", "", json_structure)
+    cleaned = re.sub(r":\s*int\b", ": 0", cleaned)
+    return json.loads(cleaned)
+
+
+def _compile_str():
+    def validate_str(value):
+        if value is None:
+            return ""
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float, bool)):
+            return str(value)
+        raise SchemaError(f"expected a string, got {type(value).__name__}")
+
+    return validate_str
+
+
+def _compile_int():
+    def validate_int(value):
+        if isinstance(value, bool):
+            raise SchemaError("expected an integer, got bool")
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            return int(value.strip())
+        raise SchemaError(f"expected an integer, got {value!r}")
+
+    return validate_int
+
+
+def _compile_list(example: list):
+    validate_item = _compile(example[0], nested=True) if example else None
+
+    def validate_list(value):
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            value = [value]
+        if validate_item is None:
+            return list(value)
+        items = []
+        for item in value:
+            try:
+                items.append(validate_item(item))
+            except SchemaError:
+                continue
+        return items
+
+    return validate_list
+
+
+def _compile_dict(example: dict, nested: bool):
+    fields = [(key, _compile(value, nested=True)) for key, value in example.items()]
+
+    def validate_dict(value):
+        if not isinstance(value, dict):
+            raise SchemaError(f"expected an object, got {type(value).__name__}")
+        result = {key: validate(value.get(key)) for key, validate in fields}
+        if nested and any(v == "" or v == [] for v in result.values()):
+            raise SchemaError("list item is missing a field")
+        return result
+
+    return validate_dict
+
+
+def _compile(example, nested: bool = False):
+    if isinstance(example, dict):
+        return _compile_dict(example, nested)
+    if isinstance(example, list):
+        return _compile_list(example)
+    if isinstance(example, bool):
+        raise SchemaError("bool fields are not supported")
+    if isinstance(example, int):
+        return _compile_int()
+    return _compile_str()
+
+
+def _check_quiz(content: dict) -> dict:
+    content["questions"] = [
+        q for q in content["questions"] if 0 <= q["correct_answer"] < len(q["options"])
+    ]
+    return content
+
+
+_POST_CHECKS = {"Quiz": _check_quiz}
+
+
+def compile_validator(mode: str, json_structure: str):
+    """Build the one-pass validator for a mode's json_structure."""
+    validate_root = _compile(structure_example(json_structure))
+    post_check = _POST_CHECKS.get(mode)
+
+    def validate(data) -> dict | None:
+        try:
+            content = validate_root(data)
+        except SchemaError:
+            return None
+        if post_check is not None:
+            content = post_check(content)
+        if not any(content.values()):
+            return None
+        return content
+
+    return validate
+
+
+@functools.cache
+def _validators() -> dict:
+    from app.ai import PROMPTS
+
+    return {
+        mode: compile_validator(mode, details["json_structure"])
+        for mode, details in PROMPTS.items()
+    }
+
+
+def validate(mode: str, data) -> dict | None:
+    """Coerce parsed content to `mode`'s shape, or None if it is unusable."""
+    validator = _validators().get(mode)
+    if validator is None:
+        return None
+    return validator(data)
+
+
+# String fields that are joined across parts instead of keeping the first.
+_JOINED_FIELDS = {"Summary": {"summary"}}
+
+
+def merge(mode: str, parts: list[dict]) -> dict:
+    """Combine validated per-page results for `mode` into one result.
+
+    List fields are concatenated in page order; string fields keep the first
+    non-empty value, except `_JOINED_FIELDS`, which are joined as paragraphs.
+    """
+    merged = dict(parts[0])
+    joined = _JOINED_FIELDS.get(mode, set())
+    for part in parts[1:]:
+        for key, value in part.items():
+            current = merged.get(key)
+            if isinstance(current, list) and isinstance(value, list):
+                merged[key] = current + value
+            elif key in joined and value:
+                merged[key] = f"{current}\n\n{value}" if current else value
+            elif not current:
+                merged[key] = value
+    return merged
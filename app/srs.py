@@ -0,0 +1,57 @@
+"""SM-2 spaced-repetition scheduling for review cards.
+
+Grades follow SM-2's 0-5 scale; the review UI offers Again (1), Hard (3),
+Good (4) and Easy (5). A failed card starts over and comes back after
+`RELEARN_MINUTES`; passed cards are spaced 1 day, 6 days, then by the
+previous interval times the card's ease factor.
+"""
+
+import time
+from typing import TypedDict
+
+MIN_EASE = 1.3
+RELEARN_MINUTES = 10
+DAY_SECONDS = 86400
+
+GRADES = {"Again": 1, "Hard": 3, "Good": 4, "Easy": 5}
+
+
+class Schedule(TypedDict):
+    ease: float
+    interval_days: float
+    repetitions: int
+    due_at: float
+
+
+def schedule(
+    ease: float,
+    interval_days: float,
+    repetitions: int,
+    grade: int,
+    now: float | None = None,
+) -> Schedule:
+    """Next review state for a card answered with `grade`."""
+    now = time.time() if now is None else now
+    grade = max(0, min(5, grade))
+    ease = ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02)
+    ease = round(max(MIN_EASE, ease), 2)
+    if grade < 3:
+        return Schedule(
+            ease=ease,
+            interval_days=0,
+            repetitions=0,
+            due_at=now + RELEARN_MINUTES * 60,
+        )
+    repetitions += 1
+    if repetitions == 1:
+        interval_days = 1
+    elif repetitions == 2:
+        interval_days = 6
+    else:
+        interval_days = round(interval_days * ease, 2)
+    return Schedule(
+        ease=ease,
+        interval_days=interval_days,
+        repetitions=repetitions,
+        due_at=now + interval_days * DAY_SECONDS,
+    )
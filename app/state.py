@@ -1,18 +1,45 @@
 import reflex as rx
-import asyncio
-from typing import Literal, TypedDict, Union
-import json
+import os
+import random
+import logging
+from typing import Literal, TypedDict
 from app.database import (
+    HISTORY_PAGE_SIZE,
     GeneratedContentHistory,
-    add_history,
-    get_all_history,
+    HistoryEntry,
+    enqueue_job,
+    get_history_item,
+    get_history_page,
+    get_quiz_bank,
+    record_generation,
+    record_quiz_attempt,
     create_db_and_tables,
 )
+from app.ai import PROMPTS, generate_content, normalize_topic
+from app.documents import is_document
+from app.jobs import abort_job, notify_workers, store_result, wait_for_job
+from app.quotas import admit, record_tokens
+from app import codec, metrics
+from app.schemas import validate
 from app.utils import create_pdf_from_content, create_txt_from_content
 from app.states.auth_state import AuthState
 
 StudyMode = Literal["Notes", "Summary", "Explain", "Quiz", "Flashcards"]
 
+QUIZ_SIZE = 5
+MAX_UPLOAD_FILES = 10
+# Modes generated in the background for a typed input once its first result
+# is in, so switching to them is instant. Each counts against the user's
+# quota like a normal generation. Off unless configured, e.g. "Summary,Quiz".
+SPECULATIVE_MODES = [
+    mode.strip()
+    for mode in os.getenv("STUDYGENIE_SPECULATIVE_MODES", "").split(",")
+    if mode.strip() in PROMPTS
+]
+SPECULATIVE_MAX_INPUT_CHARS = int(
+    os.getenv("STUDYGENIE_SPECULATIVE_MAX_INPUT_CHARS", "2000")
+)
+
 
 class NotesContent(TypedDict):
     heading: str
@@ -35,26 +62,26 @@ class QuizQuestion(TypedDict):
     question: str
     options: list[str]
     correct_answer: int
-    selected_option: int | None
-
-
-class QuizContent(TypedDict):
-    questions: list[QuizQuestion]
 
 
 class Flashcard(TypedDict):
     question: str
     answer: str
-    flipped: bool
 
 
-class FlashcardsContent(TypedDict):
-    cards: list[Flashcard]
+EMPTY_NOTES: NotesContent = {"heading": "", "bullets": [], "mnemonic": None}
+EMPTY_SUMMARY: SummaryContent = {"summary": "", "takeaways": []}
+EMPTY_EXPLAIN: ExplainContent = {"steps": [], "example": "", "analogy": ""}
 
 
-GeneratedContent = Union[
-    str, NotesContent, SummaryContent, ExplainContent, QuizContent, FlashcardsContent
-]
+class ModeResult(TypedDict):
+    """The last result of one mode, kept so switching back to it is instant."""
+
+    content: dict
+    bank: list[dict]
+    text: str
+    user_input: str
+    saved: bool
 
 
 class StudyGenieState(rx.State):
@@ -62,10 +89,32 @@ class StudyGenieState(rx.State):
 
     current_mode: StudyMode = "Notes"
     user_input: str = ""
-    generated_content: GeneratedContent = ""
-    is_loading: bool = False
-    history: list[GeneratedContentHistory] = []
-    image: str = ""
+    has_content: bool = False
+    notes: NotesContent = EMPTY_NOTES
+    summary: SummaryContent = EMPTY_SUMMARY
+    explanation: ExplainContent = EMPTY_EXPLAIN
+    quiz_questions: list[QuizQuestion] = []
+    flashcards: list[Flashcard] = []
+    quiz_bank_size: int = 0
+    _quiz_bank: list[dict] = []
+    _results: dict[str, ModeResult] = {}
+    _content: dict = {}
+    _content_text: str = ""
+    history: list[HistoryEntry] = []
+    history_has_more: bool = False
+    uploads: list[str] = []
+    # mode -> id of the generation job in flight for it; one per mode
+    job_ids: dict[str, int] = {}
+    content_version: int = 0
+    # Bumped when new quiz questions or flashcards are kept, so answers and
+    # flips chosen in the browser survive switching modes but not new content
+    quiz_version: int = 0
+    flashcards_version: int = 0
+
+    @rx.var
+    def is_loading(self) -> bool:
+        """Whether the mode on screen is waiting for its generation job."""
+        return self.current_mode in self.job_ids
 
     @rx.event
     async def on_load(self):
@@ -74,93 +123,284 @@ class StudyGenieState(rx.State):
         if not auth_state.is_authenticated or not auth_state.user:
             return rx.redirect("/login")
         await create_db_and_tables()
-        self.history = await get_all_history(auth_state.user["id"])
+        self.history = await get_history_page(auth_state.user["id"])
+        self.history_has_more = len(self.history) == HISTORY_PAGE_SIZE
+        return [StudyGenieState.watch_job(job_id) for job_id in self.job_ids.values()]
+
+    def _remember(self, mode: str, content: dict, user_input: str, saved: bool = True):
+        """Keep validated content as the mode's last result; one per mode."""
+        bank = []
+        if mode == "Quiz":
+            bank = content["questions"]
+            content = {"questions": random.sample(bank, min(QUIZ_SIZE, len(bank)))}
+            self.quiz_version += 1
+        elif mode == "Flashcards":
+            self.flashcards_version += 1
+        self._results = {
+            **self._results,
+            mode: ModeResult(
+                content=content,
+                bank=bank,
+                text=create_txt_from_content(content, mode),
+                user_input=user_input,
+                saved=saved,
+            ),
+        }
+
+    def _publish(self, mode: str):
+        """Show the mode's last result through the var for that mode only."""
+        result = self._results[mode]
+        content = result["content"]
+        if mode == "Notes":
+            self.notes = content
+        elif mode == "Summary":
+            self.summary = content
+        elif mode == "Explain":
+            self.explanation = content
+        elif mode == "Quiz":
+            self._quiz_bank = result["bank"]
+            self.quiz_bank_size = len(self._quiz_bank)
+            self.quiz_questions = content["questions"]
+        elif mode == "Flashcards":
+            self.flashcards = content["cards"]
+        self.current_mode = mode
+        self.user_input = result["user_input"]
+        self._content = content
+        self._content_text = result["text"]
+        self.has_content = True
+        self.content_version += 1
+
+    def _show_content(self, mode: str, content: dict):
+        self._remember(mode, content, self.user_input)
+        self._publish(mode)
+
+    def _prepend_history(self, item: GeneratedContentHistory):
+        self.history.insert(
+            0,
+            HistoryEntry(
+                id=item["id"],
+                topic=item["topic"],
+                mode=item["mode"],
+                created_at=item["created_at"],
+            ),
+        )
+
+    def _clear_content(self):
+        """Hide the current result; per-mode vars are overwritten on next show."""
+        if self.has_content:
+            self._content = {}
+            self._content_text = ""
+            self.has_content = False
+            self.content_version += 1
 
     @rx.event
-    def set_mode(self, mode: StudyMode):
-        """Sets the current study mode."""
+    async def set_mode(self, mode: StudyMode):
+        """Switch modes, showing the mode's last result instantly if there is one.
+
+        A speculative result is saved to history the first time it is shown.
+        """
         self.current_mode = mode
-        self.generated_content = ""
-        self.user_input = ""
-        self.image = ""
+        result = self._results.get(mode)
+        if result is None:
+            self._clear_content()
+            return
+        self._publish(mode)
+        if result["saved"]:
+            return
+        auth_state = await self.get_state(AuthState)
+        if not auth_state.user:
+            return
+        data = {"questions": result["bank"]} if mode == "Quiz" else result["content"]
+        history_item = await store_result(
+            auth_state.user["id"], mode, result["user_input"], data
+        )
+        if history_item:
+            self._results = {**self._results, mode: {**result, "saved": True}}
+            self._prepend_history(history_item)
+            metrics.SPECULATIVE_GENERATIONS.inc(mode=mode, outcome="used")
 
     @rx.event
-    def select_quiz_option(self, question_index: int, option_index: int):
-        """Selects an option for a quiz question."""
-        if (
-            isinstance(self.generated_content, dict)
-            and "questions" in self.generated_content
-        ):
-            self.generated_content["questions"][question_index]["selected_option"] = (
-                option_index
-            )
+    async def submit_quiz(self, answers: dict[str, int]):
+        """Score the quiz answers chosen in the browser."""
+        auth_state = await self.get_state(AuthState)
+        if not auth_state.is_authenticated or not auth_state.user:
+            return rx.redirect("/login")
+        if self.current_mode != "Quiz" or not self.has_content:
+            return
+        questions = self.quiz_questions
+        prefix = f"{self.quiz_version}:"
+        correct = sum(
+            answers.get(f"{prefix}{index}") == question["correct_answer"]
+            for index, question in enumerate(questions)
+        )
+        metrics.QUIZ_SUBMISSIONS.inc()
+        await record_quiz_attempt(auth_state.user["id"], len(questions), correct)
+        return rx.toast.info(f"You scored {correct} out of {len(questions)}.")
 
     @rx.event
-    def flip_flashcard(self, card_index: int):
-        """Flips a flashcard."""
-        if (
-            isinstance(self.generated_content, dict)
-            and "cards" in self.generated_content
-        ):
-            self.generated_content["cards"][card_index][
-                "flipped"
-            ] = not self.generated_content["cards"][card_index]["flipped"]
+    def retake_quiz(self):
+        """Draw a fresh set of questions from the current bank, locally."""
+        if self.current_mode == "Quiz" and self._quiz_bank:
+            self._show_content("Quiz", {"questions": self._quiz_bank})
 
-    @rx.var
+    @rx.var(deps=["content_version"], auto_deps=False)
     def copyable_content(self) -> str:
-        """Returns the current generated content as a string for copying."""
-        if not self.generated_content or not isinstance(self.generated_content, dict):
-            return ""
-        return create_txt_from_content(self.generated_content, self.current_mode)
+        """The current content as text, rendered once per content version."""
+        return self._content_text
 
-    @rx.event(background=True)
+    @rx.event
     async def process_input(self, form_data: dict):
-        """Process user input to generate AI content."""
-        from app.ai import generate_content, generate_content_from_image
+        """Queue a generation job for the user's input and watch it.
 
+        Replaces the job in flight for the current mode, but only once the
+        request is served from the quiz bank or admitted by the quota; jobs
+        for other modes keep running.
+        """
+        auth_state = await self.get_state(AuthState)
+        if not auth_state.is_authenticated or not auth_state.user:
+            return rx.redirect("/login")
+        user_id = auth_state.user["id"]
+        mode = self.current_mode
+        user_input = form_data.get("user_input", "")
+        if mode == "Quiz" and user_input and not self.uploads:
+            bank = await get_quiz_bank(user_id, normalize_topic(user_input))
+            if len(bank) >= QUIZ_SIZE:
+                await self._abort_job(user_id, mode)
+                self.user_input = user_input
+                self._show_content("Quiz", {"questions": bank})
+                return
+        refusal = await admit(user_id)
+        if refusal:
+            return rx.toast.error(refusal)
+        await self._abort_job(user_id, mode)
+        self.user_input = user_input
+        self._clear_content()
+        job = await enqueue_job(
+            user_id=user_id,
+            mode=mode,
+            topic=self.user_input or self._upload_topic(),
+            user_input=self.user_input,
+            uploads=self.uploads,
+        )
+        if job is None:
+            return rx.toast.error("Could not start the generation. Please try again.")
+        notify_workers()
+        self.job_ids = {**self.job_ids, mode: job["id"]}
+        return StudyGenieState.watch_job(job["id"])
+
+    def _forget_job(self, job_id: int) -> str | None:
+        """Stop tracking a job; returns its mode, or None if it was not tracked."""
+        for mode, tracked in self.job_ids.items():
+            if tracked == job_id:
+                self.job_ids = {
+                    other: other_id
+                    for other, other_id in self.job_ids.items()
+                    if other != mode
+                }
+                return mode
+        return None
+
+    async def _abort_job(self, user_id: int, mode: str):
+        """Cancel this session's job in flight for `mode`, if any."""
+        job_id = self.job_ids.get(mode)
+        if job_id:
+            self._forget_job(job_id)
+            await abort_job(job_id, user_id)
+
+    @rx.event
+    async def cancel_generation(self):
+        """Stop the generation for the mode on screen; nothing is saved for it.
+
+        Jobs for other modes keep running; their results are kept for when the
+        user switches back (see `watch_job`).
+        """
+        auth_state = await self.get_state(AuthState)
+        if not auth_state.is_authenticated or not auth_state.user:
+            return rx.redirect("/login")
+        if not self.is_loading:
+            return
+        await self._abort_job(auth_state.user["id"], self.current_mode)
+
+    @rx.event(background=True)
+    async def watch_job(self, job_id: int):
+        """Wait for a generation job of this session and show its result.
+
+        If the user has switched modes meanwhile, the result is kept for when
+        they switch back instead of being shown.
+        """
+        job = await wait_for_job(job_id)
         async with self:
+            if self._forget_job(job_id) is None:
+                return
+            if job and job["uploads"]:
+                self.uploads = []
             auth_state = await self.get_state(AuthState)
-            if not auth_state.is_authenticated or not auth_state.user:
-                return rx.redirect("/login")
-            self.is_loading = True
-            self.user_input = form_data.get("user_input", "")
-            self.generated_content = ""
-        if self.image:
-            upload_dir = rx.get_upload_dir()
-            file_path = upload_dir / self.image
-            generated_data = await asyncio.to_thread(
-                generate_content_from_image,
-                self.current_mode,
-                self.user_input,
-                file_path,
+            if not job or job["status"] != "done" or not auth_state.user:
+                if job and job["status"] == "cancelled":
+                    return
+                error = (job and job["error"]) or "AI content generation failed."
+                logging.error(f"Generation job {job_id} failed: {error}")
+                return rx.toast.error(error)
+            history_item = await get_history_item(
+                job["history_id"], auth_state.user["id"]
             )
-        else:
-            generated_data = await asyncio.to_thread(
-                generate_content, self.current_mode, self.user_input
+            if history_item and history_item["content"] is None:
+                return rx.toast.error("The generated content is no longer available.")
+            content = history_item and validate(
+                history_item["mode"], codec.loads(history_item["content"])
             )
+            if not content:
+                return
+            self._remember(job["mode"], content, job["user_input"])
+            if self.current_mode == job["mode"]:
+                self._publish(job["mode"])
+            self._prepend_history(history_item)
+        if job["notice"]:
+            return rx.toast.warning(job["notice"])
+        if SPECULATIVE_MODES and job["user_input"] and not job["uploads"]:
+            return StudyGenieState.prefetch_modes
+
+    @rx.event(background=True)
+    async def prefetch_modes(self):
+        """Generate `SPECULATIVE_MODES` for the current input, one at a time.
+
+        Results are kept but not saved to history until the user opens them.
+        Stops when the input changes or the user's quota refuses.
+        """
         async with self:
-            if generated_data:
-                if self.current_mode == "Quiz":
-                    for question in generated_data.get("questions", []):
-                        question["selected_option"] = None
-                elif self.current_mode == "Flashcards":
-                    for card in generated_data.get("cards", []):
-                        card["flipped"] = False
-                self.generated_content = generated_data
-                auth_state = await self.get_state(AuthState)
-                if auth_state.is_authenticated and auth_state.user:
-                    history_item = await add_history(
-                        topic=self.user_input or f"Image analysis ({self.image})",
-                        mode=self.current_mode,
-                        content=json.dumps(self.generated_content),
-                        user_id=auth_state.user["id"],
-                    )
-                    if history_item:
-                        self.history.insert(0, history_item)
-            else:
-                print("AI content generation failed.")
-            self.is_loading = False
-            self.image = ""
+            user_input = self.user_input
+            auth_state = await self.get_state(AuthState)
+            user = auth_state.user
+            modes = [
+                mode
+                for mode in SPECULATIVE_MODES
+                if mode not in self._results
+                or self._results[mode]["user_input"] != user_input
+            ]
+        if not user or not user_input or len(user_input) > SPECULATIVE_MAX_INPUT_CHARS:
+            return
+        for mode in modes:
+            if await admit(user["id"]):
+                return
+            usage: dict = {}
+            data = await metrics.to_thread(
+                "generate_content", generate_content, mode, user_input, usage
+            )
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            record_tokens(user["id"], prompt_tokens + completion_tokens)
+            await record_generation(
+                user["id"], mode, prompt_tokens, completion_tokens, failed=not data
+            )
+            if not data:
+                continue
+            metrics.SPECULATIVE_GENERATIONS.inc(mode=mode, outcome="generated")
+            async with self:
+                if self.user_input != user_input or self.job_ids:
+                    return
+                existing = self._results.get(mode)
+                if existing is None or existing["user_input"] != user_input:
+                    self._remember(mode, data, user_input, saved=False)
 
     @rx.event
     async def handle_upload(self, files: list[rx.UploadFile]):
@@ -171,30 +411,65 @@ class StudyGenieState(rx.State):
             return
         if not files:
             return
-        file = files[0]
-        upload_data = await file.read()
         upload_dir = rx.get_upload_dir()
-        file_path = upload_dir / file.name
-        with file_path.open("wb") as f:
-            f.write(upload_data)
-        self.image = file.name
+        accepted = files[: max(MAX_UPLOAD_FILES - len(self.uploads), 0)]
+        for file in accepted:
+            upload_data = await file.read()
+            file_path = upload_dir / file.name
+            with file_path.open("wb") as f:
+                f.write(upload_data)
+            if file.name not in self.uploads:
+                self.uploads.append(file.name)
         yield rx.clear_selected_files("upload_image")
-        yield rx.toast.success(f"Uploaded {file.name}")
+        if accepted:
+            yield rx.toast.success(f"Uploaded {len(accepted)} file(s)")
+        if len(files) > len(accepted):
+            yield rx.toast.warning(
+                f"Skipped {len(files) - len(accepted)} file(s): at most {MAX_UPLOAD_FILES} files can be attached."
+            )
+
+    def _upload_topic(self) -> str:
+        kind = "Document" if any(map(is_document, self.uploads)) else "Image"
+        return f"{kind} analysis ({', '.join(self.uploads)})"
+
+    @rx.event
+    def remove_upload(self, name: str):
+        """Drop an uploaded file from the next generation."""
+        self.uploads = [upload for upload in self.uploads if upload != name]
+
+    @rx.event
+    async def load_more_history(self):
+        """Fetch the next page of history entries older than the last shown."""
+        auth_state = await self.get_state(AuthState)
+        if not auth_state.is_authenticated or not self.history:
+            return
+        page = await get_history_page(
+            auth_state.user["id"], before_id=self.history[-1]["id"]
+        )
+        self.history.extend(page)
+        self.history_has_more = len(page) == HISTORY_PAGE_SIZE
 
     @rx.event
-    async def load_from_history(self, history_item: GeneratedContentHistory):
+    async def load_from_history(self, item_id: int):
         """Load content from a history item."""
         auth_state = await self.get_state(AuthState)
         if not auth_state.is_authenticated:
             yield rx.redirect("/login")
             return
-        if history_item["user_id"] != auth_state.user["id"]:
+        history_item = await get_history_item(item_id, auth_state.user["id"])
+        if history_item is None:
             yield rx.toast.error("Access denied.")
             return
-        self.current_mode = history_item["mode"]
+        if history_item["content"] is None:
+            yield rx.toast.error("This history item's content is no longer available.")
+            return
+        content = validate(history_item["mode"], codec.loads(history_item["content"]))
+        if content is None:
+            yield rx.toast.error("This history item could not be loaded.")
+            return
         self.user_input = history_item["topic"]
-        self.generated_content = json.loads(history_item["content"])
-        self.image = ""
+        self._show_content(history_item["mode"], content)
+        self.uploads = []
 
     @rx.event
     async def download_pdf(self):
@@ -202,10 +477,10 @@ class StudyGenieState(rx.State):
         auth_state = await self.get_state(AuthState)
         if not auth_state.is_authenticated:
             return rx.redirect("/login")
-        if not self.generated_content:
+        if not self._content:
             return
         pdf_bytes = create_pdf_from_content(
-            self.generated_content, self.current_mode, self.user_input
+            self._content, self.current_mode, self.user_input
         )
         return rx.download(
             data=pdf_bytes, filename=f"{self.user_input[:20]}_{self.current_mode}.pdf"
@@ -217,9 +492,9 @@ class StudyGenieState(rx.State):
         auth_state = await self.get_state(AuthState)
         if not auth_state.is_authenticated:
             return rx.redirect("/login")
-        if not self.generated_content:
+        if not self._content:
             return
-        txt_content = create_txt_from_content(self.generated_content, self.current_mode)
         return rx.download(
-            data=txt_content, filename=f"{self.user_input[:20]}_{self.current_mode}.txt"
+            data=self._content_text,
+            filename=f"{self.user_input[:20]}_{self.current_mode}.txt",
         )
\ No newline at end of file
@@ -0,0 +1,63 @@
+import time
+import reflex as rx
+from app.database import (
+    ReviewCard,
+    create_db_and_tables,
+    get_due_cards,
+    update_review_card,
+)
+from app.srs import GRADES, schedule
+from app.states.auth_state import AuthState
+
+REVIEW_BATCH_SIZE = 20
+
+
+class ReviewState(rx.State):
+    """Spaced-repetition review of stored flashcards; never calls the AI."""
+
+    queue: list[ReviewCard] = []
+    show_answer: bool = False
+    reviewed: int = 0
+
+    @rx.var
+    def current_card(self) -> ReviewCard | None:
+        return self.queue[0] if self.queue else None
+
+    async def _refill(self, user_id: int):
+        self.queue = await get_due_cards(user_id, time.time(), REVIEW_BATCH_SIZE)
+
+    @rx.event
+    async def on_load(self):
+        """Fetch the next batch of due cards."""
+        auth_state = await self.get_state(AuthState)
+        if not auth_state.is_authenticated or not auth_state.user:
+            return rx.redirect("/login")
+        await create_db_and_tables()
+        self.show_answer = False
+        self.reviewed = 0
+        await self._refill(auth_state.user["id"])
+
+    @rx.event
+    def reveal(self):
+        self.show_answer = True
+
+    @rx.event
+    async def grade(self, label: str):
+        """Reschedule the current card and move on to the next one."""
+        auth_state = await self.get_state(AuthState)
+        if not auth_state.is_authenticated or not auth_state.user:
+            return rx.redirect("/login")
+        if not self.queue or label not in GRADES:
+            return
+        card = self.queue.pop(0)
+        await update_review_card(
+            card["id"],
+            auth_state.user["id"],
+            **schedule(
+                card["ease"], card["interval_days"], card["repetitions"], GRADES[label]
+            ),
+        )
+        self.show_answer = False
+        self.reviewed += 1
+        if not self.queue:
+            await self._refill(auth_state.user["id"])
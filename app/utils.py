@@ -1,11 +1,21 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
 from io import BytesIO
+from app import metrics
 
 
 def create_pdf_from_content(content: dict, mode: str, topic: str) -> bytes:
     """Generates a PDF from the given content."""
+    with metrics.span("export.pdf", mode=mode):
+        pdf_bytes = _build_pdf(content, mode, topic)
+    metrics.PDF_BYTES.observe(len(pdf_bytes), mode=mode)
+    return pdf_bytes
+
+
+def _build_pdf(content: dict, mode: str, topic: str) -> bytes:
+    # ReportLab (and the PIL it pulls in) is only loaded on the first export.
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
     styles = getSampleStyleSheet()
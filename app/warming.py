@@ -0,0 +1,138 @@
+"""Off-peak warming of the generation cache with popular topics.
+
+Once a day, at `STUDYGENIE_WARM_HOUR` (local time, default 4), one backend
+process aggregates the most requested typed topics per mode from
+`generatedcontenthistory` over the last `STUDYGENIE_WARM_WINDOW_DAYS`
+(default 14), leaving out items generated from uploads and merging spellings
+that share a cache key. It then generates the ones missing from the
+generation cache, busiest first. Entries already cached but not warmed
+within `STUDYGENIE_WARM_REFRESH_HOURS` (default 72) are refreshed with any
+budget left. A run stops at `STUDYGENIE_WARM_MAX_CALLS` upstream calls or
+`STUDYGENIE_WARM_TOKEN_BUDGET` tokens, whichever comes first.
+
+Warming only pays off when the cache is shared with the serving workers, so
+it is skipped on process-local backends such as the default `memory://`; set
+`STUDYGENIE_CACHE_URL` to a SQLite or Redis URL to enable it.
+
+Run once by hand with `python -m app.warming`.
+"""
+
+import os
+import asyncio
+import datetime
+import logging
+from collections import Counter
+from app import metrics
+from app.cache import get_cache
+from app.database import (
+    PopularTopic,
+    create_db_and_tables,
+    get_topic_counts,
+)
+from app.scheduling import run_daily
+
+WARM_HOUR = int(os.getenv("STUDYGENIE_WARM_HOUR", "4"))
+WINDOW_DAYS = float(os.getenv("STUDYGENIE_WARM_WINDOW_DAYS", "14"))
+TOPICS_PER_MODE = int(os.getenv("STUDYGENIE_WARM_TOPICS_PER_MODE", "25"))
+MIN_HITS = int(os.getenv("STUDYGENIE_WARM_MIN_HITS", "3"))
+REFRESH_HOURS = float(os.getenv("STUDYGENIE_WARM_REFRESH_HOURS", "72"))
+MAX_CALLS = int(os.getenv("STUDYGENIE_WARM_MAX_CALLS", "100"))
+TOKEN_BUDGET = int(os.getenv("STUDYGENIE_WARM_TOKEN_BUDGET", "200000"))
+
+
+def _popular(counts: list[PopularTopic]) -> list[PopularTopic]:
+    """Merge counts by normalized topic and keep each mode's busiest, in order.
+
+    A merged topic keeps its most requested spelling.
+    """
+    from app.ai import normalize_topic
+
+    merged: dict[tuple[str, str], PopularTopic] = {}
+    for row in sorted(counts, key=lambda row: row["hits"], reverse=True):
+        key = (row["mode"], normalize_topic(row["topic"]))
+        if not key[1]:
+            continue
+        if key in merged:
+            merged[key]["hits"] += row["hits"]
+        else:
+            merged[key] = PopularTopic(**row)
+    per_mode: Counter = Counter()
+    topics = []
+    for topic in sorted(merged.values(), key=lambda topic: topic["hits"], reverse=True):
+        if per_mode[topic["mode"]] < TOPICS_PER_MODE:
+            per_mode[topic["mode"]] += 1
+            topics.append(topic)
+    return topics
+
+
+def _plan(topics: list[PopularTopic]) -> list[tuple[PopularTopic, str, bool]]:
+    """Order work as (topic, cache key, refresh): misses first, then refreshes."""
+    from app.ai import PROMPTS, generation_cache_key, select_route
+
+    cache = get_cache()
+    missing, stale = [], []
+    for topic in topics:
+        if topic["hits"] < MIN_HITS or topic["mode"] not in PROMPTS:
+            continue
+        route = select_route(topic["mode"], len(topic["topic"]))
+        key = generation_cache_key(topic["mode"], topic["topic"], route["name"])
+        if cache.get_json(key, namespace="warming") is None:
+            missing.append((topic, key, False))
+        elif cache.get_json(f"warm:{key}", namespace="warming") is None:
+            stale.append((topic, key, True))
+    return missing + stale
+
+
+async def warm_cache(
+    max_calls: int = MAX_CALLS, token_budget: int = TOKEN_BUDGET
+) -> dict:
+    """Run one warming pass and return what it did."""
+    from app.ai import generate_content
+
+    cache = get_cache()
+    if not cache.shared:
+        logging.info("Cache warming skipped: the cache backend is not shared")
+        return {"skipped": True}
+    since = (datetime.datetime.now() - datetime.timedelta(days=WINDOW_DAYS)).isoformat()
+    topics = _popular(await get_topic_counts(since))
+    plan = await asyncio.to_thread(_plan, topics)
+    usage: dict = {}
+    report = {"candidates": len(plan), "generated": 0, "refreshed": 0, "failed": 0}
+    for topic, key, refresh in plan:
+        calls = report["generated"] + report["refreshed"] + report["failed"]
+        tokens = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+        if calls >= max_calls or tokens >= token_budget:
+            break
+        result = await metrics.to_thread(
+            "warm_cache",
+            generate_content,
+            topic["mode"],
+            topic["topic"],
+            usage,
+            refresh,
+        )
+        if not result:
+            report["failed"] += 1
+            continue
+        await asyncio.to_thread(cache.set_json, f"warm:{key}", 1, REFRESH_HOURS * 3600)
+        report["refreshed" if refresh else "generated"] += 1
+    report["tokens"] = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+    for outcome in ("generated", "refreshed", "failed"):
+        metrics.WARMED_TOPICS.inc(report[outcome], outcome=outcome)
+    logging.info(f"Cache warming finished: {report}")
+    return report
+
+
+async def run_warming_scheduler():
+    """Lifespan task: warm the cache once a day in the off-peak hour."""
+    await run_daily("warm_cache", WARM_HOUR, warm_cache)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main():
+        await create_db_and_tables()
+        print(await warm_cache())
+
+    asyncio.run(_main())
@@ -0,0 +1,55 @@
+"""Micro-benchmark of parse + validate cost per mode and JSON codec.
+
+    python -m benchmarks.bench_codec --iterations 20000
+"""
+
+import argparse
+import json
+import sys
+import timeit
+
+from app import codec
+from app.ai import PROMPTS
+from app.providers import mock_payload
+from app.schemas import validate
+
+
+def bench_mode(mode: str, iterations: int) -> dict:
+    payload = json.dumps(mock_payload(mode, "The Krebs cycle"))
+    results = {"payload_bytes": len(payload)}
+    for name in codec.BACKENDS:
+        codec.set_backend(name)
+        loads = codec.loads
+        parse = timeit.timeit(lambda: loads(payload), number=iterations)
+        both = timeit.timeit(lambda: validate(mode, loads(payload)), number=iterations)
+        results[name] = {
+            "parse_us": 1e6 * parse / iterations,
+            "parse_validate_us": 1e6 * both / iterations,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args(argv)
+
+    default_backend = codec.backend
+    results = {mode: bench_mode(mode, args.iterations) for mode in PROMPTS}
+    codec.set_backend(default_backend)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    for mode, result in results.items():
+        for name in codec.BACKENDS:
+            print(
+                f"{mode:12} {name:7} {result['payload_bytes']:6}B "
+                f"parse={result[name]['parse_us']:7.2f}us "
+                f"parse+validate={result[name]['parse_validate_us']:7.2f}us"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Cold-start import profile of `app.app` with a regression budget.
+
+Imports `app.app` in fresh interpreters under `python -X importtime`, reports
+the median cumulative time and the slowest `app.*` modules, and fails if the
+median exceeds the budget or if a dependency that should load lazily (PDF
+export and ingestion, provider SDKs) is imported at startup.
+
+    python -m benchmarks.bench_import --runs 5 --budget-ms 1500
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# PIL is left out: Reflex itself imports it to serialize image vars.
+LAZY_MODULES = ("reportlab", "pypdf", "openai", "anthropic")
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile_once(module: str) -> dict[str, tuple[int, int]]:
+    """Map each imported module to (self_us, cumulative_us) for one cold run."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.getenv("STUDYGENIE_IMPORT_BUDGET_MS", "1500")),
+    )
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [profile_once(args.module) for _ in range(args.runs)]
+    median_ms = statistics.median(run[args.module][1] for run in runs) / 1000
+    last = runs[-1]
+    own = sorted(
+        (name for name in last if name.startswith("app.")),
+        key=lambda name: last[name][1],
+        reverse=True,
+    )
+    for name in own[: args.top]:
+        self_us, cumulative_us = last[name]
+        print(
+            f"{name:40} self={self_us / 1000:8.1f}ms cumulative={cumulative_us / 1000:8.1f}ms"
+        )
+    print(f"{args.module} median cold import: {median_ms:.1f}ms over {args.runs} runs")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"{median_ms:.1f}ms exceeds the {args.budget_ms:.0f}ms budget")
+    eager = [name for name in LAZY_MODULES if name in last]
+    if eager:
+        failures.append(f"imported at startup but should be lazy: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""End-to-end latency/throughput benchmark for the generation pipeline.
+
+Drives the real `StudyGenieState` event handlers (`process_input` and the
+`watch_job` task it schedules, `load_from_history`, `download_pdf`), the
+generation job workers and the `app.database` functions
+against the mock AI provider and a throwaway SQLite file, with N simulated
+users running concurrently.
+
+    python -m benchmarks.bench_pipeline --users 20 --iterations 10 \\
+        --output bench.json --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+MODES = ["Notes", "Summary", "Explain", "Quiz", "Flashcards"]
+TOPICS = [
+    "Photosynthesis",
+    "Newton's laws of motion",
+    "The French Revolution",
+    "Binary search trees",
+    "Supply and demand",
+    "The Krebs cycle",
+]
+
+
+def configure_environment(db_path: Path, latency_ms: float):
+    """Point reflex at a temp database and `app.ai` at the mock provider."""
+    db_url = f"sqlite:///{db_path}"
+    os.environ["DB_URL"] = db_url
+    os.environ["REFLEX_DB_URL"] = db_url
+    os.environ["STUDYGENIE_PROVIDER"] = "mock"
+    os.environ["STUDYGENIE_MOCK_LATENCY_MS"] = str(latency_ms)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def measure(self, name: str, coro):
+        start = time.perf_counter()
+        try:
+            result = await coro
+        except Exception:
+            self.errors[name] += 1
+            return None
+        self.samples[name].append(time.perf_counter() - start)
+        return result
+
+    def summary(self, wall_time: float) -> dict:
+        operations = {}
+        for name, values in sorted(self.samples.items()):
+            values.sort()
+            operations[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "mean_ms": 1000 * sum(values) / len(values),
+                "p50_ms": 1000 * percentile(values, 0.50),
+                "p95_ms": 1000 * percentile(values, 0.95),
+                "p99_ms": 1000 * percentile(values, 0.99),
+                "throughput_per_s": len(values) / wall_time if wall_time else 0.0,
+            }
+        return operations
+
+
+class _AuthStandIn:
+    def __init__(self, user):
+        self.user = user
+        self.is_authenticated = True
+
+
+class BenchSession:
+    """A `StudyGenieState` wrapped to run handlers outside a Reflex server.
+
+    Mimics the `StateProxy` that background tasks receive (`async with self`)
+    and answers `get_state(AuthState)` with a logged-in user.
+    """
+
+    def __init__(self, state_cls, user):
+        object.__setattr__(self, "_state", state_cls(_reflex_internal_init=True))
+        object.__setattr__(self, "_auth", _AuthStandIn(user))
+
+    def __getattr__(self, name):
+        return getattr(self._state, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._state, name, value)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def get_state(self, state_cls):
+        return self._auth
+
+
+async def _drain(result):
+    """Await a handler result, exhausting it if it is an async generator."""
+    if hasattr(result, "__anext__"):
+        return [item async for item in result]
+    return await result
+
+
+async def generate(session, state_cls, topic: str):
+    """`process_input` followed by the `watch_job` task it schedules."""
+    await _drain(state_cls.process_input.fn(session, {"user_input": topic}))
+    job_id = session.job_ids.get(session.current_mode)
+    if job_id:
+        await _drain(state_cls.watch_job.fn(session, job_id))
+
+
+async def simulate_user(index: int, iterations: int, recorder: Recorder, rng):
+    from app import database
+    from app.state import StudyGenieState
+
+    user = await recorder.measure(
+        "db.add_user",
+        database.add_user(f"bench{index}", f"bench{index}@example.com", "x"),
+    )
+    if not user:
+        return
+    session = BenchSession(StudyGenieState, user)
+    for _ in range(iterations):
+        session.current_mode = rng.choice(MODES)
+        topic = rng.choice(TOPICS)
+        await recorder.measure(
+            "state.process_input",
+            generate(session, StudyGenieState, topic),
+        )
+        history = await recorder.measure(
+            "db.get_history_page", database.get_history_page(user["id"])
+        )
+        if history:
+            await recorder.measure(
+                "state.load_from_history",
+                _drain(StudyGenieState.load_from_history.fn(session, history[0]["id"])),
+            )
+            await recorder.measure(
+                "state.download_pdf",
+                _drain(StudyGenieState.download_pdf.fn(session)),
+            )
+        await recorder.measure(
+            "db.get_user_by_email", database.get_user_by_email(user["email"])
+        )
+        await recorder.measure(
+            "db.get_user_by_username", database.get_user_by_username(user["username"])
+        )
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(args) -> dict:
+    from app.database import create_db_and_tables
+    from app.jobs import run_job_workers
+
+    await create_db_and_tables()
+    workers = asyncio.create_task(run_job_workers(args.workers))
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            simulate_user(i, args.iterations, recorder, random.Random(rng.random()))
+            for i in range(args.users)
+        )
+    )
+    wall_time = time.perf_counter() - start
+    workers.cancel()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    operations = recorder.summary(wall_time)
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users,
+            "iterations": args.iterations,
+            "workers": args.workers,
+            "mock_latency_ms": args.mock_latency_ms,
+            "seed": args.seed,
+        },
+        "wall_time_s": wall_time,
+        "throughput_per_s": sum(op["count"] for op in operations.values()) / wall_time,
+        "memory": {
+            "tracemalloc_peak_mb": peak / 2**20,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "operations": operations,
+    }
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Per-operation p50/p95 deltas against a previous result file."""
+    lines = [f"Compared with {baseline.get('commit', '?')}:"]
+    for name, op in current["operations"].items():
+        base = baseline.get("operations", {}).get(name)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            delta = (op[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+            lines.append(
+                f"  {name:28} {key} {base[key]:9.2f} -> {op[key]:9.2f} ({delta:+.1f}%)"
+            )
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mock-latency-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(Path(tmp) / "bench.db", args.mock_latency_ms)
+        results = asyncio.run(run(args))
+
+    for name, op in results["operations"].items():
+        print(
+            f"{name:28} n={op['count']:<5} p50={op['p50_ms']:8.2f}ms "
+            f"p95={op['p95_ms']:8.2f}ms p99={op['p99_ms']:8.2f}ms "
+            f"err={op['errors']}"
+        )
+    print(
+        f"throughput={results['throughput_per_s']:.1f} ops/s "
+        f"peak_alloc={results['memory']['tracemalloc_peak_mb']:.1f}MB "
+        f"max_rss={results['memory']['max_rss_mb']:.1f}MB"
+    )
+    if args.compare:
+        print("\n".join(compare(results, json.loads(args.compare.read_text()))))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
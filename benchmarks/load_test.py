@@ -0,0 +1,377 @@
+"""Concurrent-user load test against a running StudyGenie backend.
+
+Each simulated user opens its own websocket session, speaking the same
+socket.io protocol as the browser, and scripts a real visit: register or
+log in through `AuthState`, the index page's `on_load`, `process_input` in
+every mode (waiting for the `watch_job` result), submitting quiz answers,
+opening and paging history, and downloading the PDF. Reports throughput,
+latency percentiles and error counts per operation, plus the server's CPU
+and RSS over time when its process ids are given.
+
+Start the backend against the mock provider and a throwaway database, then
+run the load test:
+
+    DB_URL=sqlite:////tmp/load.db REFLEX_DB_URL=sqlite:////tmp/load.db \\
+        STUDYGENIE_PROVIDER=mock STUDYGENIE_MOCK_LATENCY_MS=800 \\
+        reflex run --env prod --backend-only --backend-port 8000
+    python -m benchmarks.load_test --users 50 --iterations 3 \\
+        --server-pid $(pgrep -f "reflex run" | paste -sd, -) --output load.json
+
+The socket.io client needs `aiohttp` (`pip install aiohttp`).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from benchmarks.bench_pipeline import MODES, TOPICS, Recorder, _git_commit
+
+EVENT_PATH = "/_event"
+FIELD_SUFFIX = "_rx_state_"
+PASSWORD = "loadtest-password"
+
+
+def _state_names() -> dict[str, str]:
+    """Full substate names used to address event handlers."""
+    import reflex as rx
+    from reflex.state import OnLoadInternalState
+    from app.state import StudyGenieState
+    from app.states.auth_state import AuthState
+
+    return {
+        "root": rx.State.get_full_name(),
+        "on_load": OnLoadInternalState.get_full_name(),
+        "auth": AuthState.get_full_name(),
+        "study": StudyGenieState.get_full_name(),
+    }
+
+
+class LoadSession:
+    """One browser tab: a socket.io connection plus a mirror of its state.
+
+    Events are sent one at a time and each waits for its final update, as
+    the frontend's event queue does; backend events an update asks for are
+    sent in turn, and frontend events (`_redirect`, `_download`, ...) are
+    returned to the caller.
+    """
+
+    def __init__(self, url: str, names: dict[str, str], timeout: float):
+        import socketio
+
+        self.url = url
+        self.names = names
+        self.timeout = timeout
+        self.token = str(uuid.uuid4())
+        self.path = "/"
+        self.state: dict[str, dict] = defaultdict(dict)
+        self._updates: asyncio.Queue = asyncio.Queue()
+        self._client = socketio.AsyncClient(reconnection=False)
+        self._client.on("event", self._updates.put_nowait, namespace=EVENT_PATH)
+
+    async def connect(self) -> "LoadSession":
+        await self._client.connect(
+            f"{self.url}?token={self.token}",
+            socketio_path=EVENT_PATH,
+            namespaces=[EVENT_PATH],
+            transports=["websocket"],
+            wait_timeout=self.timeout,
+        )
+        # The backend pushes the new session id to the state on connect.
+        await self._next_update()
+        return self
+
+    async def close(self):
+        await self._client.disconnect()
+
+    def get(self, state: str, name: str):
+        return self.state[self.names[state]].get(name)
+
+    async def _next_update(self) -> dict:
+        update = await asyncio.wait_for(self._updates.get(), self.timeout)
+        for substate, fields in (update.get("delta") or {}).items():
+            self.state[substate].update(
+                (name.removesuffix(FIELD_SUFFIX), value)
+                for name, value in fields.items()
+            )
+        return update
+
+    async def send(self, state: str, handler: str, **payload) -> list[dict]:
+        return await self._send(f"{self.names[state]}.{handler}", payload)
+
+    async def _send(self, name: str, payload: dict) -> list[dict]:
+        await self._client.emit(
+            "event",
+            {
+                "token": self.token,
+                "name": name,
+                "router_data": {
+                    "pathname": self.path,
+                    "query": {},
+                    "asPath": self.path,
+                },
+                "payload": payload,
+            },
+            namespace=EVENT_PATH,
+        )
+        events = []
+        while True:
+            update = await self._next_update()
+            events.extend(update.get("events") or [])
+            if update.get("final"):
+                break
+        frontend_events = []
+        for event in events:
+            if event["name"].startswith("_"):
+                frontend_events.append(event)
+            else:
+                frontend_events += await self._send(event["name"], event["payload"])
+        return frontend_events
+
+    async def visit(self, path: str, hydrate: bool = False) -> list[dict]:
+        """Navigate to `path` and run its `on_load` events."""
+        self.path = path
+        if hydrate:
+            await self.send("root", "hydrate")
+        return await self.send("on_load", "on_load_internal")
+
+    async def wait_for(self, predicate):
+        """Apply pushed updates (e.g. from background tasks) until `predicate()`."""
+        while not predicate():
+            await self._next_update()
+
+
+async def log_in(session: LoadSession, index: int, run_id: str) -> dict:
+    """Register on first use, then log in through the login page."""
+    email = f"load-{run_id}-{index}@example.com"
+    await session.visit("/register", hydrate=True)
+    await session.send(
+        "auth",
+        "register",
+        form_data={
+            "username": f"load-{run_id}-{index}",
+            "email": email,
+            "password": PASSWORD,
+            "confirm_password": PASSWORD,
+        },
+    )
+    await session.visit("/login")
+    events = await session.send(
+        "auth", "login", form_data={"email": email, "password": PASSWORD}
+    )
+    if not session.get("auth", "is_authenticated"):
+        raise RuntimeError(session.get("auth", "error_message") or "login failed")
+    for event in events:
+        if event["name"] == "_redirect":
+            await session.visit(event["payload"]["path"])
+    return session.get("auth", "user")
+
+
+async def generate(session: LoadSession, mode: str, topic: str):
+    """`process_input` in `mode`, then wait for `watch_job` to show the result."""
+    await session.send("study", "set_mode", mode=mode)
+    await session.send("study", "process_input", form_data={"user_input": topic})
+    await session.wait_for(lambda: not session.get("study", "is_loading"))
+    if not session.get("study", "has_content"):
+        raise RuntimeError(f"{mode} generation produced no content")
+
+
+async def submit_quiz(session: LoadSession, rng: random.Random):
+    """Pick answers client-side, as the quiz UI does, and submit them."""
+    version = session.get("study", "quiz_version")
+    answers = {
+        f"{version}:{index}": rng.randrange(len(question["options"]))
+        for index, question in enumerate(session.get("study", "quiz_questions"))
+    }
+    await session.send("study", "submit_quiz", answers=answers)
+
+
+async def download_pdf(session: LoadSession):
+    events = await session.send("study", "download_pdf")
+    if not any(event["name"] == "_download" for event in events):
+        raise RuntimeError("download_pdf returned no file")
+
+
+async def simulate_user(
+    index: int, args, names: dict[str, str], recorder: Recorder, rng, run_id: str
+):
+    await asyncio.sleep(args.ramp_s * index / max(1, args.users))
+    session = LoadSession(args.url, names, args.timeout)
+    if await recorder.measure("ws.connect", session.connect()) is None:
+        return
+    try:
+        if await recorder.measure("auth.login", log_in(session, index, run_id)) is None:
+            return
+        for _ in range(args.iterations):
+            await recorder.measure("page.on_load", session.visit("/"))
+            for mode in rng.sample(MODES, len(MODES)):
+                topic = rng.choice(TOPICS)
+                await recorder.measure(
+                    f"process_input.{mode}", generate(session, mode, topic)
+                )
+                if mode == "Quiz" and session.get("study", "has_content"):
+                    await recorder.measure(
+                        "state.submit_quiz", submit_quiz(session, rng)
+                    )
+            await recorder.measure("state.download_pdf", download_pdf(session))
+            history = session.get("study", "history") or []
+            if history:
+                await recorder.measure(
+                    "state.load_from_history",
+                    session.send(
+                        "study", "load_from_history", item_id=rng.choice(history)["id"]
+                    ),
+                )
+            await recorder.measure(
+                "state.load_more_history", session.send("study", "load_more_history")
+            )
+    finally:
+        await session.close()
+
+
+class ProcessSampler:
+    """CPU and RSS of the server processes, sampled from /proc (Linux)."""
+
+    def __init__(self, pids: list[int], interval: float):
+        self.pids = pids
+        self.interval = interval
+        self.samples: list[dict] = []
+        self._ticks = os.sysconf("SC_CLK_TCK")
+
+    def _read(self) -> tuple[float, float]:
+        cpu_seconds = rss_mb = 0.0
+        for pid in self.pids:
+            try:
+                with open(f"/proc/{pid}/stat") as stat:
+                    fields = stat.read().rpartition(")")[2].split()
+                with open(f"/proc/{pid}/statm") as statm:
+                    resident_pages = int(statm.read().split()[1])
+            except OSError:
+                continue
+            cpu_seconds += (int(fields[11]) + int(fields[12])) / self._ticks
+            rss_mb += resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+        return cpu_seconds, rss_mb
+
+    async def run(self):
+        start = time.perf_counter()
+        previous_time, (previous_cpu, _) = start, self._read()
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            cpu_seconds, rss_mb = self._read()
+            self.samples.append(
+                {
+                    "t_s": round(now - start, 2),
+                    "cpu_percent": 100
+                    * (cpu_seconds - previous_cpu)
+                    / (now - previous_time),
+                    "rss_mb": rss_mb,
+                }
+            )
+            previous_time, previous_cpu = now, cpu_seconds
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {}
+        cpu = [sample["cpu_percent"] for sample in self.samples]
+        rss = [sample["rss_mb"] for sample in self.samples]
+        return {
+            "cpu_percent_mean": sum(cpu) / len(cpu),
+            "cpu_percent_max": max(cpu),
+            "rss_mb_max": max(rss),
+            "rss_mb_last": rss[-1],
+        }
+
+
+async def run(args) -> dict:
+    names = _state_names()
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    run_id = uuid.uuid4().hex[:8]
+    sampler = ProcessSampler(args.server_pid, args.sample_interval)
+    sampling = asyncio.create_task(sampler.run()) if args.server_pid else None
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            simulate_user(i, args, names, recorder, random.Random(rng.random()), run_id)
+            for i in range(args.users)
+        )
+    )
+    wall_time = time.perf_counter() - start
+    if sampling:
+        sampling.cancel()
+    operations = recorder.summary(wall_time)
+    total = sum(op["count"] + op["errors"] for op in operations.values())
+    errors = sum(op["errors"] for op in operations.values())
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "url": args.url,
+            "users": args.users,
+            "iterations": args.iterations,
+            "ramp_s": args.ramp_s,
+            "seed": args.seed,
+        },
+        "wall_time_s": wall_time,
+        "throughput_per_s": sum(op["count"] for op in operations.values()) / wall_time,
+        "error_rate": errors / total if total else 0.0,
+        "server": {**sampler.summary(), "timeline": sampler.samples},
+        "operations": operations,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--ramp-s", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument(
+        "--server-pid",
+        type=lambda value: [int(pid) for pid in value.split(",") if pid],
+        default=[],
+        help="Comma-separated backend process ids to sample CPU/RSS from.",
+    )
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        print("The load test needs aiohttp: pip install aiohttp")
+        return 2
+
+    results = asyncio.run(run(args))
+
+    for name, op in results["operations"].items():
+        print(
+            f"{name:28} n={op['count']:<5} p50={op['p50_ms']:8.2f}ms "
+            f"p95={op['p95_ms']:8.2f}ms p99={op['p99_ms']:8.2f}ms "
+            f"err={op['errors']}"
+        )
+    print(
+        f"throughput={results['throughput_per_s']:.1f} ops/s "
+        f"error_rate={100 * results['error_rate']:.2f}%"
+    )
+    server = results["server"]
+    if "cpu_percent_mean" in server:
+        print(
+            f"server cpu mean={server['cpu_percent_mean']:.0f}% "
+            f"max={server['cpu_percent_max']:.0f}% "
+            f"rss max={server['rss_mb_max']:.1f}MB last={server['rss_mb_last']:.1f}MB"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    return 1 if results["error_rate"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
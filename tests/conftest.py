@@ -0,0 +1,26 @@
+import os
+import uuid
+import asyncio
+import tempfile
+
+# Point the app at a throwaway database and the offline provider before any
+# app module reads its configuration.
+os.environ["DB_URL"] = os.environ["REFLEX_DB_URL"] = (
+    f"sqlite:///{tempfile.mkdtemp()}/studygenie_test.db"
+)
+os.environ["STUDYGENIE_PROVIDER"] = "mock"
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def user():
+    """A fresh user in the test database, which is created on first use."""
+    from app.database import add_user, create_db_and_tables
+
+    async def create():
+        await create_db_and_tables()
+        name = uuid.uuid4().hex[:12]
+        return await add_user(name, f"{name}@example.com", "hash")
+
+    return asyncio.run(create())
@@ -0,0 +1,115 @@
+import time
+import socket
+import asyncio
+import threading
+import pytest
+from app import cache_standin
+from app.ai import generation_cache_key, normalize_topic
+from app.cache import MemoryCache, RedisCache, SQLiteCache, create_cache
+
+
+@pytest.fixture
+def standin():
+    """A cache stand-in server on a free port, served from a background loop."""
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(cache_standin.serve("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    loop.close()
+
+
+def test_normalize_topic_ignores_case_spacing_and_end_punctuation():
+    assert normalize_topic("  The   Krebs\tCycle?! ") == "the krebs cycle"
+    assert normalize_topic("Photosynthesis.") == normalize_topic("photosynthesis")
+
+
+def test_generation_cache_key_follows_normalized_topic():
+    key = generation_cache_key("Notes", "Photosynthesis", "default")
+    assert key.startswith("gen:Notes:")
+    assert generation_cache_key("Notes", " photosynthesis? ", "default") == key
+    assert generation_cache_key("Summary", "Photosynthesis", "default") != key
+    assert generation_cache_key("Notes", "Photosynthesis", "small") != key
+    assert generation_cache_key("Notes", "Photosynthesis", "default", "d") != key
+
+
+def test_memory_cache_round_trips_json():
+    cache = MemoryCache()
+    cache.set_json("k", {"cards": [{"question": "q", "answer": "a"}]})
+    assert cache.get_json("k") == {"cards": [{"question": "q", "answer": "a"}]}
+    cache.invalidate("k")
+    assert cache.get_json("k") is None
+
+
+def test_memory_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.time", lambda: now[0])
+    cache = MemoryCache()
+    cache.set("k", "v", ttl=10)
+    assert cache.get("k") == "v"
+    now[0] += 11
+    assert cache.get("k") is None
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_memory_cache_is_bounded_by_size():
+    cache = MemoryCache(max_bytes=20)
+    cache.set("a", "x" * 9)
+    cache.set("b", "y" * 9)
+    cache.set("c", "z" * 9)
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 9
+    cache.set("big", "w" * 50)
+    assert cache.get("big") is None
+    assert cache.get("c") == "z" * 9
+
+
+def test_redis_cache_round_trips_through_the_standin(standin):
+    cache = create_cache(f"redis://127.0.0.1:{standin}/0")
+    assert isinstance(cache, RedisCache) and cache.shared
+    cache.set_json("k", {"topic": "Zellatmung – ATP", "n": [1, 2]})
+    assert cache.get_json("k") == {"topic": "Zellatmung – ATP", "n": [1, 2]}
+    other = RedisCache("127.0.0.1", standin)
+    assert other.get_json("k") == {"topic": "Zellatmung – ATP", "n": [1, 2]}
+    other.invalidate("k")
+    assert cache.get("k") is None
+
+
+def test_redis_cache_expires_entries_on_the_standin(standin):
+    cache = RedisCache("127.0.0.1", standin)
+    cache.set("k", "v", ttl=0.05)
+    assert cache.get("k") == "v"
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+
+def test_unreachable_redis_is_a_miss():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    cache = RedisCache("127.0.0.1", port)
+    cache.set_json("k", 1)
+    assert cache.get_json("k") is None
+
+
+def test_sqlite_cache_is_shared_through_its_file(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer, reader = SQLiteCache(path), SQLiteCache(path)
+    writer.set_json("k", {"a": 1}, ttl=60)
+    assert reader.get_json("k") == {"a": 1}
+    writer.invalidate("k")
+    assert reader.get_json("k") is None
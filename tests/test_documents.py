@@ -0,0 +1,43 @@
+from app import documents
+from app.documents import iter_chunks
+
+
+def test_text_is_packed_into_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, "CHUNK_CHARS", 10)
+    path = tmp_path / "notes.txt"
+    path.write_text("a" * 25)
+    assert list(iter_chunks(path)) == [
+        ("text", "a" * 10),
+        ("text", "a" * 10),
+        ("text", "a" * 5),
+    ]
+
+
+def test_long_text_is_cut_at_max_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, "CHUNK_CHARS", 10)
+    monkeypatch.setattr(documents, "MAX_CHUNKS", 2)
+    path = tmp_path / "notes.txt"
+    path.write_text("a" * 25)
+    notices: list[str] = []
+    assert len(list(iter_chunks(path, notices))) == 2
+    assert notices == ["notes.txt is too long; only its first 20 characters were used."]
+
+
+def test_pending_text_is_not_sent_past_max_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, "MAX_CHUNKS", 2)
+    pages = [("text", "intro", 1), ("image", b"1", 2), ("image", b"2", 3)]
+    monkeypatch.setattr(documents, "iter_pages", lambda path: iter(pages))
+    notices: list[str] = []
+    chunks = list(iter_chunks(tmp_path / "scan.pdf", notices))
+    assert chunks == [("image", b"1"), ("image", b"2")]
+    assert notices == ["scan.pdf is too long; only its first 3 pages were used."]
+
+
+def test_short_document_has_no_notice(tmp_path):
+    path = tmp_path / "notes.md"
+    path.write_text("# Cells\n\nThe unit of life.")
+    notices: list[str] = []
+    assert list(iter_chunks(path, notices)) == [
+        ("text", "# Cells\n\nThe unit of life.")
+    ]
+    assert notices == []
@@ -0,0 +1,111 @@
+import time
+import asyncio
+from app import ai, codec, jobs
+from app.database import (
+    cancel_job,
+    claim_job,
+    complete_job,
+    enqueue_job,
+    fail_exhausted_jobs,
+    get_history_item,
+    get_job,
+    job_is_held,
+    renew_job_lease,
+)
+
+
+def _enqueue_and_claim(user, worker: str, lease_seconds: float = 60):
+    async def run():
+        job = await enqueue_job(user["id"], "Notes", "Cells", "Cells", [])
+        claimed = await claim_job(worker, lease_seconds, 3)
+        assert claimed["id"] == job["id"]
+        return claimed
+
+    return asyncio.run(run())
+
+
+def test_claimed_job_completes_only_for_its_worker(user):
+    job = _enqueue_and_claim(user, "worker-a")
+    assert job["status"] == "running" and job["attempts"] == 1
+
+    async def run():
+        stolen = await complete_job(
+            job["id"], "worker-b", "Cells", "Notes", "{}", user["id"]
+        )
+        item = await complete_job(
+            job["id"], "worker-a", "Cells", "Notes", "{}", user["id"], "note"
+        )
+        return stolen, item, await get_job(job["id"])
+
+    stolen, item, done = asyncio.run(run())
+    assert stolen is None
+    assert done["status"] == "done"
+    assert done["history_id"] == item["id"]
+    assert done["notice"] == "note"
+
+
+def test_cancelled_job_is_not_claimed_or_completed(user):
+    async def run():
+        queued = await enqueue_job(user["id"], "Notes", "Cells", "Cells", [])
+        assert await cancel_job(queued["id"], user["id"])
+        assert await claim_job("worker-a", 60, 3) is None
+        running = await enqueue_job(user["id"], "Notes", "Cells", "Cells", [])
+        await claim_job("worker-a", 60, 3)
+        assert await cancel_job(running["id"], user["id"])
+        assert not await cancel_job(running["id"], user["id"])
+        item = await complete_job(
+            running["id"], "worker-a", "Cells", "Notes", "{}", user["id"]
+        )
+        return item, await job_is_held(running["id"], "worker-a")
+
+    assert asyncio.run(run()) == (None, False)
+
+
+def test_expired_lease_passes_the_job_to_another_worker(user):
+    job = _enqueue_and_claim(user, "worker-a", lease_seconds=0.01)
+    time.sleep(0.02)
+
+    async def run():
+        reclaimed = await claim_job("worker-b", 0.01, 2)
+        assert reclaimed["id"] == job["id"] and reclaimed["attempts"] == 2
+        assert await renew_job_lease(job["id"], "worker-a") is False
+        assert await job_is_held(job["id"], "worker-b")
+        await asyncio.sleep(0.02)
+        assert await fail_exhausted_jobs(0.01, 2) == 1
+        return await get_job(job["id"])
+
+    assert asyncio.run(run())["status"] == "failed"
+
+
+def test_run_job_stores_the_result(user):
+    job = _enqueue_and_claim(user, "worker-a")
+
+    async def run():
+        await jobs.run_job(job, "worker-a")
+        done = await jobs.wait_for_job(job["id"])
+        return done, await get_history_item(done["history_id"], user["id"])
+
+    done, item = asyncio.run(run())
+    assert done["status"] == "done"
+    assert codec.loads(item["content"])["heading"]
+
+
+def test_abort_stops_a_running_job(user, monkeypatch):
+    def wait_for_cancel(mode, user_input, usage, refresh=False, cancel=None):
+        cancel.wait(5)
+        return None
+
+    monkeypatch.setattr(ai, "generate_content", wait_for_cancel)
+    job = _enqueue_and_claim(user, "worker-a")
+
+    async def run():
+        task = asyncio.create_task(jobs.run_job(job, "worker-a"))
+        while job["id"] not in jobs._running:
+            await asyncio.sleep(0.01)
+        assert await jobs.abort_job(job["id"], user["id"])
+        await asyncio.wait_for(task, 2)
+        return await get_job(job["id"])
+
+    cancelled = asyncio.run(run())
+    assert cancelled["status"] == "cancelled"
+    assert cancelled["history_id"] is None
@@ -0,0 +1,90 @@
+from app.json_repair import parse_partial_json, strip_code_fences
+from app.ai import parse_json_response
+
+
+def test_complete_object_is_unchanged():
+    assert parse_partial_json('{"a": [1, 2], "b": "x"}') == (
+        {"a": [1, 2], "b": "x"},
+        True,
+    )
+
+
+def test_code_fences_and_prose_are_stripped():
+    text = 'Here you go:\n```json\n{"summary": "s", "takeaways": ["t"]}\n```'
+    assert strip_code_fences(text).startswith("{")
+    assert parse_partial_json(text) == ({"summary": "s", "takeaways": ["t"]}, True)
+
+
+def test_truncated_card_is_dropped():
+    text = (
+        '{"cards":[{"question":"q1","answer":"a1"},'
+        '{"question":"q2","answer":"The mitochondria is the pow'
+    )
+    assert parse_partial_json(text) == (
+        {"cards": [{"question": "q1", "answer": "a1"}]},
+        False,
+    )
+
+
+def test_truncated_bullet_is_dropped():
+    text = '{"heading": "Cells", "bullets": ["one", "two", "thr'
+    assert parse_partial_json(text) == (
+        {"heading": "Cells", "bullets": ["one", "two"]},
+        False,
+    )
+
+
+def test_torn_string_field_is_dropped():
+    text = '{"heading": "Cells", "bullets": ["one"], "mnemonic": "Remember th'
+    assert parse_partial_json(text) == (
+        {"heading": "Cells", "bullets": ["one"]},
+        False,
+    )
+
+
+def test_truncated_number_and_literal_are_dropped():
+    assert parse_partial_json('{"a": [1, 2, 3') == ({"a": [1, 2]}, False)
+    assert parse_partial_json('{"a": [true, fa') == ({"a": [True]}, False)
+
+
+def test_truncated_nested_question_is_dropped():
+    text = (
+        '{"questions": [{"question": "q", "options": ["a", "b"], "correct_answer": 1},'
+        ' {"question": "r", "options": ["a", "b'
+    )
+    value, complete = parse_partial_json(text)
+    assert not complete
+    assert value == {
+        "questions": [{"question": "q", "options": ["a", "b"], "correct_answer": 1}]
+    }
+
+
+def test_escapes_are_decoded():
+    assert parse_partial_json(r'{"a": "x\né\"y"}') == ({"a": 'x\né"y'}, True)
+
+
+def test_no_object_is_recovered_from_prose():
+    assert parse_partial_json("Sorry, I cannot help with that.") == (None, False)
+
+
+def test_repaired_response_is_validated_without_partial_items():
+    text = (
+        '{"cards":[{"question":"q1","answer":"a1"},'
+        '{"question":"q2","answer":"The mitochondria is the pow'
+    )
+    assert parse_json_response(text, "Flashcards") == {
+        "cards": [{"question": "q1", "answer": "a1"}]
+    }
+
+
+def test_repaired_generation_is_not_cached():
+    from app import ai
+    from app.cache import get_cache
+
+    key = "gen:test:repaired"
+    get_cache().invalidate(key)
+    assert ai._cached_generation(key, lambda: ({"a": 1}, True)) == {"a": 1}
+    assert get_cache().get_json(key) is None
+    assert ai._cached_generation(key, lambda: ({"a": 2}, False)) == {"a": 2}
+    assert get_cache().get_json(key) == {"a": 2}
+    get_cache().invalidate(key)
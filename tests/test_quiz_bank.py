@@ -0,0 +1,48 @@
+import asyncio
+from app.ai import QUIZ_BANK_SIZE, normalize_topic
+from app.database import add_quiz_bank, get_quiz_bank
+from app.jobs import store_result
+from app.providers import mock_payload
+
+
+def _questions(count: int, prefix: str = "Q") -> list[dict]:
+    return [
+        {"question": f"{prefix}{i}?", "options": ["a", "b"], "correct_answer": i % 2}
+        for i in range(count)
+    ]
+
+
+def test_bank_keeps_each_question_once(user):
+    async def run():
+        await add_quiz_bank(user["id"], "cells", _questions(3))
+        await add_quiz_bank(user["id"], "cells", _questions(4))
+        await add_quiz_bank(user["id"], "atoms", _questions(2, "A"))
+        return await get_quiz_bank(user["id"], "cells")
+
+    bank = asyncio.run(run())
+    assert sorted(question["question"] for question in bank) == [
+        "Q0?",
+        "Q1?",
+        "Q2?",
+        "Q3?",
+    ]
+    assert bank[0]["options"] == ["a", "b"]
+
+
+def test_only_typed_topics_are_banked(user):
+    async def run():
+        data = {"questions": _questions(2)}
+        await store_result(user["id"], "Quiz", "Mitosis Basics", data)
+        await store_result(user["id"], "Quiz", "make a quiz", data, from_uploads=True)
+        return (
+            await get_quiz_bank(user["id"], normalize_topic("mitosis basics")),
+            await get_quiz_bank(user["id"], normalize_topic("make a quiz")),
+        )
+
+    typed, uploaded = asyncio.run(run())
+    assert len(typed) == 2
+    assert uploaded == []
+
+
+def test_mock_bank_follows_the_configured_size():
+    assert len(mock_payload("Quiz", "Cells")["questions"]) == QUIZ_BANK_SIZE
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from app import quotas
+from app.quotas import Quota, WindowCounter
+
+
+@pytest.fixture
+def fresh_quotas(monkeypatch):
+    monkeypatch.setattr(quotas, "_users", {})
+    monkeypatch.setattr(quotas, "_pending", {})
+    monkeypatch.setitem(
+        quotas.TIERS, "free", Quota(requests_per_hour=2, tokens_per_day=100)
+    )
+
+
+def test_window_counter_drops_expired_buckets():
+    counter = WindowCounter(window=3600, bucket=60)
+    counter.add(1, now=0)
+    counter.add(2, now=30)
+    counter.add(4, now=1800)
+    assert counter.total(now=1800) == 7
+    assert counter.total(now=3659) == 7
+    assert counter.total(now=3660) == 4
+    assert counter.total(now=5460) == 0
+
+
+def test_rebuild_adds_unflushed_usage_to_stored_rows(fresh_quotas):
+    quotas._pending[(1, "tokens", 900)] = 5
+    quotas._pending[(2, "tokens", 900)] = 50
+    usage = quotas._UserUsage("free")
+    rows = [
+        {"user_id": 1, "kind": "tokens", "bucket_start": 0, "amount": 10},
+        {"user_id": 1, "kind": "requests", "bucket_start": 60, "amount": 3},
+        {"user_id": 2, "kind": "tokens", "bucket_start": 0, "amount": 99},
+    ]
+    quotas._rebuild(usage, 1, rows)
+    assert usage.counters["tokens"].total(now=1000) == 15
+    assert usage.counters["requests"].total(now=1000) == 3
+
+
+def test_admit_enforces_requests_per_hour(fresh_quotas):
+    quotas._users[1] = quotas._UserUsage("free")
+    assert asyncio.run(quotas.admit(1)) is None
+    assert asyncio.run(quotas.admit(1)) is None
+    assert "2 generations per hour" in asyncio.run(quotas.admit(1))
+    assert sum(quotas._pending.values()) == 2
+
+
+def test_admit_enforces_tokens_per_day(fresh_quotas):
+    quotas._users[1] = quotas._UserUsage("free")
+    quotas.record_tokens(1, 100)
+    assert "allowance" in asyncio.run(quotas.admit(1))
+
+
+def test_unknown_tier_falls_back_to_default(fresh_quotas):
+    assert quotas._UserUsage("platinum").tier == quotas.DEFAULT_TIER
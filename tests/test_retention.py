@@ -0,0 +1,51 @@
+import asyncio
+import datetime
+from sqlalchemy import text
+from app.database import _connect, add_history, archive_history, get_history_item
+from app.scheduling import seconds_until_next_run
+
+
+def _archive_all() -> int:
+    before = (datetime.datetime.now() + datetime.timedelta(seconds=1)).isoformat()
+    return asyncio.run(archive_history(before, 1000))
+
+
+def test_archived_content_is_restored_on_open(user):
+    item = asyncio.run(add_history("Cells", "Summary", '{"summary": "x"}', user["id"]))
+    assert _archive_all() >= 1
+    with _connect("test") as conn:
+        stub = conn.execute(
+            text("SELECT content FROM generatedcontenthistory WHERE id = :id"),
+            {"id": item["id"]},
+        ).scalar()
+    assert stub == ""
+
+    restored = asyncio.run(get_history_item(item["id"], user["id"]))
+    assert restored["content"] == '{"summary": "x"}'
+    with _connect("test") as conn:
+        archived = conn.execute(
+            text("SELECT COUNT(*) FROM history_archive WHERE id = :id"),
+            {"id": item["id"]},
+        ).scalar()
+    assert archived == 0
+
+
+def test_missing_archive_row_gives_no_content(user):
+    item = asyncio.run(add_history("Atoms", "Summary", '{"summary": "y"}', user["id"]))
+    _archive_all()
+    with _connect("test") as conn:
+        conn.execute(
+            text("DELETE FROM history_archive WHERE id = :id"), {"id": item["id"]}
+        )
+        conn.commit()
+
+    restored = asyncio.run(get_history_item(item["id"], user["id"]))
+    assert restored["topic"] == "Atoms"
+    assert restored["content"] is None
+
+
+def test_next_run_is_today_or_tomorrow():
+    now = datetime.datetime(2026, 1, 1, 2, 30)
+    assert seconds_until_next_run(3, now) == 30 * 60
+    assert seconds_until_next_run(2, now) == 23.5 * 3600
+    assert seconds_until_next_run(2, now.replace(minute=0)) == 24 * 3600
@@ -0,0 +1,60 @@
+import asyncio
+from app import ai, jobs
+from app.database import (
+    claim_job,
+    enqueue_job,
+    get_global_usage_stats,
+    get_job,
+    get_usage_stats,
+    record_generation,
+    record_quiz_attempt,
+)
+
+
+def _stats(user_id: int) -> dict:
+    return {row["mode"]: row for row in asyncio.run(get_usage_stats(user_id))}
+
+
+def test_rollups_sum_per_mode_and_globally(user):
+    before = {row["mode"]: row for row in asyncio.run(get_global_usage_stats())}
+
+    async def record():
+        await record_generation(user["id"], "Notes", 10, 20)
+        await record_generation(user["id"], "Notes", 1, 2)
+        await record_generation(user["id"], "Quiz", 5, 5, failed=True)
+        await record_quiz_attempt(user["id"], 5, 4)
+
+    asyncio.run(record())
+    stats = _stats(user["id"])
+    assert stats["Notes"]["generations"] == 2
+    assert stats["Notes"]["prompt_tokens"] == 11
+    assert stats["Notes"]["completion_tokens"] == 22
+    assert stats["Quiz"]["generations"] == 0
+    assert stats["Quiz"]["failed_generations"] == 1
+    assert stats["Quiz"]["quiz_accuracy"] == 0.8
+    after = {row["mode"]: row for row in asyncio.run(get_global_usage_stats())}
+    previous = before.get("Notes", {"generations": 0})["generations"]
+    assert after["Notes"]["generations"] == previous + 2
+
+
+def test_failed_job_still_records_its_tokens(user, monkeypatch):
+    def failing_generation(mode, user_input, usage, refresh=False, cancel=None):
+        usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + 7
+        usage["completion_tokens"] = usage.get("completion_tokens", 0) + 3
+        return None
+
+    monkeypatch.setattr(ai, "generate_content", failing_generation)
+
+    async def run():
+        await enqueue_job(user["id"], "Summary", "Cells", "Cells", [])
+        job = await claim_job("test-worker", 60, 3)
+        await jobs.run_job(job, "test-worker")
+        return await get_job(job["id"])
+
+    job = asyncio.run(run())
+    assert job["status"] == "failed"
+    summary = _stats(user["id"])["Summary"]
+    assert summary["generations"] == 0
+    assert summary["failed_generations"] == 1
+    assert summary["prompt_tokens"] == 7
+    assert summary["completion_tokens"] == 3
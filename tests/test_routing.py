@@ -0,0 +1,40 @@
+import pytest
+from app import ai
+from app.ai import generation_cache_key, generate_content, select_route
+from app.cache import get_cache
+from app.providers import LatencyTracker
+
+
+@pytest.fixture(autouse=True)
+def fresh_latencies(monkeypatch):
+    monkeypatch.setattr(ai, "ROUTING_ENABLED", True)
+    monkeypatch.setattr(ai, "route_latency", LatencyTracker())
+
+
+def test_short_lookup_takes_the_small_route():
+    assert select_route("Summary", 40)["name"] == "small"
+    assert select_route("Summary", ai.SMALL_ROUTE_MAX_CHARS + 1)["name"] == "default"
+    assert select_route("Quiz", 40)["name"] == "default"
+
+
+def test_multimodal_requests_take_the_large_route():
+    assert select_route("Notes", 10, ai.LARGE_ROUTE_MIN_IMAGES)["name"] == "large"
+    assert select_route("Notes", ai.LARGE_ROUTE_MIN_CHARS, 1)["name"] == "large"
+    assert select_route("Summary", 10, 1)["name"] == "default"
+
+
+def test_slow_route_falls_back(monkeypatch):
+    monkeypatch.setattr(ai, "ROUTE_PROBE_EVERY", 0)
+    ai.route_latency.record("large", ai.ROUTES["large"]["max_latency"] + 1)
+    assert select_route("Notes", 10, ai.LARGE_ROUTE_MIN_IMAGES)["name"] == "default"
+
+
+def test_results_are_cached_per_route(monkeypatch):
+    topic = "Routing cache separation"
+    small = generate_content("Summary", topic)
+    assert get_cache().get_json(generation_cache_key("Summary", topic, "small"))
+    monkeypatch.setattr(ai, "ROUTING_ENABLED", False)
+    key = generation_cache_key("Summary", topic, "default")
+    assert get_cache().get_json(key) is None
+    assert generate_content("Summary", topic) == small
+    assert get_cache().get_json(key) == small
@@ -0,0 +1,85 @@
+import pytest
+from app import codec
+from app.schemas import merge, validate
+
+
+def test_scalars_are_stringified_and_lone_items_listed():
+    assert validate("Summary", {"summary": 42, "takeaways": "one"}) == {
+        "summary": "42",
+        "takeaways": ["one"],
+    }
+
+
+def test_missing_strings_become_empty():
+    assert validate("Explain", {"steps": ["a"]}) == {
+        "steps": ["a"],
+        "example": "",
+        "analogy": "",
+    }
+
+
+def test_incomplete_list_items_are_dropped():
+    data = {
+        "cards": [
+            {"question": "q1", "answer": "a1"},
+            {"question": "q2"},
+            "not a card",
+        ]
+    }
+    assert validate("Flashcards", data) == {
+        "cards": [{"question": "q1", "answer": "a1"}]
+    }
+
+
+def test_quiz_answers_are_coerced_and_checked():
+    data = {
+        "questions": [
+            {"question": "q1", "options": ["a", "b"], "correct_answer": "1"},
+            {"question": "q2", "options": ["a", "b"], "correct_answer": 2},
+            {"question": "q3", "options": ["a"], "correct_answer": True},
+        ]
+    }
+    assert validate("Quiz", data) == {
+        "questions": [{"question": "q1", "options": ["a", "b"], "correct_answer": 1}]
+    }
+
+
+@pytest.mark.parametrize("data", [None, [], "text", {"summary": "", "takeaways": []}])
+def test_unusable_content_is_rejected(data):
+    assert validate("Summary", data) is None
+
+
+def test_unknown_mode_is_rejected():
+    assert validate("Poems", {"summary": "s"}) is None
+
+
+def test_merge_concatenates_lists_and_keeps_first_strings():
+    parts = [
+        {"heading": "", "bullets": ["a"], "mnemonic": "m1"},
+        {"heading": "Cells", "bullets": ["b", "c"], "mnemonic": "m2"},
+    ]
+    assert merge("Notes", parts) == {
+        "heading": "Cells",
+        "bullets": ["a", "b", "c"],
+        "mnemonic": "m1",
+    }
+
+
+def test_merge_joins_summaries():
+    parts = [
+        {"summary": "First.", "takeaways": ["a"]},
+        {"summary": "", "takeaways": []},
+        {"summary": "Second.", "takeaways": ["b"]},
+    ]
+    assert merge("Summary", parts) == {
+        "summary": "First.\n\nSecond.",
+        "takeaways": ["a", "b"],
+    }
+
+
+@pytest.mark.parametrize("backend", sorted(codec.BACKENDS))
+def test_codec_round_trip(backend):
+    loads, dumps = codec.BACKENDS[backend]
+    value = {"topic": "Zellatmung – ATP", "scores": [1, 2.5, None, True], "nested": {}}
+    assert loads(dumps(value)) == value
+    assert loads(dumps(value).encode("utf-8")) == value
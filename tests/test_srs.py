@@ -0,0 +1,34 @@
+import pytest
+from app.srs import DAY_SECONDS, MIN_EASE, RELEARN_MINUTES, schedule
+
+NOW = 1_000_000.0
+
+
+def test_good_answers_space_one_day_six_days_then_by_ease():
+    first = schedule(2.5, 0, 0, 4, now=NOW)
+    assert (first["interval_days"], first["repetitions"]) == (1, 1)
+    assert first["due_at"] == NOW + DAY_SECONDS
+    second = schedule(first["ease"], first["interval_days"], 1, 4, now=NOW)
+    assert (second["interval_days"], second["repetitions"]) == (6, 2)
+    third = schedule(second["ease"], second["interval_days"], 2, 4, now=NOW)
+    assert third["interval_days"] == round(6 * third["ease"], 2)
+    assert third["repetitions"] == 3
+
+
+def test_ease_moves_with_grade():
+    assert schedule(2.5, 0, 0, 5, now=NOW)["ease"] == 2.6
+    assert schedule(2.5, 0, 0, 4, now=NOW)["ease"] == 2.5
+    assert schedule(2.5, 0, 0, 3, now=NOW)["ease"] == 2.36
+
+
+def test_failed_card_starts_over():
+    result = schedule(2.5, 15, 4, 1, now=NOW)
+    assert result["repetitions"] == 0
+    assert result["interval_days"] == 0
+    assert result["due_at"] == NOW + RELEARN_MINUTES * 60
+    assert result["ease"] == 1.96
+
+
+@pytest.mark.parametrize("grade", [-3, 0, 1])
+def test_ease_never_drops_below_minimum(grade):
+    assert schedule(MIN_EASE, 0, 0, grade, now=NOW)["ease"] == MIN_EASE